@@ -204,7 +204,25 @@ def create_app():
     from app.routes.chat_routes import chat_bp
     app.register_blueprint(chat_bp, url_prefix='/chat')    
 
+    from app.controllers.chat_controller import warmup_on_startup
+    warmup_on_startup()
+
     from app.routes.gps_routes import gps_bp
     app.register_blueprint(gps_bp, url_prefix='/api')
 
+    from app.utils.gps_writer import pipeline_enabled
+    if pipeline_enabled():
+        from app.controllers.gps_controller import configure_write_pipeline
+        configure_write_pipeline(app)
+
+    if os.getenv('GPS_INDEX_WARM_ON_STARTUP', 'true').lower() == 'true':
+        from app.controllers.gps_controller import warm_last_location_index
+        with app.app_context():
+            try:
+                warmed = warm_last_location_index()
+                print(f"[INFO] GPS last-location index warmed with {warmed} devices")
+            except Exception as exc:
+                db.session.rollback()
+                print(f"[WARN] GPS last-location index warmup skipped: {exc}")
+
     return app
@@ -19,6 +19,7 @@ from app.models.doctor import Doctor
 from app.models.patient import Patient
 from app.models.system_log import SystemLog
 from app.utils.audit import record_system_log
+from app.utils.context_cache import patient_context_cache
 from app.utils.error_handler import AppError, AuthError, NotFoundError, ValidationError, handle_errors
 from app.utils.jwt import JWTError, decode_token
 from app.utils.response import success_response
@@ -161,6 +162,7 @@ def update_user_email(role: str, user_id: str):
     old_email = user_obj.email
     user_obj.email = new_email
     db.session.commit()
+    patient_context_cache.invalidate_user(role, user_obj)
     record_system_log(
         event_type='user_email_updated',
         message='User email updated by admin',
@@ -220,6 +222,8 @@ def manage_user_account(role: str, user_id: str):
         db.session.commit()
         return success_response(message=f'{role.title()} enabled successfully')
 
+    # Collected before the delete, while the care team's patients can still be loaded
+    affected_patients = [user_obj.patient_id] if role == 'patient' else [patient.patient_id for patient in getattr(user_obj, 'patients', [])]
     try:
         db.session.delete(user_obj)
         db.session.commit()
@@ -230,6 +234,7 @@ def manage_user_account(role: str, user_id: str):
             status_code=409,
             code='CONFLICT',
         ) from exc
+    patient_context_cache.invalidate(*affected_patients)
 
     record_system_log(
         event_type='user_deleted',
@@ -7,92 +7,77 @@ except ImportError:
     pass
 # -----------------------------------------------------------
 
+import hashlib
+import io
+import json
 import os
-import uuid
+import threading
 from datetime import datetime
-from flask import request, send_file
-import google.generativeai as genai
+import numpy as np
+from flask import Response, request, send_file
 from app.models.patient import Patient
-from pydub import AudioSegment
 
-import chromadb
-from sentence_transformers import SentenceTransformer
+from app.controllers.admin_controller import _require_admin
+from app.utils import speech_models
+from app.utils.answer_cache import answer_cache
+from app.utils.context_cache import patient_context_cache
+from app.utils.conversation_memory import ConversationMemory
+from app.utils.embedding_cache import embedding_cache
 from app.utils.error_handler import handle_errors, AppError, ValidationError
-from app.utils.response import success_response
+from app.utils.inference_client import get_inference_client
+from app.utils.llm_client import FALLBACK_REPLY, LLMClient, LLMUnavailableError, StubModel, llm_backend
+from app.utils.model_registry import model_registry
+from app.utils.response import error_response, success_response
+from app.utils.tts_cache import tts_cache, tts_cache_enabled, tts_cache_key
 from app.utils.validation import validate_payload, ChatAskPayload
 
-# --- New Imports for Local STT & XTTS ---
-import torch
-import torchaudio
-from transformers import pipeline
-from TTS.tts.configs.xtts_config import XttsConfig
-from TTS.tts.models.xtts import Xtts
-# ---------------------------------------
-
 # ==========================================
-# ===   Load ML Models (Global Scope)    ===
+# ===   ML Models (loaded on first use)  ===
 # ==========================================
-device = "cuda:0" if torch.cuda.is_available() else "cpu"
-print(f"[INFO] Using device: {device}")
-
-# 1. Load Whisper Fine-Tuned (STT) - Local Model
-WHISPER_MODEL_DIR = "openai/whisper-small"
-try:
-    stt_pipe = pipeline("automatic-speech-recognition", model=WHISPER_MODEL_DIR, device=device)
-    print("[OK] Local Whisper STT Loaded Successfully")
-except Exception as e:
-    print(f"[ERROR] Local Whisper STT could not load: {e}")
-    stt_pipe = None
-
-# 2. Load Egyptian TTS (Local XTTS v2)
-TTS_BASE_MODEL_DIR = "/home/ubuntu/mobile/authentication/app/controllers/chat_model"
-CONFIG_PATH = os.path.join(TTS_BASE_MODEL_DIR, "config.json")
-VOCAB_PATH = os.path.join(TTS_BASE_MODEL_DIR, "vocab.json")
-SPEAKER_AUDIO_PATH = os.path.join(TTS_BASE_MODEL_DIR, "speaker_reference.wav")
+# chromadb and google-generativeai are imported inside the loaders, and the speech and
+# embedding models live in app/utils/speech_models.py (or in the inference server), so
+# workers that never serve /chat start without them
 
-try:
-    print("[INFO] Loading EGTTS (XTTS) Config...")
-    config = XttsConfig()
-    config.load_json(CONFIG_PATH)
-    tts_model = Xtts.init_from_config(config)
-    tts_model.load_checkpoint(config, checkpoint_dir=TTS_BASE_MODEL_DIR, use_deepspeed=False, vocab_path=VOCAB_PATH)
-    tts_model.to(device)
-
-    print("[INFO] Computing speaker latents...")
-    gpt_cond_latent, speaker_embedding = tts_model.get_conditioning_latents(audio_path=[SPEAKER_AUDIO_PATH])
-    print("[OK] Local EGTTS Loaded Successfully via XTTS")
-except Exception as e:
-    print(f"[ERROR] Local EGTTS could not load: {e}")
-    tts_model = None
-    gpt_cond_latent = None
-    speaker_embedding = None
-
-# --- Vector DB Initialization ---
 DB_PATH = "/home/ubuntu/mobile/authentication/vector_db"
 
-try:
+
+def _load_vector_db():
+    import chromadb
+
     if not os.path.exists(DB_PATH):
         os.makedirs(DB_PATH, exist_ok=True)
+    return chromadb.PersistentClient(path=DB_PATH)
 
-    chroma_client = chromadb.PersistentClient(path=DB_PATH)
-    collection = chroma_client.get_or_create_collection("patients")
 
-    embedding_model = SentenceTransformer("all-MiniLM-L6-v2")
-    print("[OK] Vector DB & Model Loaded Successfully")
-except Exception as e:
-    print(f"[ERROR] Critical Warning: Vector DB could not load: {e}")
-    chroma_client = None
-    collection = None
-    embedding_model = None
+def _load_gemini():
+    if llm_backend() == 'stub':
+        return StubModel()
 
-# --- Gemini API Configuration ---
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-genai.configure(api_key=GOOGLE_API_KEY)
+    import google.generativeai as genai
+
+    genai.configure(api_key=os.getenv("GOOGLE_API_KEY"))
+    try:
+        return genai.GenerativeModel('gemini-2.5-flash')
+    except Exception:
+        return genai.GenerativeModel('gemini-1.5-flash')
+
+
+vector_db = model_registry.register('vector_db', _load_vector_db)
+gemini = model_registry.register('gemini', _load_gemini)
+llm = LLMClient(gemini.get)
+
+# "patients": one structured-context document per patient; "patient_memory": chat turns and summaries
+_collections = {}
+
+
+def _collection(name: str):
+    chroma_client = vector_db.get()
+    if not chroma_client:
+        return None
+    if name not in _collections:
+        _collections[name] = chroma_client.get_or_create_collection(name)
+    return _collections[name]
 
-try:
-    model = genai.GenerativeModel('gemini-2.5-flash')
-except Exception:
-    model = genai.GenerativeModel('gemini-1.5-flash')
 
 safety_settings = [
     {"category": "HARM_CATEGORY_HARASSMENT", "threshold": "BLOCK_NONE"},
@@ -100,41 +85,94 @@ safety_settings = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
 ]
 
+
+def _generate(prompt: str, stream: bool = False):
+    """ Gemini through the bounded LLM client; raises LLMUnavailableError instead of hanging """
+    if stream:
+        return llm.stream(prompt, safety_settings=safety_settings)
+    return llm.generate(prompt, safety_settings=safety_settings)
+
 # ==========================================
 # ===         Memory Functions (RAG)     ===
 # ==========================================
+def embed_texts(texts: list[str]) -> list:
+    """ Embeds several texts in one model call, serving repeats from the embedding cache """
+    vectors = [embedding_cache.get(text) for text in texts]
+    missing = [index for index, vector in enumerate(vectors) if vector is None]
+    if missing:
+        try:
+            client = get_inference_client()
+            if client is not None:
+                computed = client.call('encode', [texts[index] for index in missing])
+            else:
+                computed = speech_models.encode([texts[index] for index in missing])
+        except Exception as e:
+            print(f"[ERROR] Embedding failed: {e}")
+            return []
+        for index, vector in zip(missing, computed):
+            embedding_cache.put(texts[index], vector)
+            vectors[index] = vector
+    return [vector.tolist() if hasattr(vector, 'tolist') else vector for vector in vectors]
+
 def embed_text(text: str):
-    if not embedding_model:
-        return []
-    return embedding_model.encode(text).tolist()
+    vectors = embed_texts([text])
+    return vectors[0] if vectors else []
+
+conversation_memory = ConversationMemory(
+    collection=lambda: _collection("patient_memory"),
+    embed_texts=embed_texts,
+)
+
+# patient_id -> fingerprint of the context last stored in Chroma by this worker
+_stored_fingerprints: dict[str, str] = {}
+
+def context_fingerprint(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
 
 def store_patient_vector(patient_id: str, text: str):
-    if not collection or not embedding_model:
-        return
+    """ Embeds and upserts the patient's context, skipped when it has not changed since the last store """
+    collection = _collection("patients")
+    if not collection:
+        return None
+    patient_key = str(patient_id)
+    fingerprint = context_fingerprint(text)
+    if _stored_fingerprints.get(patient_key) == fingerprint:
+        return fingerprint
     try:
+        if patient_key not in _stored_fingerprints:
+            # First turn in this worker: the stored copy may already be current
+            existing = collection.get(ids=[patient_key], include=["metadatas"])
+            metadatas = existing.get("metadatas") or []
+            if metadatas and (metadatas[0] or {}).get("fingerprint") == fingerprint:
+                _stored_fingerprints[patient_key] = fingerprint
+                return fingerprint
+
         vector = embed_text(text)
+        if not vector:
+            return None
         collection.upsert(
-            ids=[str(patient_id)],
+            ids=[patient_key],
             embeddings=[vector],
             documents=[text],
-            metadatas=[{"patient_id": str(patient_id)}]
+            metadatas=[{"patient_id": patient_key, "fingerprint": fingerprint}]
         )
+        _stored_fingerprints[patient_key] = fingerprint
+        return fingerprint
     except Exception as e:
         print(f"Store Vector Error: {e}")
+        return None
 
 def search_patient_vectors(patient_id: str, query: str, k: int = 3):
-    if not collection or not embedding_model:
+    """ Past chat turns (and summaries of older ones) most relevant to the query """
+    if not vector_db.get():
         return "Memory system inactive."
     try:
         query_vector = embed_text(query)
-        results = collection.query(
-            query_embeddings=[query_vector],
-            n_results=k,
-            where={"patient_id": str(patient_id)}
-        )
-        if not results or not results.get("documents") or not results["documents"][0]:
+        if not query_vector:
+            return "Memory system inactive."
+        docs = conversation_memory.search(patient_id, query_vector, k)
+        if not docs:
             return "No relevant memory found."
-        docs = results["documents"][0]
         return "\n".join(docs)
     except Exception as e:
         print(f"Search Vector Error: {e}")
@@ -144,6 +182,10 @@ def search_patient_vectors(patient_id: str, query: str, k: int = 3):
 # ===       Data Retrieval Function      ===
 # ==========================================
 def get_patient_context(patient_id):
+    """ The patient's rendered context, served from the context cache until a write invalidates it """
+    return patient_context_cache.get(patient_id, _build_patient_context)
+
+def _build_patient_context(patient_id):
     patient = Patient.query.filter_by(patient_id=patient_id).first()
     if not patient:
         return None
@@ -206,43 +248,175 @@ def get_patient_context(patient_id):
 # ==========================================
 # ===            Audio Helpers           ===
 # ==========================================
-def speech_to_text(audio_file_path):
-    """ Converts Speech to Text using local fine-tuned Whisper """
-    if not stt_pipe:
-        print("[ERROR] STT Pipeline is not initialized.")
-        return None
+def speech_to_text(samples):
+    """ Converts Speech to Text using local fine-tuned Whisper; ``samples`` are 16 kHz mono float32 """
     try:
-        result = stt_pipe(audio_file_path)
-        return result.get("text", "").strip()
+        client = get_inference_client()
+        if client is not None:
+            return client.call('transcribe', samples)
+        return speech_models.transcribe_batched(samples)
     except Exception as e:
         print(f"[ERROR] Whisper STT processing failed: {e}")
         return None
 
-def text_to_speech(text, output_path):
-    """ Converts Text to Speech using Local XTTS Model """
-    if not tts_model:
-        print("[ERROR] EGTTS Model is not initialized.")
-        return False
+SAFETY_BLOCK_REPLY = "عذراً، لا يمكنني الإجابة لأسباب أمنية."
+
+# Canned replies, always synthesized into the TTS cache during warmup
+TTS_PREWARM_PHRASES = (FALLBACK_REPLY, SAFETY_BLOCK_REPLY)
+
+def _prewarm_phrases_file():
+    return os.getenv('TTS_PREWARM_FILE', '').strip()
+
+def tts_prewarm_phrases():
+    """ Canned replies plus the common phrases listed in TTS_PREWARM_FILE, one per line """
+    phrases = list(TTS_PREWARM_PHRASES)
+    path = _prewarm_phrases_file()
+    if path:
+        try:
+            with open(path, encoding='utf-8') as f:
+                phrases.extend(line.strip() for line in f if line.strip())
+        except OSError as e:
+            print(f"[WARN] TTS prewarm file unreadable: {e}")
+    return list(dict.fromkeys(phrases))
+
+def _tts_key(text):
+    return tts_cache_key(text, speech_models.TTS_VOICE, speech_models.TTS_LANGUAGE, speech_models.TTS_TEMPERATURE)
+
+def cached_speech(text):
+    """ WAV bytes for ``text`` from the TTS cache, or None """
+    if not tts_cache_enabled():
+        return None
+    return tts_cache.get(_tts_key(text))
+
+def _remember_speech(text, audio):
+    if tts_cache_enabled():
+        tts_cache.put(_tts_key(text), audio)
+
+def text_to_speech(text):
+    """ Converts Text to Speech using Local XTTS Model; returns WAV bytes or None """
+    audio = cached_speech(text)
+    if audio:
+        return audio
     try:
-        out = tts_model.inference(
-            text=text,
-            language="ar",
-            gpt_cond_latent=gpt_cond_latent,
-            speaker_embedding=speaker_embedding,
-            temperature=0.3
-        )
-        # حفظ الملف الصوتي بمعدل 24000 هرتز المتوافق مع XTTS
-        torchaudio.save(output_path, torch.tensor(out["wav"]).unsqueeze(0), 24000)
-        return True
+        client = get_inference_client()
+        if client is not None:
+            samples = client.call('synthesize', text)
+        else:
+            samples = speech_models.synthesize(text)
+        # الملف الصوتي بمعدل 24000 هرتز المتوافق مع XTTS
+        audio = speech_models.wav_bytes(samples, speech_models.TTS_SAMPLE_RATE)
     except Exception as e:
         print(f"[ERROR] Local XTTS processing failed: {e}")
-        return False
+        return None
+    _remember_speech(text, audio)
+    return audio
+
+def prewarm_tts_cache(phrases=None):
+    """ Synthesizes the phrases missing from the TTS cache, in the background.
+    Defaults to tts_prewarm_phrases() """
+    if not tts_cache_enabled():
+        return
+    phrases = tts_prewarm_phrases() if phrases is None else phrases
+
+    def run():
+        missing = [phrase for phrase in phrases if not cached_speech(phrase)]
+        for phrase in missing:
+            text_to_speech(phrase)
+        if missing:
+            print(f"[INFO] TTS cache prewarmed {len(missing)} phrases")
+
+    threading.Thread(target=run, name='tts-prewarm', daemon=True).start()
+
+def _speech_chunks(text):
+    """ Float32 sample chunks for ``text``, one sentence (or XTTS stream chunk) at a time """
+    client = get_inference_client()
+    if client is None:
+        yield from speech_models.synthesize_stream(text)
+        return
+    # The inference server answers whole calls; stream at sentence granularity
+    for sentence in speech_models.split_sentences(text):
+        yield client.call('synthesize', sentence)
+
+def _iter_speech(text, on_complete=None):
+    """ Streams ``text`` as an open-ended WAV: the header, then PCM as each chunk is synthesized """
+    yield speech_models.wav_stream_header(speech_models.TTS_SAMPLE_RATE)
+    chunks = []
+    try:
+        for samples in _speech_chunks(text):
+            chunks.append(samples)
+            yield speech_models.pcm16(samples)
+    except Exception as e:
+        # Headers are already sent; the client sees the audio end early
+        print(f"[ERROR] Streaming XTTS processing failed: {e}")
+        return
+    if on_complete is not None and chunks:
+        on_complete(speech_models.wav_bytes(np.concatenate(chunks), speech_models.TTS_SAMPLE_RATE))
+
+def _send_wav(audio: bytes):
+    return send_file(io.BytesIO(audio), mimetype="audio/wav", as_attachment=True, download_name="reply.wav")
+
+def _stream_wav(text, on_complete=None):
+    response = Response(_iter_speech(text, on_complete), mimetype="audio/wav")
+    response.headers['Content-Disposition'] = 'attachment; filename=reply.wav'
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 # ==========================================
 # ===            Endpoints               ===
 # ==========================================
+def _sse_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _sse_response(events):
+    response = Response(events, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def _iter_cached_reply(reply_text: str):
+    yield _sse_event('token', {"text": reply_text})
+    yield _sse_event('done', {"response": reply_text, "source": "Answer cache", "blocked": False})
+
+def _iter_streamed_reply(system_prompt: str, patient_id: str, question: str, question_vector, fingerprint: str):
+    """ Forwards Gemini's chunks as `token` events, then a `done` event carrying the full reply """
+    parts = []
+    blocked = False
+    try:
+        for chunk in _generate(system_prompt, stream=True):
+            try:
+                text = chunk.text
+            except ValueError:
+                # Safety filter: the chunk has no text parts
+                blocked = True
+                break
+            if text:
+                parts.append(text)
+                yield _sse_event('token', {"text": text})
+    except LLMUnavailableError as e:
+        print(f"[WARN] Gemini unavailable: {e}")
+        if not parts:
+            yield _sse_event('token', {"text": FALLBACK_REPLY})
+            yield _sse_event('done', {"response": FALLBACK_REPLY, "source": "Fallback", "blocked": False})
+            return
+        yield _sse_event('error', {"message": 'AI Error'})
+        return
+    except Exception as e:
+        print(f"[ERROR] Gemini stream failed: {e}")
+        yield _sse_event('error', {"message": 'AI Error'})
+        return
+
+    if blocked:
+        # Replaces any partial text the client has shown
+        reply_text = SAFETY_BLOCK_REPLY
+    else:
+        reply_text = "".join(parts)
+        conversation_memory.add_turn(patient_id, question, reply_text)
+        answer_cache.put(patient_id, 'text', question_vector, fingerprint, reply_text)
+    yield _sse_event('done', {"response": reply_text, "source": "Gemini RAG + DB", "blocked": blocked})
+
 @handle_errors('AI Error')
-def ask_text():
+def ask_text(stream: bool = False):
     payload = getattr(request, 'current_user_payload', None)
     if not payload or payload.get('role') != 'patient':
         raise AppError('Access denied.', status_code=403)
@@ -254,6 +428,18 @@ def ask_text():
         raise ValidationError('Message required')
 
     patient_context = get_patient_context(patient_id) or "No structured data."
+    fingerprint = context_fingerprint(patient_context)
+    question_vector = embed_text(question)
+    cached = answer_cache.lookup(patient_id, 'text', question_vector, fingerprint)
+    if cached is not None:
+        if stream:
+            return _sse_response(_iter_cached_reply(cached.answer))
+        return success_response(
+            data={"response": cached.answer, "source": "Answer cache"},
+            message='AI response generated',
+            status_code=200,
+        )
+
     store_patient_vector(patient_id, patient_context)
     vector_context = search_patient_vectors(patient_id, question)
 
@@ -281,20 +467,29 @@ def ask_text():
     User Question: "{question}"
     """
 
-    response = model.generate_content(system_prompt, safety_settings=safety_settings)
+    if stream:
+        return _sse_response(_iter_streamed_reply(system_prompt, patient_id, question, question_vector, fingerprint))
+
+    source = "Gemini RAG + DB"
     try:
+        response = _generate(system_prompt)
         reply_text = response.text
+        conversation_memory.add_turn(patient_id, question, reply_text)
+        answer_cache.put(patient_id, 'text', question_vector, fingerprint, reply_text)
+    except LLMUnavailableError as e:
+        print(f"[WARN] Gemini unavailable: {e}")
+        reply_text, source = FALLBACK_REPLY, "Fallback"
     except ValueError:
-        reply_text = "عذراً، لا يمكنني الإجابة لأسباب أمنية."
+        reply_text = SAFETY_BLOCK_REPLY
 
     return success_response(
-        data={"response": reply_text, "source": "Gemini RAG + DB"},
+        data={"response": reply_text, "source": source},
         message='AI response generated',
         status_code=200,
     )
 
 @handle_errors('Voice processing failed')
-def ask_voice():
+def ask_voice(stream: bool = False):
     payload = getattr(request, 'current_user_payload', None)
     if not payload or payload.get('role') != 'patient':
         raise AppError('Access denied.', status_code=403)
@@ -303,61 +498,157 @@ def ask_voice():
     if 'audio' not in request.files:
         raise ValidationError('No audio')
 
-    audio_file = request.files['audio']
-    unique_id = uuid.uuid4()
-    input_path = f"/tmp/{unique_id}_in"
-    wav_path = f"/tmp/{unique_id}.wav"
-    output_path = f"/tmp/{unique_id}_out.wav"
-
     try:
-        audio_file.save(input_path)
+        samples = speech_models.decode_audio(request.files['audio'].read())
+    except ValueError as e:
+        print(f"[WARN] Audio upload could not be decoded: {e}")
+        raise ValidationError('Unsupported audio format') from e
 
-        sound = AudioSegment.from_file(input_path)
-        sound.export(wav_path, format="wav")
+    user_text = speech_to_text(samples)
 
-        user_text = speech_to_text(wav_path)
+    if not user_text:
+        raise ValidationError('Could not understand audio')
 
-        if not user_text:
-            raise ValidationError('Could not understand audio')
+    patient_context = get_patient_context(patient_id) or "No data."
+    fingerprint = context_fingerprint(patient_context)
+    question_vector = embed_text(user_text)
+    cached = answer_cache.lookup(patient_id, 'voice', question_vector, fingerprint)
+    if cached is not None and cached.audio:
+        return _send_wav(cached.audio)
 
-        patient_context = get_patient_context(patient_id) or "No data."
-        store_patient_vector(patient_id, patient_context)
-        vector_context = search_patient_vectors(patient_id, user_text)
+    store_patient_vector(patient_id, patient_context)
+    vector_context = search_patient_vectors(patient_id, user_text)
 
-        current_time = datetime.now().strftime("%I:%M %p")
+    current_time = datetime.now().strftime("%I:%M %p")
 
-        final_context = f"""
-        Time: {current_time}
-        DB Data: {patient_context}
-        Memory: {vector_context}
-        """
+    final_context = f"""
+    Time: {current_time}
+    DB Data: {patient_context}
+    Memory: {vector_context}
+    """
+
+    system_prompt = f"""
+    You are a smart voice assistant for an Alzheimer's patient.
+    Context: {final_context}
+    User said: "{user_text}"
+
+    Instructions:
+    - If asked about Doctor or Caregiver, look at the "MEDICAL TEAM (CONTACTS)" in DB Data.
+    - If asked about Meds, check "MEDICATION SCHEDULE".
+    - Do not invent information. If it's not in the Context, say you don't know.
+    - Reply warmly and concisely in Arabic (Egyptian dialect preferred). Make sure the text is written in clean Arabic letters so the TTS model reads it naturally.
+    """
 
-        system_prompt = f"""
-        You are a smart voice assistant for an Alzheimer's patient.
-        Context: {final_context}
-        User said: "{user_text}"
+    answered = True
+    try:
+        response = _generate(system_prompt)
+        ai_text = response.text
+        conversation_memory.add_turn(patient_id, user_text, ai_text)
+    except LLMUnavailableError as e:
+        print(f"[WARN] Gemini unavailable: {e}")
+        ai_text = FALLBACK_REPLY
+        answered = False
+    except ValueError:
+        ai_text = FALLBACK_REPLY
+        answered = False
+
+    if stream:
+        audio = cached_speech(ai_text)
+        if audio:
+            return _send_wav(audio)
+
+        def on_complete(audio):
+            _remember_speech(ai_text, audio)
+            if answered:
+                answer_cache.put(patient_id, 'voice', question_vector, fingerprint, ai_text, audio=audio)
+        return _stream_wav(ai_text, on_complete)
+
+    audio = text_to_speech(ai_text)
+    if not audio:
+        raise AppError('TTS Failed', status_code=500)
+    if answered:
+        answer_cache.put(patient_id, 'voice', question_vector, fingerprint, ai_text, audio=audio)
+    return _send_wav(audio)
 
-        Instructions:
-        - If asked about Doctor or Caregiver, look at the "MEDICAL TEAM (CONTACTS)" in DB Data.
-        - If asked about Meds, check "MEDICATION SCHEDULE".
-        - Do not invent information. If it's not in the Context, say you don't know.
-        - Reply warmly and concisely in Arabic (Egyptian dialect preferred). Make sure the text is written in clean Arabic letters so the TTS model reads it naturally.
-        """
 
-        response = model.generate_content(system_prompt, safety_settings=safety_settings)
+# ==========================================
+# ===        Warmup & Readiness          ===
+# ==========================================
+def _model_status() -> dict:
+    status = model_registry.status()
+    client = get_inference_client()
+    if client is not None:
         try:
-            ai_text = response.text
-        except ValueError:
-            ai_text = "عذراً، لا يمكنني الرد حالياً."
+            remote = client.call('status')
+        except Exception as e:
+            remote = {name: {'state': 'unavailable', 'error': str(e)} for name in speech_models.SPEECH_MODELS}
+        status.update(remote)
+    return status
+
+
+@handle_errors('Model warmup failed')
+def warmup_models():
+    _require_admin()
+    data = request.get_json(silent=True) or {}
+    names = data.get('models') or None
+    if names is not None:
+        if not isinstance(names, list):
+            raise ValidationError('models must be a list')
+        unknown = [name for name in names if name not in model_registry.names()]
+        if unknown:
+            raise ValidationError('Unknown models', details={'unknown': unknown, 'available': model_registry.names()})
+
+    phrases = data.get('phrases')
+    if phrases is not None:
+        if not isinstance(phrases, list) or not all(isinstance(p, str) and p.strip() for p in phrases):
+            raise ValidationError('phrases must be a list of non-empty strings')
+        phrases = tts_prewarm_phrases() + [p.strip() for p in phrases]
+    wait = str(request.args.get('wait', 'false')).lower() == 'true'
+    names = names or model_registry.names()
+    requested = list(names)
+    client = get_inference_client()
+    if client is not None:
+        # Speech models live in the inference server, which loads them in the background
+        remote = [name for name in names if name in speech_models.SPEECH_MODELS]
+        names = [name for name in names if name not in speech_models.SPEECH_MODELS]
+        if remote:
+            client.call('warmup', remote)
+    model_registry.warmup(names, wait=wait)
+    if 'xtts' in requested:
+        prewarm_tts_cache(phrases)
+
+    status = _model_status()
+    ready = all(model['state'] == 'ready' for model in status.values())
+    return success_response(
+        data={'ready': ready, 'models': status},
+        message='Models loaded' if ready else 'Model warmup started',
+        status_code=200 if ready else 202,
+    )
+
+
+def models_ready():
+    status = {name: {'state': model['state']} for name, model in _model_status().items()}
+    if not all(model['state'] == 'ready' for model in status.values()):
+        return error_response('Models not loaded', status_code=503, code='NOT_READY', details={'models': status})
+    return success_response(
+        data={
+            'ready': True,
+            'models': status,
+            'embedding_cache': embedding_cache.stats(),
+            'context_cache': patient_context_cache.stats(),
+            'answer_cache': answer_cache.stats(),
+            'llm': llm.stats(),
+            'tts_cache': tts_cache.stats(),
+            'stt_batcher': speech_models.stt_batcher.stats(),
+        },
+        message='Ready',
+    )
 
-        if text_to_speech(ai_text, output_path):
-            return send_file(output_path, mimetype="audio/wav", as_attachment=True, download_name="reply.wav")
-        raise AppError('TTS Failed', status_code=500)
 
-    finally:
-        for path in [input_path, wav_path, output_path]:
-            if os.path.exists(path):
-                try:
-                    os.remove(path)
-                except Exception:
-                    pass
+def warmup_on_startup():
+    if os.getenv('CHAT_WARMUP_ON_STARTUP', 'false').lower() == 'true':
+        names = model_registry.names()
+        if get_inference_client() is not None:
+            names = [name for name in names if name not in speech_models.SPEECH_MODELS]
+        model_registry.warmup(names, wait=False)
+        prewarm_tts_cache()
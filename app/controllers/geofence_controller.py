@@ -0,0 +1,163 @@
+import json
+from uuid import uuid4
+
+from flask import request
+
+from app import db
+from app.models.caregiver import CareGiver
+from app.models.patient import Patient
+from app.models.safe_zone import SafeZone
+from app.utils.audit import record_system_log
+from app.utils.error_handler import NotFoundError, handle_errors
+from app.utils.geofence import Zone, dispatch_geofence_notifications, geofence_engine
+from app.utils.patient_access import patient_access_guard, resolve_token_identity
+from app.utils.response import success_response
+from app.utils.validation import AddSafeZonePayload, validate_payload
+
+
+def _zone_to_dict(zone: SafeZone):
+    return {
+        'zone_id': zone.zone_id,
+        'patient_id': zone.patient_id,
+        'name': zone.name,
+        'kind': zone.kind,
+        'lat': zone.center_lat,
+        'lon': zone.center_lon,
+        'radius_m': zone.radius_m,
+        'polygon': json.loads(zone.polygon) if zone.polygon else None,
+        'active': zone.active,
+        'created_at': zone.created_at.isoformat() if zone.created_at else None,
+    }
+
+
+def load_geofences():
+    """Rebuild the in-memory geofence index from active zones of patients with a tracker."""
+    # Read before the zones, so a change committed meanwhile still marks this index stale
+    version = geofence_engine.shared_version()
+    rows = (
+        db.session.query(SafeZone, Patient.gps_device_id, Patient.name, CareGiver.sns_endpoint_arn)
+        .join(Patient, Patient.patient_id == SafeZone.patient_id)
+        .outerjoin(CareGiver, CareGiver.care_giver_id == Patient.care_giver_id)
+        .filter(SafeZone.active.is_(True), Patient.gps_device_id.isnot(None), Patient.active.is_(True))
+        .all()
+    )
+
+    zones = []
+    device_patients = {}
+    for zone, device_id, patient_name, notify_arn in rows:
+        zones.append(Zone(
+            zone_id=zone.zone_id,
+            patient_id=zone.patient_id,
+            name=zone.name,
+            kind=zone.kind,
+            center_lat=zone.center_lat,
+            center_lon=zone.center_lon,
+            radius_m=zone.radius_m,
+            vertices=json.loads(zone.polygon) if zone.polygon else None,
+        ))
+        device_patients[device_id] = {
+            'patient_id': zone.patient_id,
+            'patient_name': patient_name,
+            'notify_arn': notify_arn,
+        }
+
+    geofence_engine.load(zones, device_patients, version)
+    return len(zones)
+
+
+def evaluate_geofences(device_id: str, lat: float, lon: float, timestamp):
+    """Check an accepted point against the device's safe zones and alert on breaches."""
+    if geofence_engine.is_stale():
+        load_geofences()
+
+    events = geofence_engine.evaluate(device_id, lat, lon, timestamp)
+    if not events:
+        return events
+
+    for event in events:
+        if event['breach'] or event['returned']:
+            record_system_log(
+                event_type='geofence_breach' if event['breach'] else 'geofence_return',
+                message='Patient left all safe zones' if event['breach'] else 'Patient returned to a safe zone',
+                target_role='patient',
+                target_id=event['patient_id'],
+                details={
+                    'device_id': device_id,
+                    'zone_id': event['zone_id'],
+                    'lat': lat,
+                    'lon': lon,
+                    'timestamp': timestamp.isoformat(),
+                },
+            )
+    db.session.commit()
+    dispatch_geofence_notifications(events)
+    return events
+
+
+@handle_errors('Add safe zone failed')
+def add_safe_zone():
+    payload = validate_payload(AddSafeZonePayload, request.get_json(silent=True) or {})
+    role, subject = resolve_token_identity()
+    patient = patient_access_guard(role, subject, payload['patient_id'])
+
+    zone = SafeZone(
+        zone_id=str(uuid4()),
+        patient_id=patient.patient_id,
+        name=(payload.get('name') or 'home').strip() or 'home',
+        kind=payload['kind'],
+        center_lat=payload.get('lat') if payload['kind'] == 'circle' else None,
+        center_lon=payload.get('lon') if payload['kind'] == 'circle' else None,
+        radius_m=payload.get('radius_m') if payload['kind'] == 'circle' else None,
+        polygon=json.dumps(payload['polygon']) if payload['kind'] == 'polygon' else None,
+        active=True,
+        created_by_role=role,
+        created_by_id=subject,
+    )
+    db.session.add(zone)
+
+    device_id = (payload.get('device_id') or '').strip()
+    if device_id:
+        patient.gps_device_id = device_id
+
+    db.session.commit()
+    geofence_engine.invalidate()
+
+    return success_response(
+        message='Safe zone added successfully',
+        data=_zone_to_dict(zone),
+        status_code=201,
+    )
+
+
+@handle_errors('Fetch safe zones failed')
+def get_patient_safe_zones(patient_id: str):
+    role, subject = resolve_token_identity()
+    patient = patient_access_guard(role, subject, patient_id)
+
+    zones = (
+        SafeZone.query
+        .filter_by(patient_id=patient.patient_id, active=True)
+        .order_by(SafeZone.created_at.desc())
+        .all()
+    )
+    return success_response(
+        data={
+            'patient_id': patient.patient_id,
+            'device_id': patient.gps_device_id,
+            'zones': [_zone_to_dict(zone) for zone in zones],
+        }
+    )
+
+
+@handle_errors('Delete safe zone failed')
+def delete_safe_zone(zone_id: str):
+    role, subject = resolve_token_identity()
+    zone = SafeZone.query.filter_by(zone_id=zone_id).first()
+    if not zone:
+        raise NotFoundError('Safe zone not found')
+    patient_access_guard(role, subject, zone.patient_id)
+
+    db.session.delete(zone)
+    db.session.commit()
+    geofence_engine.invalidate()
+    return success_response(message='Safe zone deleted successfully')
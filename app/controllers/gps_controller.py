@@ -1,9 +1,49 @@
+import heapq
+import json
+import os
+import re
+import time
 from datetime import datetime, timedelta, timezone
 
-from flask import jsonify, request
+from flask import Response, jsonify, request, stream_with_context
+from sqlalchemy import func
 
 from app import db
+from app.controllers.geofence_controller import evaluate_geofences, load_geofences
 from app.models.location import Location
+from app.utils.audit import record_system_log
+from app.utils.geofence import geofence_engine
+from app.utils.gps_codec import CONTENT_TYPE as GPS_BINARY_CONTENT_TYPE, decode_points
+from app.utils.gps_export import CONTENT_TYPES, DOWNLOAD_EXTENSIONS, iter_export
+from app.utils.gps_writer import gps_write_pipeline, pipeline_enabled
+from app.utils.ingest_filter import DUPLICATE, MERGE, STORE, stationary_filter
+from app.utils.location_hub import location_hub
+from app.utils.location_index import last_location_index
+from app.utils.movement_analysis import movement_tracker, to_epoch_seconds
+from app.utils.segment_store import (
+    compact_closed_windows,
+    expand_dwell,
+    iter_segment_points,
+    latest_segment_points,
+    purge_segments,
+    segment_has_timestamp,
+)
+from app.utils.trajectory import simplify_track
+
+RETENTION_DAYS = 7
+MAX_BULK_DEVICES = 500
+MAX_BATCH_POINTS = 5000
+# Length of Location.device_id; longer ids are rejected before they reach the database
+MAX_DEVICE_ID_LENGTH = 255
+# Keep IN (...) lists well under SQL Server's 2100 parameter limit
+_DEVICE_QUERY_CHUNK = 1000
+HISTORY_FETCH_SIZE = 1000
+_last_purge = 0.0
+_EPOCH = datetime(1970, 1, 1)
+
+
+def _retention_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(days=RETENTION_DAYS)
 
 
 def _parse_timestamp(value: str) -> datetime:
@@ -22,24 +62,80 @@ def _parse_timestamp(value: str) -> datetime:
     return parsed
 
 
-def receive_gps():
+def _point_message(device_id: str, lat: float, lon: float, timestamp: datetime) -> dict:
+    return {
+        'device': device_id,
+        'lat': lat,
+        'lon': lon,
+        'timestamp': timestamp.isoformat() if timestamp else None,
+    }
+
+
+def _run_geofences(device_id: str, lat: float, lon: float, timestamp: datetime):
+    # The point is already stored; a geofence failure must not turn the ingest into an error
     try:
-        data = request.get_json(force=True)
+        evaluate_geofences(device_id, lat, lon, timestamp)
+    except Exception as exc:
+        db.session.rollback()
+        print(f"[GEOFENCE] Evaluation failed for {device_id}: {exc}")
 
-        coordinates = data['geometry']['coordinates']
-        if not isinstance(coordinates, (list, tuple)) or len(coordinates) < 2:
-            raise ValueError('Invalid coordinates format')
 
-        longitude = float(coordinates[0])
-        latitude = float(coordinates[1])
+def _check_device_id(device_id: str) -> str:
+    if not device_id:
+        raise ValueError('Device id is required')
+    if len(device_id) > MAX_DEVICE_ID_LENGTH:
+        raise ValueError(f'Device id must be at most {MAX_DEVICE_ID_LENGTH} characters')
+    return device_id
+
+
+def _parse_feature(data) -> tuple[str, float, float, datetime]:
+    """``(device_id, lat, lon, timestamp)`` of one GeoJSON point feature."""
+    coordinates = data['geometry']['coordinates']
+    if not isinstance(coordinates, (list, tuple)) or len(coordinates) < 2:
+        raise ValueError('Invalid coordinates format')
+
+    longitude = float(coordinates[0])
+    latitude = float(coordinates[1])
+
+    device_id = _check_device_id(str(data['properties']['device']).strip())
+
+    timestamp_raw = data['properties']['timestamp']
+    return device_id, latitude, longitude, _parse_timestamp(timestamp_raw)
+
+
+def _decode_binary_points(payload: bytes) -> list[tuple[str, float, float, datetime]]:
+    device_id, points = decode_points(payload)
+    _check_device_id(device_id)
+    return [(device_id, lat, lon, timestamp) for lat, lon, timestamp in points]
 
-        device_id = str(data['properties']['device']).strip()
-        if not device_id:
-            raise ValueError('Device id is required')
 
-        timestamp_raw = data['properties']['timestamp']
-        parsed_timestamp = _parse_timestamp(timestamp_raw)
+def _is_binary_request() -> bool:
+    return request.mimetype == GPS_BINARY_CONTENT_TYPE
 
+
+def _store_point(device_id: str, latitude: float, longitude: float, parsed_timestamp: datetime) -> str:
+    """Write one point into the current session (without committing) and return what was done with it."""
+    action, anchor = stationary_filter.classify(
+        device_id, latitude, longitude, parsed_timestamp,
+        loader=_stationary_anchor, is_stored=_is_stored,
+    )
+    if action == DUPLICATE:
+        return action
+
+    if action == MERGE:
+        anchor_timestamp, dwell_until, dwell_count = anchor
+        merged = Location.query.filter(
+            Location.device_id == device_id,
+            Location.timestamp == anchor_timestamp,
+        ).update(
+            {Location.dwell_until: dwell_until, Location.dwell_count: dwell_count},
+            synchronize_session=False,
+        )
+        if not merged:
+            # The anchor row is gone (compacted or purged); store the point on its own
+            action = STORE
+
+    if action == STORE:
         location = Location(
             device_id=device_id,
             lat=latitude,
@@ -48,44 +144,456 @@ def receive_gps():
         )
         db.session.add(location)
 
-        cutoff = datetime.utcnow() - timedelta(days=7)
-        Location.query.filter(Location.timestamp < cutoff).delete(synchronize_session=False)
+    return action
+
+
+def _purge_expired_locations():
+    global _last_purge
+    # The cutoff moves by seconds between requests; deleting on every write is wasted work
+    now = time.monotonic()
+    if now - _last_purge < float(os.getenv('GPS_PURGE_INTERVAL_SECONDS', '60')):
+        return
+    _last_purge = now
+    cutoff = _retention_cutoff()
+    Location.query.filter(Location.timestamp < cutoff).delete(synchronize_session=False)
+
 
+def _write_points(points) -> list[str]:
+    """Store ``(device_id, lat, lon, timestamp)`` points in one transaction and return the action taken for each."""
+    device_ids = set()
+    try:
+        actions = []
+        for point in points:
+            device_ids.add(point[0])
+            actions.append(_store_point(*point))
+
+        if any(action != DUPLICATE for action in actions):
+            _purge_expired_locations()
+            db.session.commit()
+        return actions
+
+    except Exception:
+        db.session.rollback()
+        for device_id in device_ids:
+            stationary_filter.forget(device_id)
+        raise
+
+
+def _after_commit(device_id: str, latitude: float, longitude: float, parsed_timestamp: datetime, action: str, publish: bool = True):
+    """Update the last-location index, live streams, geofences and movement window for a committed point."""
+    if action == DUPLICATE:
+        return
+
+    if action == MERGE:
+        # Same place, later time: the device is still here, nothing new to push or geofence
+        lat, lon = stationary_filter.anchor_position(device_id) or (latitude, longitude)
+        last_location_index.update(device_id, lat, lon, parsed_timestamp)
+        return
+
+    if last_location_index.update(device_id, latitude, longitude, parsed_timestamp) and publish:
+        location_hub.publish(device_id, _point_message(device_id, latitude, longitude, parsed_timestamp))
+    _run_geofences(device_id, latitude, longitude, parsed_timestamp)
+    movement_tracker.add_point(
+        device_id,
+        (parsed_timestamp - _EPOCH).total_seconds(),
+        latitude,
+        longitude,
+        geofence_engine.home_for_device(device_id),
+    )
+
+
+def _check_movement(device_ids) -> dict:
+    """Run movement analysis for devices that just ingested points; log and return newly raised anomalies."""
+    raised = {}
+    for device_id in device_ids:
+        try:
+            flags = movement_tracker.new_anomalies(device_id, geofence_engine.home_for_device(device_id))
+        except Exception as exc:
+            print(f"[GPS] Movement analysis failed for {device_id}: {exc}")
+            continue
+        if flags:
+            raised[device_id] = flags
+    if not raised:
+        return raised
+
+    try:
+        for device_id, flags in raised.items():
+            record_system_log(
+                event_type='movement_anomaly',
+                message=f"Unusual movement: {', '.join(flags)}",
+                target_role='device',
+                target_id=device_id,
+                details={'device_id': device_id, 'anomalies': flags},
+            )
         db.session.commit()
-        return jsonify({'status': 'ok'}), 200
+    except Exception as exc:
+        db.session.rollback()
+        print(f"[GPS] Could not record movement anomalies: {exc}")
+    return raised
+
+
+def _enqueue_point(device_id: str, latitude: float, longitude: float, parsed_timestamp: datetime):
+    """Hand the point to the group-commit writer and wait until its batch is durable."""
+    try:
+        pending = gps_write_pipeline.submit((device_id, latitude, longitude, parsed_timestamp))
+    except OverflowError as exc:
+        return jsonify({'status': 'error', 'message': str(exc)}), 503
+
+    if not pending.wait(float(os.getenv('GPS_WRITE_TIMEOUT_SECONDS', '10'))):
+        return jsonify({'status': 'error', 'message': 'Timed out waiting for the GPS write'}), 503
+    if pending.error:
+        return jsonify({'status': 'error', 'message': pending.error}), 400 if pending.rejected else 503
+    return jsonify({'status': 'ok', 'result': pending.result}), 200
+
+
+def configure_write_pipeline(app):
+    gps_write_pipeline.configure(
+        app,
+        write_batch=_write_points,
+        after_commit=lambda point, action: _after_commit(*point, action),
+    )
+
+
+def receive_gps():
+    device_id = None
+    try:
+        if _is_binary_request():
+            points = _decode_binary_points(request.get_data(cache=False))
+            if len(points) != 1:
+                raise ValueError('Send several points to /api/gps/batch')
+            device_id, latitude, longitude, parsed_timestamp = points[0]
+        else:
+            data = request.get_json(force=True)
+            device_id, latitude, longitude, parsed_timestamp = _parse_feature(data)
+
+        if pipeline_enabled():
+            return _enqueue_point(device_id, latitude, longitude, parsed_timestamp)
+
+        action = _store_point(device_id, latitude, longitude, parsed_timestamp)
+        if action == DUPLICATE:
+            return jsonify({'status': 'ok', 'result': action}), 200
+
+        _purge_expired_locations()
+
+        db.session.commit()
+        _after_commit(device_id, latitude, longitude, parsed_timestamp, action)
+        return jsonify({'status': 'ok', 'result': action}), 200
 
     except Exception as exc:
         db.session.rollback()
+        if device_id:
+            stationary_filter.forget(device_id)
+        return jsonify({'status': 'error', 'message': str(exc)}), 400
+
+
+def receive_gps_batch():
+    """Ingest many points in one request and one transaction.
+
+    Accepts a GeoJSON FeatureCollection of point features or the binary
+    ``application/vnd.gps-points`` payload (see ``app/utils/gps_codec.py``).
+    """
+    try:
+        if _is_binary_request():
+            points = _decode_binary_points(request.get_data(cache=False))
+        else:
+            data = request.get_json(force=True)
+            features = data.get('features') if isinstance(data, dict) else None
+            if not isinstance(features, list):
+                raise ValueError('Expected a GeoJSON FeatureCollection')
+            points = [_parse_feature(feature) for feature in features]
+
+        if not points:
+            raise ValueError('No points to store')
+        if len(points) > MAX_BATCH_POINTS:
+            raise ValueError(f'Too many points (max {MAX_BATCH_POINTS})')
+
+        # Oldest first, so the stationary filter sees each device's points in order
+        points.sort(key=lambda point: point[3])
+
+        actions = _write_points(points)
+
+        counts = {STORE: 0, MERGE: 0, DUPLICATE: 0}
+        last_stored = {}
+        for position, (point, action) in enumerate(zip(points, actions)):
+            counts[action] += 1
+            if action == STORE:
+                last_stored[point[0]] = position
+
+        for position, (point, action) in enumerate(zip(points, actions)):
+            # Streams only care about the newest point of each device
+            _after_commit(*point, action, publish=last_stored.get(point[0]) == position)
+
+        response = {'status': 'ok', 'received': len(points), **counts}
+        anomalies = _check_movement(last_stored)
+        if anomalies:
+            response['anomalies'] = anomalies
+        return jsonify(response), 200
+
+    except Exception as exc:
         return jsonify({'status': 'error', 'message': str(exc)}), 400
 
 
+def _stationary_anchor(device_id: str):
+    """Latest stored point of a device as ``(lat, lon, timestamp, dwell_until, dwell_count)``.
+
+    Falls back to the end of the newest segment once every row has been
+    compacted, so resent points of those windows are still seen as late.
+    """
+    row = (
+        db.session.query(Location.lat, Location.lon, Location.timestamp, Location.dwell_until, Location.dwell_count)
+        .filter(Location.device_id == device_id)
+        .order_by(Location.timestamp.desc())
+        .first()
+    )
+    if row is not None:
+        return row
+    for _, lat, lon, end_time in latest_segment_points([device_id]):
+        return lat, lon, end_time, None, 0
+    return None
+
+
+def _is_stored(device_id: str, timestamp: datetime) -> bool:
+    """Whether a row (or a merged report) or a compacted segment of the device already has this timestamp."""
+    in_rows = db.session.query(
+        Location.query.filter(
+            Location.device_id == device_id,
+            (Location.timestamp == timestamp) | (Location.dwell_until == timestamp),
+        ).exists()
+    ).scalar()
+    return in_rows or segment_has_timestamp(device_id, timestamp)
+
+
+def _latest_row_locations(device_ids=None, since: datetime | None = None):
+    """Latest row-stored ``(device_id, lat, lon, last_seen)`` per device, resolved in a single query.
+
+    ``last_seen`` includes the dwell time merged into the row by the stationary filter.
+    """
+    ranked = db.session.query(
+        Location.device_id,
+        Location.lat,
+        Location.lon,
+        func.coalesce(Location.dwell_until, Location.timestamp).label('timestamp'),
+        func.row_number().over(
+            partition_by=Location.device_id,
+            order_by=Location.timestamp.desc(),
+        ).label('row_number'),
+    )
+    if device_ids is not None:
+        ranked = ranked.filter(Location.device_id.in_(device_ids))
+    if since is not None:
+        ranked = ranked.filter(Location.timestamp >= since)
+    ranked = ranked.subquery()
+
+    return (
+        db.session.query(ranked.c.device_id, ranked.c.lat, ranked.c.lon, ranked.c.timestamp)
+        .filter(ranked.c.row_number == 1)
+        .all()
+    )
+
+
+def _latest_locations(device_ids=None, since: datetime | None = None):
+    """Latest point per device across row storage and compacted segments."""
+    latest = {}
+    for source in (latest_segment_points(device_ids, since), _latest_row_locations(device_ids, since)):
+        for device_id, lat, lon, timestamp in source:
+            current = latest.get(device_id)
+            if current is None or timestamp >= current[3]:
+                latest[device_id] = (device_id, lat, lon, timestamp)
+    return list(latest.values())
+
+
+def warm_last_location_index() -> int:
+    """Load the latest point of every device into the in-memory index."""
+    return last_location_index.warm(_latest_locations(since=_retention_cutoff()))
+
+
+def _lookup_last_location(device_id: str):
+    point = last_location_index.get(device_id)
+    if point is None:
+        for _, lat, lon, timestamp in _latest_locations([device_id]):
+            point = (lat, lon, timestamp)
+            last_location_index.update(device_id, *point)
+
+    # Points past retention are purged from the table, so do not serve them from the index either
+    if point is None or point[2] < _retention_cutoff():
+        return None
+    return point
+
+
+def _lookup_last_locations(device_ids: list[str]) -> dict:
+    points = last_location_index.get_many(device_ids)
+
+    missing = [device_id for device_id in device_ids if device_id not in points]
+    for start in range(0, len(missing), _DEVICE_QUERY_CHUNK):
+        for device_id, lat, lon, timestamp in _latest_locations(missing[start:start + _DEVICE_QUERY_CHUNK]):
+            points[device_id] = (lat, lon, timestamp)
+            last_location_index.update(device_id, lat, lon, timestamp)
+
+    cutoff = _retention_cutoff()
+    return {
+        device_id: point
+        for device_id, point in points.items()
+        if point[2] >= cutoff
+    }
+
+
+def _parse_device_ids(raw_value) -> list[str]:
+    if isinstance(raw_value, str):
+        raw_value = raw_value.split(',')
+    if not isinstance(raw_value, (list, tuple)):
+        raise ValueError('device_ids must be a list or a comma separated string')
+
+    device_ids = []
+    for item in raw_value:
+        device_id = str(item).strip()
+        if device_id and device_id not in device_ids:
+            device_ids.append(device_id)
+
+    if not device_ids:
+        raise ValueError('device_ids is required')
+    if len(device_ids) > MAX_BULK_DEVICES:
+        raise ValueError(f'At most {MAX_BULK_DEVICES} device_ids are allowed per request')
+    return device_ids
+
+
+def get_last_locations():
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            device_ids = _parse_device_ids(data.get('device_ids') or '')
+        else:
+            device_ids = _parse_device_ids(request.args.get('device_ids') or '')
+
+        points = _lookup_last_locations(device_ids)
+
+        locations = {}
+        for device_id in device_ids:
+            point = points.get(device_id)
+            if point is None:
+                locations[device_id] = None
+                continue
+            lat, lon, timestamp = point
+            locations[device_id] = {
+                'lat': lat,
+                'lon': lon,
+                'timestamp': timestamp.isoformat() if timestamp else None,
+            }
+
+        return jsonify({'locations': locations}), 200
+
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except Exception as exc:
+        return jsonify({'error': 'internal server error', 'message': str(exc)}), 500
+
+
 def get_last_location():
     try:
+        if request.method == 'POST' or request.args.get('device_ids'):
+            return get_last_locations()
+
         device_id = (request.args.get('device_id') or '').strip()
         if not device_id:
             return jsonify({'error': 'device_id is required'}), 400
 
-        location = (
-            Location.query
-            .filter(Location.device_id == device_id)
-            .order_by(Location.timestamp.desc())
-            .first()
-        )
+        point = _lookup_last_location(device_id)
 
-        if not location:
+        if not point:
             return jsonify({'error': 'not found'}), 404
 
-        return jsonify({
-            'device': device_id,
-            'lat': location.lat,
-            'lon': location.lon,
-            'timestamp': location.timestamp.isoformat() if location.timestamp else None,
-        }), 200
+        return jsonify(_point_message(device_id, *point)), 200
 
     except Exception as exc:
         return jsonify({'error': 'internal server error', 'message': str(exc)}), 500
 
 
+def _parse_positive_number(name: str, cast):
+    raw_value = (request.args.get(name) or '').strip()
+    if not raw_value:
+        return None
+    try:
+        value = cast(raw_value)
+    except ValueError as exc:
+        raise ValueError(f'{name} must be a positive number') from exc
+    if value <= 0:
+        raise ValueError(f'{name} must be a positive number')
+    return value
+
+
+def _iter_location_events(subscription, initial_point: dict | None):
+    heartbeat = float(os.getenv('GPS_STREAM_HEARTBEAT_SECONDS', '15'))
+    max_duration = float(os.getenv('GPS_STREAM_MAX_SECONDS', '3600'))
+    deadline = time.monotonic() + max_duration
+    try:
+        yield 'retry: 3000\n\n'
+        if initial_point is not None:
+            yield f"event: location\ndata: {json.dumps(initial_point)}\n\n"
+        # Streams end after GPS_STREAM_MAX_SECONDS; EventSource reconnects on its own
+        while time.monotonic() < deadline:
+            message = subscription.next(timeout=heartbeat)
+            if message is None:
+                yield ': keep-alive\n\n'
+            else:
+                yield f"event: location\ndata: {message}\n\n"
+    finally:
+        location_hub.unsubscribe(subscription)
+
+
+def stream_locations():
+    try:
+        device_id = (request.args.get('device_id') or '').strip()
+        if not device_id:
+            return jsonify({'error': 'device_id is required'}), 400
+
+        point = _lookup_last_location(device_id)
+        initial_point = _point_message(device_id, *point) if point else None
+
+        try:
+            subscription = location_hub.subscribe(device_id)
+        except RuntimeError as exc:
+            return jsonify({'error': str(exc)}), 503
+
+        response = Response(_iter_location_events(subscription, initial_point), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    except Exception as exc:
+        return jsonify({'error': 'internal server error', 'message': str(exc)}), 500
+
+
+def _point_timestamp(point):
+    return point[2]
+
+
+def _iter_history_points(device_id: str, from_dt: datetime | None = None, to_dt: datetime | None = None):
+    """Time-ordered ``(lat, lon, timestamp)`` of a device across segments and rows."""
+    query = Location.query.filter(Location.device_id == device_id)
+
+    if from_dt is not None:
+        query = query.filter(Location.timestamp >= from_dt)
+
+    if to_dt is not None:
+        query = query.filter(Location.timestamp <= to_dt)
+
+    query = (
+        query
+        .with_entities(Location.lat, Location.lon, Location.timestamp, Location.dwell_until)
+        .order_by(Location.timestamp.asc())
+    )
+    # Rows carry merged stationary reports as dwell_until; segments store them as points
+    row_points = expand_dwell(query.yield_per(HISTORY_FETCH_SIZE))
+    if to_dt is not None:
+        row_points = (point for point in row_points if point[2] <= to_dt)
+
+    # Closed windows live in compacted segments, the open window (and late points) in rows
+    return heapq.merge(
+        iter_segment_points(device_id, from_dt, to_dt),
+        row_points,
+        key=_point_timestamp,
+    )
+
+
 def get_history():
     try:
         device_id = (request.args.get('device_id') or '').strip()
@@ -94,29 +602,80 @@ def get_history():
 
         from_value = (request.args.get('from') or '').strip()
         to_value = (request.args.get('to') or '').strip()
+        simplify_meters = _parse_positive_number('simplify', float)
+        max_points = _parse_positive_number('max_points', int)
+
+        export_format = (request.args.get('format') or 'json').strip().lower()
+        if export_format not in CONTENT_TYPES:
+            raise ValueError(f"format must be one of: {', '.join(CONTENT_TYPES)}")
+
+        from_dt = _parse_timestamp(from_value) if from_value else None
+        to_dt = _parse_timestamp(to_value) if to_value else None
+
+        points = _iter_history_points(device_id, from_dt, to_dt)
+
+        if simplify_meters or max_points:
+            # Simplification needs the whole track; it is held as compact tuples and shrinks right away
+            rows = list(points)
+            if rows:
+                lats, lons, timestamps = zip(*rows)
+                kept = simplify_track(lats, lons, timestamps, tolerance_m=simplify_meters, max_points=max_points)
+                rows = [rows[index] for index in kept.tolist()]
+            points = rows
+
+        response = Response(
+            stream_with_context(iter_export(points, export_format, device_id)),
+            status=200,
+            mimetype=CONTENT_TYPES[export_format],
+        )
+        if export_format in DOWNLOAD_EXTENSIONS:
+            safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', device_id)
+            response.headers['Content-Disposition'] = (
+                f'attachment; filename="{safe_name}-history.{DOWNLOAD_EXTENSIONS[export_format]}"'
+            )
+        return response
 
-        query = Location.query.filter(Location.device_id == device_id)
+    except ValueError as exc:
+        return jsonify({'error': str(exc)}), 400
+    except Exception as exc:
+        return jsonify({'error': 'internal server error', 'message': str(exc)}), 500
 
-        if from_value:
-            from_dt = _parse_timestamp(from_value)
-            query = query.filter(Location.timestamp >= from_dt)
 
-        if to_value:
-            to_dt = _parse_timestamp(to_value)
-            query = query.filter(Location.timestamp <= to_dt)
+def get_insights():
+    try:
+        device_id = (request.args.get('device_id') or '').strip()
+        if not device_id:
+            return jsonify({'error': 'device_id is required'}), 400
 
-        locations = query.order_by(Location.timestamp.asc()).all()
+        if geofence_engine.is_stale():
+            load_geofences()
+        home = geofence_engine.home_for_device(device_id)
+
+        if not movement_tracker.has_history(device_id):
+            # Ingest may have started a window already; history covers those points too
+            window_start = datetime.utcnow() - timedelta(hours=float(os.getenv('GPS_INSIGHTS_WINDOW_HOURS', '24')))
+            rows = list(_iter_history_points(device_id, window_start))
+            if not rows:
+                return jsonify({'error': 'not found'}), 404
+            lats, lons, timestamps = zip(*rows)
+            movement_tracker.load_history(device_id, to_epoch_seconds(timestamps), lats, lons, home)
+
+        insights = movement_tracker.insights(device_id, home, max_age_s=5.0)
+        if insights is None:
+            return jsonify({'error': 'not found'}), 404
 
-        return jsonify([
-            {
-                'lat': item.lat,
-                'lon': item.lon,
-                'timestamp': item.timestamp.isoformat() if item.timestamp else None,
-            }
-            for item in locations
-        ]), 200
+        return jsonify({'device': device_id, 'home': home, **insights}), 200
 
-    except ValueError as exc:
-        return jsonify({'error': str(exc)}), 400
     except Exception as exc:
         return jsonify({'error': 'internal server error', 'message': str(exc)}), 500
+
+
+def compact_location_history():
+    """Compact closed windows of row-stored points into segments and drop expired segments."""
+    stats = compact_closed_windows()
+    purged = purge_segments(_retention_cutoff())
+    print(
+        f"[GPS] Compacted {stats['points']} points from {stats['devices']} devices "
+        f"into {stats['segments']} segments; purged {purged} expired segments"
+    )
+    return stats
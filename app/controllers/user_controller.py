@@ -27,6 +27,9 @@ from app.utils.validation import (
     UpdateTodoPayload,
 )
 from app.utils.sns_helper import register_device_to_sns, send_push_notification
+from app.utils.context_cache import patient_context_cache
+from app.utils.geofence import geofence_engine
+from app.utils.patient_access import caregiver_patient_guard, doctor_patient_guard, resolve_token_identity
 # ---------------------------------------------
 
 def _patient_to_dict(patient: Patient):
@@ -52,6 +55,7 @@ def _patient_to_dict(patient: Patient):
         'address': patient.address,
         'age_category': patient.age_category,
         'hospital_address': patient.hospital_address,
+        'gps_device_id': patient.gps_device_id,
         'doctor': (
             {
                 'doctor_id': patient.doctor.doctor_id,
@@ -165,51 +169,6 @@ def _game_score_to_dict(game_score: GameScore):
     }
 
 
-def _resolve_token_identity():
-    token = _get_token_from_header()
-    if not token:
-        raise AuthError('Missing Bearer token')
-    try:
-        payload = decode_token(token)
-    except JWTError as e:
-        raise AuthError(str(e)) from e
-
-    role = payload.get('role')
-    subject = payload.get('sub')
-    if role not in ['patient', 'doctor', 'caregiver'] or not subject:
-        raise AuthError('Invalid token payload')
-    return role, subject
-
-
-def _doctor_patient_guard(doctor_id: str, patient_id: str):
-    doctor = Doctor.query.filter_by(doctor_id=doctor_id).first()
-    if not doctor or not doctor.active:
-        raise AuthError('Doctor account issues')
-
-    patient = Patient.query.filter_by(patient_id=patient_id).first()
-    if not patient or not patient.active:
-        raise NotFoundError('Patient not found/active')
-
-    if patient.doctor_id != doctor_id:
-        raise AuthError('Unauthorized for this patient')
-
-    return patient
-
-
-def _caregiver_patient_guard(caregiver_id: str, patient_id: str):
-    caregiver = CareGiver.query.filter_by(care_giver_id=caregiver_id).first()
-    if not caregiver or not caregiver.active:
-        raise AuthError('Caregiver account issues')
-
-    patient = Patient.query.filter_by(patient_id=patient_id).first()
-    if not patient or not patient.active:
-        raise NotFoundError('Patient not found/active')
-
-    if patient.care_giver_id != caregiver_id:
-        raise AuthError('Unauthorized for this patient')
-
-    return patient
-
 @handle_errors('Fetch profile failed')
 def me():
     token = _get_token_from_header()
@@ -243,7 +202,7 @@ def updateme():
     except JWTError as e: raise AuthError(str(e)) from e
     role, sub = payload.get('role'), payload.get('sub')
     if role == 'patient':
-        allowed = ['name', 'email', 'age', 'gender', 'phone', 'chronic_disease', 'city', 'address', 'hospital_address']
+        allowed = ['name', 'email', 'age', 'gender', 'phone', 'chronic_disease', 'city', 'address', 'hospital_address', 'gps_device_id']
         user = Patient.query.filter_by(patient_id=sub).first()
     elif role == 'doctor':
         allowed = ['name', 'email', 'age', 'gender', 'phone', 'city', 'specialization', 'clinic_address']
@@ -255,6 +214,9 @@ def updateme():
     for k, v in data.items():
         if k in allowed and v is not None: setattr(user, k, v)
     db.session.commit()
+    patient_context_cache.invalidate_user(role, user)
+    if 'gps_device_id' in allowed and data.get('gps_device_id') is not None:
+        geofence_engine.invalidate()
     return success_response(data=_public_user_payload(user, role))
 
 @handle_errors('Delete profile failed')
@@ -300,6 +262,7 @@ def add_prescription():
         db.session.add(prescription_obj)
         msg = 'Prescription added successfully'
     db.session.commit()
+    patient_context_cache.invalidate(patient.patient_id)
 
     # --- التعديل: إرسال الإشعار للمريض ---
     if patient.sns_endpoint_arn:
@@ -352,7 +315,7 @@ def add_game_score():
     if doctor_id_from_token != payload['doctor_id']:
         raise AuthError('doctor_id does not match authenticated doctor')
 
-    patient = _doctor_patient_guard(payload['doctor_id'], payload['patient_id'])
+    patient = doctor_patient_guard(payload['doctor_id'], payload['patient_id'])
 
     game_score = GameScore(
         game_score_id=str(uuid4()),
@@ -362,6 +325,7 @@ def add_game_score():
     )
     db.session.add(game_score)
     db.session.commit()
+    patient_context_cache.invalidate(patient.patient_id)
 
     return success_response(
         message='Game score added successfully',
@@ -398,15 +362,22 @@ def register_device_token():
     if not token: raise AuthError('Missing Bearer token')
     try: tp = decode_token(token)
     except JWTError as e: raise AuthError(str(e)) from e
-    if tp.get('role') != 'patient': raise AuthError('Only patients can register tokens')
-    patient = Patient.query.filter_by(patient_id=tp.get('sub')).first()
-    if not patient: raise NotFoundError('Patient not found')
+    role = tp.get('role')
+    if role == 'patient':
+        user = Patient.query.filter_by(patient_id=tp.get('sub')).first()
+        if not user: raise NotFoundError('Patient not found')
+    elif role == 'caregiver':
+        # Caregivers receive safe-zone alerts for their patients
+        user = CareGiver.query.filter_by(care_giver_id=tp.get('sub')).first()
+        if not user: raise NotFoundError('CareGiver not found')
+    else:
+        raise AuthError('Only patients and caregivers can register tokens')
 
     # تسجيل في AWS SNS
     arn = register_device_to_sns(payload['fcm_token'])
     if arn:
-        patient.fcm_token = payload['fcm_token']
-        patient.sns_endpoint_arn = arn
+        user.fcm_token = payload['fcm_token']
+        user.sns_endpoint_arn = arn
         db.session.commit()
         return success_response(message='Device registered for notifications')
     raise AppError('Failed to register device with AWS', status_code=500)
@@ -415,7 +386,7 @@ def register_device_token():
 @handle_errors('Add todo failed')
 def add_todo():
     payload = validate_payload(AddTodoPayload, request.get_json(silent=True) or {})
-    role, subject = _resolve_token_identity()
+    role, subject = resolve_token_identity()
 
     if role not in ['patient', 'caregiver']:
         raise AuthError('Only patient or caregiver can add todo')
@@ -436,7 +407,7 @@ def add_todo():
         patient_id = payload.get('patient_id')
         if not patient_id:
             raise ValidationError('patient_id is required for caregiver')
-        patient = _caregiver_patient_guard(subject, patient_id)
+        patient = caregiver_patient_guard(subject, patient_id)
 
     todo = ToDo(
         todo_id=str(uuid4()),
@@ -460,7 +431,7 @@ def add_todo():
 
 @handle_errors('Fetch patient todos failed')
 def get_patient_todos(patient_id: str):
-    role, subject = _resolve_token_identity()
+    role, subject = resolve_token_identity()
     if role == 'patient':
         if subject != patient_id:
             raise AuthError('Patient can only view own todos')
@@ -468,7 +439,7 @@ def get_patient_todos(patient_id: str):
         if not patient or not patient.active:
             raise NotFoundError('Patient not found/active')
     elif role == 'caregiver':
-        patient = _caregiver_patient_guard(subject, patient_id)
+        patient = caregiver_patient_guard(subject, patient_id)
     else:
         raise AuthError('Only patient or caregiver can view todos')
 
@@ -490,7 +461,7 @@ def get_patient_todos(patient_id: str):
 @handle_errors('Update todo failed')
 def update_todo(todo_id: str):
     payload = validate_payload(UpdateTodoPayload, request.get_json(silent=True) or {})
-    role, subject = _resolve_token_identity()
+    role, subject = resolve_token_identity()
     if role not in ['patient', 'caregiver']:
         raise AuthError('Only patient or caregiver can update todo')
 
@@ -502,7 +473,7 @@ def update_todo(todo_id: str):
         if todo.patient_id != subject:
             raise AuthError('Patient can only update own todos')
     else:
-        _caregiver_patient_guard(subject, todo.patient_id)
+        caregiver_patient_guard(subject, todo.patient_id)
 
     if all(value is None for value in payload.values()):
         raise ValidationError('At least one field is required to update')
@@ -528,7 +499,7 @@ def update_todo(todo_id: str):
 
 @handle_errors('Delete todo failed')
 def delete_todo(todo_id: str):
-    role, subject = _resolve_token_identity()
+    role, subject = resolve_token_identity()
     if role not in ['patient', 'caregiver']:
         raise AuthError('Access denied')
 
@@ -540,7 +511,7 @@ def delete_todo(todo_id: str):
         if todo.patient_id != subject:
             raise AuthError('Unauthorized to delete this todo')
     else:
-        _caregiver_patient_guard(subject, todo.patient_id)
+        caregiver_patient_guard(subject, todo.patient_id)
 
     db.session.delete(todo)
     db.session.commit()
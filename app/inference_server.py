@@ -0,0 +1,156 @@
+"""Local inference server for the chat speech and embedding models.
+
+Run one per host next to the web workers:
+
+    INFERENCE_SOCKET=/run/alzware/inference.sock python -m app.inference_server
+
+and start the web workers with the same ``INFERENCE_SOCKET`` (and
+``INFERENCE_AUTHKEY``). Whisper, XTTS and MiniLM are then loaded once, in
+this process, instead of once per worker.
+"""
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from multiprocessing.connection import Listener
+
+from app.utils.inference_client import InferenceError, inference_authkey
+from app.utils.model_registry import model_registry
+from app.utils.speech_models import SPEECH_MODELS, decode_audio, encode, synthesize, transcribe_batched
+
+
+def _embed_batch_size() -> int:
+    return int(os.getenv('INFERENCE_EMBED_BATCH_SIZE', '64'))
+
+
+def _transcribe(audio) -> str:
+    # Web workers send decoded 16 kHz samples; encoded files are decoded here, in memory
+    if isinstance(audio, (bytes, bytearray)):
+        audio = decode_audio(bytes(audio))
+    return transcribe_batched(audio)
+
+
+class InferenceScheduler:
+    """One queue and worker thread per model.
+
+    Requests for the same model run one after another (a single copy of
+    each model, no contention on the GPU), while STT, TTS and embeddings
+    proceed in parallel. Queued embedding requests are encoded together in
+    one batch; transcriptions are batched by the STT micro-batcher, which
+    has its own queue and thread.
+    """
+
+    def __init__(self):
+        self._queues = {lane: queue.Queue() for lane in ('tts', 'embed')}
+        for lane, worker in (('tts', self._run_single), ('embed', self._run_embed)):
+            threading.Thread(target=worker, args=(lane,), name=f'inference-{lane}', daemon=True).start()
+
+    def submit(self, lane: str, func, *args) -> Future:
+        future = Future()
+        self._queues[lane].put((future, func, args))
+        return future
+
+    def _run_single(self, lane: str):
+        jobs = self._queues[lane]
+        while True:
+            future, func, args = jobs.get()
+            try:
+                future.set_result(func(*args))
+            except Exception as exc:
+                future.set_exception(exc)
+
+    def _run_embed(self, lane: str):
+        jobs = self._queues[lane]
+        while True:
+            batch = [jobs.get()]
+            while len(batch) < _embed_batch_size():
+                try:
+                    batch.append(jobs.get_nowait())
+                except queue.Empty:
+                    break
+
+            texts = [text for _, _, (request_texts,) in batch for text in request_texts]
+            try:
+                vectors = encode(texts)
+            except Exception as exc:
+                for future, _, _ in batch:
+                    future.set_exception(exc)
+                continue
+
+            offset = 0
+            for future, _, (request_texts,) in batch:
+                future.set_result(vectors[offset:offset + len(request_texts)])
+                offset += len(request_texts)
+
+    def status(self) -> dict:
+        status = model_registry.status()
+        return {name: status[name] for name in SPEECH_MODELS}
+
+
+def _handle(scheduler: InferenceScheduler, method: str, args: tuple):
+    if method == 'transcribe':
+        return _transcribe(*args)
+    if method == 'synthesize':
+        return scheduler.submit('tts', synthesize, *args).result()
+    if method == 'encode':
+        return scheduler.submit('embed', None, *args).result()
+    if method == 'status':
+        return scheduler.status()
+    if method == 'warmup':
+        names = [name for name in (args[0] if args else None) or SPEECH_MODELS if name in SPEECH_MODELS]
+        model_registry.warmup(names, wait=False)
+        return scheduler.status()
+    raise ValueError(f'Unknown method {method}')
+
+
+def _serve_connection(conn, scheduler: InferenceScheduler):
+    with conn:
+        while True:
+            try:
+                method, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                reply = ('ok', _handle(scheduler, method, args))
+            except Exception as exc:
+                reply = ('error', str(exc))
+            try:
+                conn.send(reply)
+            except OSError:
+                return
+
+
+def main():
+    try:
+        authkey = inference_authkey()
+    except InferenceError as exc:
+        raise SystemExit(f"[ERROR] {exc}") from None
+
+    address = os.getenv('INFERENCE_SOCKET', '/tmp/alzware-inference.sock')
+    if os.path.exists(address):
+        os.remove(address)  # Left behind by a previous run
+
+    # Owner-only from the moment bind() creates the socket, not after a later chmod
+    previous_umask = os.umask(0o077)
+    try:
+        listener = Listener(address, family='AF_UNIX', authkey=authkey)
+    finally:
+        os.umask(previous_umask)
+    scheduler = InferenceScheduler()
+    print(f"[INFO] Inference server listening on {address}")
+
+    if os.getenv('INFERENCE_WARMUP', 'true').lower() == 'true':
+        model_registry.warmup(SPEECH_MODELS, wait=False)
+
+    while True:
+        try:
+            conn = listener.accept()
+        except Exception as exc:
+            # Wrong authkey or a client that hung up during the handshake
+            print(f"[WARN] Rejected inference connection: {exc}")
+            continue
+        threading.Thread(target=_serve_connection, args=(conn, scheduler), daemon=True).start()
+
+
+if __name__ == '__main__':
+    main()
@@ -15,7 +15,9 @@ from .system_log import SystemLog
 from .patient import Patient
 from .prescription import MPrescription
 from .location import Location
+from .location_segment import LocationSegment
 from .todo import ToDo
+from .safe_zone import SafeZone
 
 __all__ = [
     'db',
@@ -29,5 +31,7 @@ __all__ = [
     'Patient',
     'MPrescription',
     'Location',
+    'LocationSegment',
     'ToDo',
+    'SafeZone',
 ]
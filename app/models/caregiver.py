@@ -18,6 +18,8 @@ class CareGiver(db.Model):
     city = db.Column(db.String(100))
     address = db.Column(db.String(255))
     active = db.Column(db.Boolean, nullable=False, default=True)
+    fcm_token = db.Column(db.String(500), nullable=True)
+    sns_endpoint_arn = db.Column(db.String(500), nullable=True)
 
     patients = db.relationship('Patient', back_populates='care_giver')
 
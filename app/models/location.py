@@ -3,9 +3,23 @@ from app import db
 
 class Location(db.Model):
     __tablename__ = 'locations'
+    __table_args__ = (
+        # Serves every per-device read (last point, history, dedup) from the index alone;
+        # the timestamp index stays for the retention purge, which ranges on time only
+        db.Index(
+            'ix_locations_device_id_timestamp',
+            'device_id',
+            'timestamp',
+            mssql_include=['lat', 'lon', 'dwell_until', 'dwell_count'],
+            postgresql_include=['lat', 'lon', 'dwell_until', 'dwell_count'],
+        ),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
-    device_id = db.Column(db.String(255), nullable=False, index=True)
+    device_id = db.Column(db.String(255), nullable=False)
     lat = db.Column(db.Float, nullable=False)
     lon = db.Column(db.Float, nullable=False)
     timestamp = db.Column(db.DateTime, nullable=False, index=True)
+    # Later reports from the same spot are merged into this row instead of new rows
+    dwell_until = db.Column(db.DateTime, nullable=True)
+    dwell_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from app import db
+
+
+class LocationSegment(db.Model):
+    """Immutable, compressed block of one device's points for a closed time window."""
+
+    __tablename__ = 'location_segments'
+    __table_args__ = (
+        db.Index('ix_location_segments_device_id_start_time', 'device_id', 'start_time'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    device_id = db.Column(db.String(255), nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    end_time = db.Column(db.DateTime, nullable=False, index=True)
+    point_count = db.Column(db.Integer, nullable=False)
+    last_lat = db.Column(db.Float, nullable=False)
+    last_lon = db.Column(db.Float, nullable=False)
+    encoding_version = db.Column(db.SmallInteger, nullable=False, default=1)
+    payload = db.Column(db.LargeBinary, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -29,6 +29,7 @@ class Patient(db.Model):
     fcm_token = db.Column(db.String(500), nullable=True)
     sns_endpoint_arn = db.Column(db.String(500), nullable=True)
     # ----------------------------------
+    gps_device_id = db.Column(db.String(255), nullable=True, index=True)  # GPS tracker reporting to /api/gps
 
     # Relationships
     doctor = db.relationship('Doctor', back_populates='patients')
@@ -0,0 +1,23 @@
+from datetime import datetime
+
+from app import db
+
+
+class SafeZone(db.Model):
+    __tablename__ = 'Safe_Zones'
+    __table_args__ = {'schema': 'dbo'}
+
+    zone_id = db.Column(db.String(50), primary_key=True)
+    patient_id = db.Column(db.String(50), db.ForeignKey('dbo.Patients.patient_id'), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # 'circle' or 'polygon'
+    center_lat = db.Column(db.Float, nullable=True)
+    center_lon = db.Column(db.Float, nullable=True)
+    radius_m = db.Column(db.Float, nullable=True)
+    polygon = db.Column(db.Text, nullable=True)  # JSON list of [lon, lat] vertices
+    active = db.Column(db.Boolean, nullable=False, default=True)
+    created_by_role = db.Column(db.String(20), nullable=False)
+    created_by_id = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    patient = db.relationship('Patient', backref=db.backref('safe_zones', lazy=True))
@@ -1,7 +1,7 @@
-from flask import Blueprint
+from flask import Blueprint, request
 from app import limiter
 from app.utils.jwt import jwt_required
-from app.controllers.chat_controller import ask_text, ask_voice
+from app.controllers.chat_controller import ask_text, ask_voice, models_ready, warmup_models
 
 chat_bp = Blueprint('chat', __name__)
 
@@ -9,10 +9,34 @@ chat_bp = Blueprint('chat', __name__)
 @chat_bp.route('/ask', methods=['POST'])
 @jwt_required()
 def ask_text_route():
-    return ask_text()
+    stream = str(request.args.get('stream', 'false')).lower() in ('1', 'true')
+    return ask_text(stream=stream)
+
+
+@chat_bp.route('/ask/stream', methods=['POST'])
+@jwt_required()
+def ask_text_stream_route():
+    return ask_text(stream=True)
 
 
 @chat_bp.route('/voice', methods=['POST'])
 @jwt_required()
 def ask_voice_route():
-    return ask_voice()
+    stream = str(request.args.get('stream', 'false')).lower() in ('1', 'true')
+    return ask_voice(stream=stream)
+
+
+@chat_bp.route('/voice/stream', methods=['POST'])
+@jwt_required()
+def ask_voice_stream_route():
+    return ask_voice(stream=True)
+
+
+@chat_bp.route('/warmup', methods=['POST'])
+def warmup_models_route():
+    return warmup_models()
+
+
+@chat_bp.route('/ready', methods=['GET'])
+def models_ready_route():
+    return models_ready()
@@ -1,6 +1,15 @@
 from flask import Blueprint
 
-from app.controllers.gps_controller import receive_gps, get_last_location, get_history
+from app.controllers.geofence_controller import add_safe_zone, delete_safe_zone, get_patient_safe_zones
+from app.controllers.gps_controller import (
+    compact_location_history,
+    get_history,
+    get_insights,
+    get_last_location,
+    receive_gps,
+    receive_gps_batch,
+    stream_locations,
+)
 
 
 gps_bp = Blueprint('gps', __name__)
@@ -11,7 +20,12 @@ def receive_gps_route():
     return receive_gps()
 
 
-@gps_bp.route('/gps/last', methods=['GET'])
+@gps_bp.route('/gps/batch', methods=['POST'])
+def receive_gps_batch_route():
+    return receive_gps_batch()
+
+
+@gps_bp.route('/gps/last', methods=['GET', 'POST'])
 def get_last_location_route():
     return get_last_location()
 
@@ -19,3 +33,34 @@ def get_last_location_route():
 @gps_bp.route('/gps/history', methods=['GET'])
 def get_history_route():
     return get_history()
+
+
+@gps_bp.route('/gps/insights', methods=['GET'])
+def get_insights_route():
+    return get_insights()
+
+
+@gps_bp.route('/gps/stream', methods=['GET'])
+def stream_locations_route():
+    return stream_locations()
+
+
+@gps_bp.route('/gps/zones', methods=['POST'])
+def add_safe_zone_route():
+    return add_safe_zone()
+
+
+@gps_bp.route('/gps/zones/patient/<string:patient_id>', methods=['GET'])
+def get_patient_safe_zones_route(patient_id):
+    return get_patient_safe_zones(patient_id)
+
+
+@gps_bp.route('/gps/zones/<string:zone_id>', methods=['DELETE'])
+def delete_safe_zone_route(zone_id):
+    return delete_safe_zone(zone_id)
+
+
+@gps_bp.cli.command('compact')
+def compact_location_history_command():
+    """Compact closed windows of GPS points into segments."""
+    compact_location_history()
@@ -0,0 +1,152 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def _threshold() -> float:
+    return float(os.getenv('ANSWER_CACHE_THRESHOLD', '0.92'))
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv('ANSWER_CACHE_TTL_SECONDS', '120'))
+
+
+def _max_per_patient() -> int:
+    return int(os.getenv('ANSWER_CACHE_MAX_PER_PATIENT', '16'))
+
+
+def _max_entries() -> int:
+    return int(os.getenv('ANSWER_CACHE_MAX_ENTRIES', '4096'))
+
+
+def _max_bytes() -> int:
+    return int(float(os.getenv('ANSWER_CACHE_MAX_MB', '64')) * 1024 * 1024)
+
+
+class CachedAnswer:
+    __slots__ = ('vector', 'fingerprint', 'answer', 'audio', 'expires_at')
+
+    def __init__(self, vector, fingerprint: str, answer: str, audio: bytes | None, expires_at: float):
+        self.vector = vector
+        self.fingerprint = fingerprint
+        self.answer = answer
+        self.audio = audio
+        self.expires_at = expires_at
+
+    @property
+    def size(self) -> int:
+        return self.vector.nbytes + len(self.answer.encode('utf-8')) + len(self.audio or b'')
+
+
+class AnswerCache:
+    """Recent answers per patient and channel, matched by question embedding.
+
+    A new question reuses an answer when its cosine similarity to an answered
+    question is at least ``ANSWER_CACHE_THRESHOLD`` and the patient's context
+    fingerprint is unchanged. Entries expire after ``ANSWER_CACHE_TTL_SECONDS``
+    (kept short: answers about medication times depend on the current time),
+    and each patient keeps at most ``ANSWER_CACHE_MAX_PER_PATIENT`` per channel.
+    Across all patients the cache holds at most ``ANSWER_CACHE_MAX_ENTRIES``
+    answers and ``ANSWER_CACHE_MAX_MB`` of text and audio; past either limit
+    the least recently used patients are dropped first. Expired entries of
+    every patient are swept at most once per TTL, on writes.
+    """
+
+    def __init__(self):
+        # (patient_id, channel) -> entries, oldest first; keys in least recently used order
+        self._entries: OrderedDict[tuple[str, str], list[CachedAnswer]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._count = 0
+        self._bytes = 0
+        self._swept_at = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _unit(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        return vector / norm if norm else vector
+
+    def _replace(self, key: tuple[str, str], entries: list[CachedAnswer]):
+        old = self._entries.pop(key, ())
+        self._count -= len(old)
+        self._bytes -= sum(entry.size for entry in old)
+        if entries:
+            self._entries[key] = entries
+            self._count += len(entries)
+            self._bytes += sum(entry.size for entry in entries)
+
+    def _live(self, key: tuple[str, str], fingerprint: str) -> list[CachedAnswer]:
+        now = time.monotonic()
+        entries = [
+            entry for entry in self._entries.get(key, ())
+            if entry.expires_at > now and entry.fingerprint == fingerprint
+        ]
+        self._replace(key, entries)
+        return entries
+
+    def _sweep(self):
+        now = time.monotonic()
+        if now - self._swept_at < _ttl_seconds():
+            return
+        self._swept_at = now
+        for key in [key for key, entries in self._entries.items() if entries[-1].expires_at <= now]:
+            self._replace(key, [entry for entry in self._entries[key] if entry.expires_at > now])
+
+    def _enforce_limits(self, keep: tuple[str, str]):
+        max_entries, max_bytes = _max_entries(), _max_bytes()
+        while (self._count > max_entries or self._bytes > max_bytes) and len(self._entries) > 1:
+            key = next(iter(self._entries))
+            if key == keep:
+                self._entries.move_to_end(key)
+                continue
+            self.evictions += len(self._entries[key])
+            self._replace(key, [])
+
+    def lookup(self, patient_id, channel: str, vector, fingerprint: str) -> CachedAnswer | None:
+        """The closest cached answer above the threshold, or None."""
+        if vector is None or not len(vector):
+            return None
+        key = (str(patient_id), channel)
+        with self._lock:
+            entries = self._live(key, fingerprint)
+            if entries:
+                similarities = np.stack([entry.vector for entry in entries]) @ self._unit(vector)
+                best = int(np.argmax(similarities))
+                if similarities[best] >= _threshold():
+                    self.hits += 1
+                    return entries[best]
+            self.misses += 1
+            return None
+
+    def put(self, patient_id, channel: str, vector, fingerprint: str, answer: str, audio: bytes | None = None):
+        if vector is None or not len(vector):
+            return
+        key = (str(patient_id), channel)
+        entry = CachedAnswer(self._unit(vector), fingerprint, answer, audio, time.monotonic() + _ttl_seconds())
+        with self._lock:
+            self._sweep()
+            entries = self._live(key, fingerprint)
+            entries.append(entry)
+            self._replace(key, entries[-_max_per_patient():])
+            self._enforce_limits(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'patients': len({patient_id for patient_id, _ in self._entries}),
+            'entries': self._count,
+            'bytes': self._bytes,
+            'evictions': self.evictions,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+answer_cache = AnswerCache()
@@ -1,7 +1,7 @@
 import json
 import uuid
 
-from flask import request
+from flask import has_request_context, request
 
 from app import db
 from app.models.system_log import SystemLog
@@ -32,7 +32,7 @@ def record_system_log(
         target_id=target_id,
         target_email=target_email,
         details=details_value,
-        source_ip=request.headers.get('X-Forwarded-For', request.remote_addr),
+        source_ip=request.headers.get('X-Forwarded-For', request.remote_addr) if has_request_context() else None,
     )
     db.session.add(log)
     return log
\ No newline at end of file
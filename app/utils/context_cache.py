@@ -0,0 +1,100 @@
+import os
+import threading
+import time
+
+from app.utils.redis_client import get_redis_client
+
+REDIS_VERSION_KEY_PREFIX = 'chat:context_version:'
+
+
+def _ttl_seconds() -> float:
+    return float(os.getenv('CHAT_CONTEXT_TTL_SECONDS', '300'))
+
+
+class PatientContextCache:
+    """Rendered chat context text per patient, held in memory.
+
+    Writes that change what the context shows (prescriptions, game scores,
+    the patient's or their care team's profile) call ``invalidate``. Entries
+    also expire after ``CHAT_CONTEXT_TTL_SECONDS`` so a write path that does
+    not invalidate is only stale for a short while. When ``REDIS_URL`` is set
+    invalidation bumps a per-patient version key, so every worker drops its
+    copy; a cached read then costs one small Redis GET instead of the
+    patient, care team, prescription and game score queries.
+    """
+
+    def __init__(self):
+        # patient_id -> (text, expires_at, version)
+        self._entries: dict[str, tuple[str, float, str | None]] = {}
+        # Bumped by invalidate, so a build that raced with it is not stored
+        self._generations: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _version(self, patient_id: str):
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            return client.get(REDIS_VERSION_KEY_PREFIX + patient_id) or '0'
+        except Exception as exc:
+            print(f"[WARN] Context cache version read failed: {exc}")
+            return None
+
+    def get(self, patient_id, build):
+        """Cached context for ``patient_id``, calling ``build(patient_id)`` on a miss."""
+        patient_id = str(patient_id)
+        version = self._version(patient_id)
+        with self._lock:
+            entry = self._entries.get(patient_id)
+            generation = self._generations.get(patient_id, 0)
+        if entry is not None and entry[1] > time.monotonic() and entry[2] == version:
+            self.hits += 1
+            return entry[0]
+
+        self.misses += 1
+        text = build(patient_id)
+        if text is not None:
+            with self._lock:
+                if self._generations.get(patient_id, 0) == generation:
+                    self._entries[patient_id] = (text, time.monotonic() + _ttl_seconds(), version)
+        return text
+
+    def invalidate(self, *patient_ids):
+        patient_ids = [str(patient_id) for patient_id in patient_ids if patient_id]
+        if not patient_ids:
+            return
+        with self._lock:
+            for patient_id in patient_ids:
+                self._entries.pop(patient_id, None)
+                self._generations[patient_id] = self._generations.get(patient_id, 0) + 1
+
+        client = get_redis_client()
+        if client is not None:
+            try:
+                pipe = client.pipeline(transaction=False)
+                for patient_id in patient_ids:
+                    pipe.incr(REDIS_VERSION_KEY_PREFIX + patient_id)
+                pipe.execute()
+            except Exception as exc:
+                print(f"[WARN] Context cache invalidation failed: {exc}")
+
+    def invalidate_user(self, role: str, user):
+        """Drop the contexts that show ``user``: their own for a patient, their patients' for a care team member."""
+        if role == 'patient':
+            self.invalidate(user.patient_id)
+        elif role in ('doctor', 'caregiver'):
+            self.invalidate(*(patient.patient_id for patient in user.patients))
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+patient_context_cache = PatientContextCache()
@@ -0,0 +1,208 @@
+import os
+import re
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+TURN = 'turn'
+SUMMARY = 'summary'
+
+_EPOCH = datetime(1970, 1, 1)
+_SENTENCE_END = re.compile(r'(?<=[.!?؟])\s+')
+
+
+def _max_turns() -> int:
+    return int(os.getenv('MEMORY_MAX_TURNS', '60'))
+
+
+def _compact_batch() -> int:
+    return int(os.getenv('MEMORY_COMPACT_BATCH', '20'))
+
+
+def _max_summaries() -> int:
+    return int(os.getenv('MEMORY_MAX_SUMMARIES', '20'))
+
+
+def _max_pending() -> int:
+    return int(os.getenv('MEMORY_MAX_PENDING', '1000'))
+
+
+def _search_flush_timeout() -> float:
+    return float(os.getenv('MEMORY_SEARCH_FLUSH_TIMEOUT_SECONDS', '2'))
+
+
+def _first_sentence(text: str, limit: int = 160) -> str:
+    sentence = _SENTENCE_END.split(text.strip(), maxsplit=1)[0]
+    return sentence if len(sentence) <= limit else sentence[:limit].rstrip() + '…'
+
+
+def summarize_turns(turns: list[dict]) -> str:
+    """Extractive summary of old turns: the distinct questions and the gist of each answer.
+
+    No model call; it keeps what a later question is likely to match on (the
+    wording of past questions) in a fraction of the space.
+    """
+    start = datetime.utcfromtimestamp(turns[0]['ts']).strftime('%Y-%m-%d')
+    end = datetime.utcfromtimestamp(turns[-1]['ts']).strftime('%Y-%m-%d')
+    lines = [f"Summary of {len(turns)} earlier conversations ({start} to {end}):"]
+    seen = set()
+    for turn in turns:
+        question = ' '.join(turn['question'].split())
+        if question.casefold() in seen:
+            continue
+        seen.add(question.casefold())
+        lines.append(f"- Asked: {_first_sentence(question)} | Answered: {_first_sentence(turn['answer'])}")
+    return '\n'.join(lines)
+
+
+class ConversationMemory:
+    """Per-patient chat memory in a vector collection, one chunk per question/answer turn.
+
+    New turns are queued and embedded in batches on a background thread, so
+    the chat response does not wait for them. Once a patient has more than
+    ``MEMORY_MAX_TURNS`` turn chunks, the oldest ``MEMORY_COMPACT_BATCH`` are
+    replaced by one summary chunk, and only the newest ``MEMORY_MAX_SUMMARIES``
+    summaries are kept, so storage per patient stays bounded. All writes run on
+    the one executor thread, so flushes and compactions never overlap.
+    """
+
+    def __init__(self, collection, embed_texts):
+        # Both are callables: collection() -> Chroma collection or None, embed_texts(list) -> list of vectors
+        self._collection = collection
+        self._embed_texts = embed_texts
+        self._lock = threading.Lock()
+        self._pending: list[dict] = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='conversation-memory')
+
+    def add_turn(self, patient_id: str, question: str, answer: str):
+        turn = {
+            'patient_id': str(patient_id),
+            'question': question,
+            'answer': answer,
+            'ts': (datetime.utcnow() - _EPOCH).total_seconds(),
+        }
+        with self._lock:
+            self._pending.append(turn)
+        self._executor.submit(self.flush)
+
+    def _take_pending(self, patient_id: str | None = None) -> list[dict]:
+        with self._lock:
+            if patient_id is None:
+                taken, self._pending = self._pending, []
+            else:
+                taken = [turn for turn in self._pending if turn['patient_id'] == patient_id]
+                self._pending = [turn for turn in self._pending if turn['patient_id'] != patient_id]
+        return taken
+
+    def _restore(self, turns: list[dict]):
+        """Put turns that could not be stored back at the front of the queue for the next flush."""
+        with self._lock:
+            self._pending = turns + self._pending
+            overflow = len(self._pending) - _max_pending()
+            if overflow > 0:
+                del self._pending[:overflow]
+        if overflow > 0:
+            print(f"[WARN] Conversation memory queue full, dropped {overflow} oldest turns")
+
+    def flush(self, patient_id: str | None = None):
+        """Embed and store queued turns (all patients, or one) in a single batch.
+
+        Runs on the executor thread. Turns that cannot be stored stay queued.
+        """
+        turns = self._take_pending(patient_id)
+        if not turns:
+            return
+        collection = self._collection()
+        if collection is None:
+            self._restore(turns)
+            return
+        try:
+            documents = [
+                f"[{datetime.utcfromtimestamp(turn['ts']).strftime('%Y-%m-%d %H:%M')}] "
+                f"Patient: {turn['question']}\nAssistant: {turn['answer']}"
+                for turn in turns
+            ]
+            vectors = self._embed_texts(documents)
+            if not vectors:
+                self._restore(turns)
+                return
+            collection.add(
+                ids=[f"turn-{uuid.uuid4()}" for _ in turns],
+                embeddings=vectors,
+                documents=documents,
+                metadatas=[
+                    {
+                        'patient_id': turn['patient_id'],
+                        'kind': TURN,
+                        'ts': turn['ts'],
+                        'question': turn['question'],
+                        'answer': turn['answer'],
+                    }
+                    for turn in turns
+                ],
+            )
+        except Exception as e:
+            print(f"[ERROR] Conversation memory flush failed: {e}")
+            self._restore(turns)
+            return
+
+        for affected in sorted({turn['patient_id'] for turn in turns}):
+            try:
+                self._compact(collection, affected)
+            except Exception as e:
+                print(f"[ERROR] Conversation memory compaction failed for {affected}: {e}")
+
+    def _chunks(self, collection, patient_id: str, kind: str):
+        result = collection.get(
+            where={'$and': [{'patient_id': patient_id}, {'kind': kind}]},
+            include=['metadatas'],
+        )
+        chunks = list(zip(result.get('ids') or [], result.get('metadatas') or []))
+        chunks.sort(key=lambda chunk: chunk[1].get('ts', 0))
+        return chunks
+
+    def _compact(self, collection, patient_id: str):
+        turns = self._chunks(collection, patient_id, TURN)
+        if len(turns) <= _max_turns():
+            return
+
+        oldest = turns[:max(_compact_batch(), len(turns) - _max_turns())]
+        summary = summarize_turns([metadata for _, metadata in oldest])
+        vectors = self._embed_texts([summary])
+        if not vectors:
+            return
+        collection.add(
+            ids=[f"summary-{uuid.uuid4()}"],
+            embeddings=vectors,
+            documents=[summary],
+            metadatas=[{'patient_id': patient_id, 'kind': SUMMARY, 'ts': oldest[-1][1]['ts']}],
+        )
+        collection.delete(ids=[chunk_id for chunk_id, _ in oldest])
+
+        summaries = self._chunks(collection, patient_id, SUMMARY)
+        if len(summaries) > _max_summaries():
+            collection.delete(ids=[chunk_id for chunk_id, _ in summaries[:len(summaries) - _max_summaries()]])
+
+    def search(self, patient_id: str, query_vector, k: int = 3) -> list[str]:
+        """The ``k`` past turns and summaries closest to the query, oldest first."""
+        patient_id = str(patient_id)
+        # Turns from a moment ago may still be queued; make them searchable first, on the
+        # executor thread so this flush cannot run alongside another flush or compaction
+        try:
+            self._executor.submit(self.flush, patient_id).result(timeout=_search_flush_timeout())
+        except FutureTimeoutError:
+            print("[WARN] Conversation memory flush still running, searching without the newest turns")
+        collection = self._collection()
+        if collection is None:
+            return []
+        results = collection.query(
+            query_embeddings=[query_vector],
+            n_results=k,
+            where={'patient_id': patient_id},
+            include=['documents', 'metadatas'],
+        )
+        documents = (results.get('documents') or [[]])[0]
+        metadatas = (results.get('metadatas') or [[]])[0]
+        ranked = sorted(zip(documents, metadatas), key=lambda item: (item[1] or {}).get('ts', 0))
+        return [document for document, _ in ranked]
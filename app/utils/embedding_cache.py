@@ -0,0 +1,186 @@
+import atexit
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+import numpy as np
+
+_WHITESPACE = re.compile(r'\s+')
+# Write the persistence file after this many new entries (and at exit)
+_SAVE_EVERY = 256
+
+
+def normalize_text(text: str) -> str:
+    """Fold the trivial differences between repeated questions: Unicode form, case, spacing."""
+    return _WHITESPACE.sub(' ', unicodedata.normalize('NFKC', text).casefold()).strip()
+
+
+def _text_key(text: str) -> bytes:
+    return hashlib.blake2b(normalize_text(text).encode('utf-8'), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    """LRU + TTL cache of embeddings keyed by a hash of the normalized text.
+
+    Vectors live in one preallocated float32 slab (``capacity x dim``); the
+    LRU order maps a key to its slot and expiry, so an entry costs 16 bytes of
+    key plus ``4 * dim`` bytes of vector instead of a list of Python floats.
+    With ``path`` set the cache is loaded from and saved to a ``.npz`` file.
+    A capacity of zero or less disables the cache.
+    """
+
+    def __init__(self, model_name: str, capacity: int, ttl_seconds: float = 0, path: str | None = None):
+        self.model_name = model_name
+        self.capacity = capacity
+        self.ttl_seconds = ttl_seconds
+        self.path = path
+        self._lock = threading.Lock()
+        self._slab = None
+        self._entries: OrderedDict[bytes, tuple[int, float]] = OrderedDict()
+        self._free: list[int] = []
+        self._unsaved = 0
+        self._loaded = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _allocate(self, dim: int):
+        self._slab = np.zeros((self.capacity, dim), dtype=np.float32)
+        self._free = list(range(self.capacity - 1, -1, -1))
+
+    def _expiry(self) -> float:
+        return time.time() + self.ttl_seconds if self.ttl_seconds > 0 else float('inf')
+
+    @property
+    def enabled(self) -> bool:
+        return self.capacity > 0
+
+    def _ensure_loaded(self):
+        if self._loaded or not self.enabled:
+            return
+        self._loaded = True
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path, allow_pickle=False) as data:
+                if str(data['model']) != self.model_name:
+                    return
+                keys, vectors, expires = data['keys'], data['vectors'], data['expires']
+        except Exception as exc:
+            print(f"[WARN] Embedding cache file ignored: {exc}")
+            return
+
+        now = time.time()
+        live = expires > now
+        keys, vectors, expires = keys[live][-self.capacity:], vectors[live][-self.capacity:], expires[live][-self.capacity:]
+        if not len(keys):
+            return
+        self._allocate(vectors.shape[1])
+        for key, vector, expires_at in zip(keys, vectors, expires):
+            slot = self._free.pop()
+            self._slab[slot] = vector
+            self._entries[bytes(key)] = (slot, float(expires_at))
+        print(f"[INFO] Embedding cache loaded {len(keys)} entries")
+
+    def get(self, text: str):
+        """Cached vector (float32 copy) for ``text``, or None."""
+        if not self.enabled:
+            return None
+        key = _text_key(text)
+        with self._lock:
+            self._ensure_loaded()
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            slot, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                self._free.append(slot)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return self._slab[slot].copy()
+
+    def put(self, text: str, vector):
+        if not self.enabled:
+            return
+        vector = np.asarray(vector, dtype=np.float32)
+        key = _text_key(text)
+        with self._lock:
+            self._ensure_loaded()
+            if self._slab is None:
+                self._allocate(vector.shape[0])
+            if vector.shape[0] != self._slab.shape[1]:
+                return  # A different model's dimension; never mix them in one slab
+
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                slot = entry[0]
+            elif self._free:
+                slot = self._free.pop()
+            else:
+                _, (slot, _) = self._entries.popitem(last=False)
+                self.evictions += 1
+            self._slab[slot] = vector
+            self._entries[key] = (slot, self._expiry())
+
+            self._unsaved += 1
+            save_now = self.path and self._unsaved >= _SAVE_EVERY
+        if save_now:
+            self.save()
+
+    def save(self):
+        """Write live entries to ``path`` (atomically, via a temp file)."""
+        if not self.path or not self.enabled:
+            return
+        with self._lock:
+            if self._slab is None or not self._entries:
+                return
+            keys = np.array(list(self._entries), dtype='S16')
+            slots = [slot for slot, _ in self._entries.values()]
+            expires = np.array([expires_at for _, expires_at in self._entries.values()], dtype=np.float64)
+            vectors = self._slab[slots]
+            self._unsaved = 0
+        temp_path = None
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            # A unique temp file per save, so workers sharing the path never write into each other's file
+            handle, temp_path = tempfile.mkstemp(dir=directory, prefix='.embedding-cache-', suffix='.npz')
+            with os.fdopen(handle, 'wb') as temp_file:
+                np.savez(temp_file, model=np.array(self.model_name), keys=keys, vectors=vectors, expires=expires)
+            os.replace(temp_path, self.path)
+        except Exception as exc:
+            print(f"[WARN] Embedding cache could not be saved: {exc}")
+            if temp_path is not None and os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self._entries),
+            'capacity': self.capacity,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+        }
+
+
+embedding_cache = EmbeddingCache(
+    model_name='all-MiniLM-L6-v2',
+    capacity=int(os.getenv('EMBEDDING_CACHE_SIZE', '10000')),
+    ttl_seconds=float(os.getenv('EMBEDDING_CACHE_TTL_SECONDS', '604800')),
+    path=os.getenv('EMBEDDING_CACHE_PATH') or None,
+)
+atexit.register(embedding_cache.save)
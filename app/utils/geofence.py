@@ -0,0 +1,291 @@
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from app.utils.redis_client import get_redis_client
+from app.utils.sns_helper import send_push_notification
+
+EARTH_RADIUS_M = 6_371_000.0
+_STATE_KEY_PREFIX = 'geofence:state:'
+ZONES_VERSION_KEY = 'geofence:zones_version'
+# How often a worker asks Redis whether another worker changed the zones
+_VERSION_CHECK_SECONDS = 1.0
+_EPOCH = datetime(1970, 1, 1)
+
+_notification_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='geofence-notify')
+
+
+def _cell_size_degrees() -> float:
+    return float(os.getenv('GEOFENCE_CELL_DEGREES', '0.01'))
+
+
+def _max_zone_cells() -> int:
+    return int(os.getenv('GEOFENCE_MAX_ZONE_CELLS', '2500'))
+
+
+def _reload_seconds() -> float:
+    return float(os.getenv('GEOFENCE_RELOAD_SECONDS', '60'))
+
+
+class Zone:
+    """A safe zone in memory: a circle (center + radius) or a polygon of ``[lon, lat]`` vertices."""
+
+    __slots__ = ('zone_id', 'patient_id', 'name', 'kind', 'center_lat', 'center_lon', 'radius_m', 'vertices', 'bbox')
+
+    def __init__(self, zone_id, patient_id, name, kind, center_lat=None, center_lon=None, radius_m=None, vertices=None):
+        self.zone_id = zone_id
+        self.patient_id = patient_id
+        self.name = name
+        self.kind = kind
+        self.center_lat = center_lat
+        self.center_lon = center_lon
+        self.radius_m = radius_m
+        self.vertices = vertices or []
+        self.bbox = self._bounding_box()
+
+    def _bounding_box(self):
+        if self.kind == 'circle':
+            lat_delta = math.degrees(self.radius_m / EARTH_RADIUS_M)
+            lon_delta = lat_delta / max(math.cos(math.radians(self.center_lat)), 1e-6)
+            return (
+                self.center_lat - lat_delta,
+                self.center_lon - lon_delta,
+                self.center_lat + lat_delta,
+                self.center_lon + lon_delta,
+            )
+        lons = [vertex[0] for vertex in self.vertices]
+        lats = [vertex[1] for vertex in self.vertices]
+        return min(lats), min(lons), max(lats), max(lons)
+
+    def center(self):
+        if self.kind == 'circle':
+            return self.center_lat, self.center_lon
+        return (
+            sum(vertex[1] for vertex in self.vertices) / len(self.vertices),
+            sum(vertex[0] for vertex in self.vertices) / len(self.vertices),
+        )
+
+    def contains(self, lat: float, lon: float) -> bool:
+        if self.kind == 'circle':
+            return haversine_m(lat, lon, self.center_lat, self.center_lon) <= self.radius_m
+
+        # Ray casting; the zones are small enough to treat lon/lat as planar
+        inside = False
+        vertices = self.vertices
+        j = len(vertices) - 1
+        for i in range(len(vertices)):
+            xi, yi = vertices[i]
+            xj, yj = vertices[j]
+            if (yi > lat) != (yj > lat) and lon < (xj - xi) * (lat - yi) / (yj - yi) + xi:
+                inside = not inside
+            j = i
+        return inside
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+class GeofenceEngine:
+    """Evaluates GPS points against patients' safe zones.
+
+    Zones are bucketed into a fixed lat/lon grid (``GEOFENCE_CELL_DEGREES``), so a
+    point is only tested against the zones whose bounding boxes touch its cell;
+    the cost of a lookup does not grow with the total number of zones. A zone
+    covering more than ``GEOFENCE_MAX_ZONE_CELLS`` cells (one stored before
+    zone sizes were capped, say) is kept in a short list tested on every
+    lookup instead of being spread over the grid. The set
+    of zones each device was last inside is remembered (in Redis when
+    ``REDIS_URL`` is set) to turn points into enter/exit events. With Redis,
+    zone changes also bump a shared version key, so every worker reloads its
+    index within a second instead of at the next periodic reload.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._grid: dict[tuple[int, int], list[Zone]] = {}
+        self._wide_zones: list[Zone] = []
+        self._device_patients: dict[str, dict] = {}
+        self._homes: dict[str, tuple[float, float]] = {}
+        self._states: dict[str, tuple[float, frozenset]] = {}
+        self._loaded_at = None
+        self._loaded_version = None
+        self._version_checked_at = 0.0
+        self._cell = _cell_size_degrees()
+
+    def _cell_of(self, lat: float, lon: float):
+        return math.floor(lat / self._cell), math.floor(lon / self._cell)
+
+    def load(self, zones, device_patients: dict[str, dict], version: str | None = None):
+        """Replace the index.
+
+        ``device_patients`` maps a tracker id to ``{'patient_id', 'patient_name', 'notify_arn'}``;
+        ``version`` is the :meth:`shared_version` read before the zones were queried.
+        """
+        cell = _cell_size_degrees()
+        grid: dict[tuple[int, int], list[Zone]] = {}
+        wide_zones: list[Zone] = []
+        patient_homes: dict[str, tuple[float, float]] = {}
+        for zone in zones:
+            # A zone named "home" wins; otherwise the patient's first zone stands in for home
+            if zone.patient_id not in patient_homes or zone.name.strip().lower() == 'home':
+                patient_homes[zone.patient_id] = zone.center()
+            min_lat, min_lon, max_lat, max_lon = zone.bbox
+            lat_cells = range(math.floor(min_lat / cell), math.floor(max_lat / cell) + 1)
+            lon_cells = range(math.floor(min_lon / cell), math.floor(max_lon / cell) + 1)
+            if len(lat_cells) * len(lon_cells) > _max_zone_cells():
+                wide_zones.append(zone)
+                continue
+            for lat_cell in lat_cells:
+                for lon_cell in lon_cells:
+                    grid.setdefault((lat_cell, lon_cell), []).append(zone)
+        if wide_zones:
+            print(f"[GEOFENCE] {len(wide_zones)} zones too large for the grid are checked on every point")
+
+        with self._lock:
+            self._cell = cell
+            self._grid = grid
+            self._wide_zones = wide_zones
+            self._device_patients = dict(device_patients)
+            self._homes = {
+                device_id: patient_homes[patient['patient_id']]
+                for device_id, patient in device_patients.items()
+                if patient['patient_id'] in patient_homes
+            }
+            self._loaded_at = time.monotonic()
+            self._loaded_version = version
+
+    def shared_version(self) -> str | None:
+        """The zones version all workers agree on, or None without Redis."""
+        client = get_redis_client()
+        if client is None:
+            return None
+        try:
+            return client.get(ZONES_VERSION_KEY) or '0'
+        except Exception as exc:
+            print(f"[GEOFENCE] Redis version read failed: {exc}")
+            return None
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > _reload_seconds():
+            return True
+        now = time.monotonic()
+        if now - self._version_checked_at < _VERSION_CHECK_SECONDS:
+            return False
+        self._version_checked_at = now
+        version = self.shared_version()
+        return version is not None and version != self._loaded_version
+
+    def invalidate(self):
+        """Mark the index stale here and, with Redis, in every other worker."""
+        self._loaded_at = None
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.incr(ZONES_VERSION_KEY)
+            except Exception as exc:
+                print(f"[GEOFENCE] Redis version bump failed: {exc}")
+
+    def home_for_device(self, device_id: str):
+        """``(lat, lon)`` of the device's patient's home zone, or None."""
+        return self._homes.get(device_id)
+
+    def zones_at(self, patient_id: str, lat: float, lon: float) -> frozenset:
+        candidates = self._grid.get(self._cell_of(lat, lon), ())
+        return frozenset(
+            zone.zone_id
+            for zone in itertools.chain(candidates, self._wide_zones)
+            if zone.patient_id == patient_id and zone.contains(lat, lon)
+        )
+
+    def _swap_state(self, device_id: str, epoch: float, inside: frozenset):
+        """Store the new state and return ``(previous_inside, first_seen)``; ``previous_inside`` is None for out-of-order points."""
+        client = get_redis_client()
+        if client is not None:
+            try:
+                raw = client.set(
+                    _STATE_KEY_PREFIX + device_id,
+                    json.dumps({'ts': epoch, 'inside': sorted(inside)}),
+                    get=True,
+                )
+                if raw is None:
+                    return frozenset(), True
+                previous = json.loads(raw)
+                if previous['ts'] > epoch:
+                    # Put the newer state back; this point arrived late
+                    client.set(_STATE_KEY_PREFIX + device_id, raw)
+                    return None, False
+                return frozenset(previous['inside']), False
+            except Exception as exc:
+                print(f"[GEOFENCE] Redis state update failed: {exc}")
+
+        with self._lock:
+            previous = self._states.get(device_id)
+            if previous is not None and previous[0] > epoch:
+                return None, False
+            self._states[device_id] = (epoch, inside)
+        if previous is None:
+            return frozenset(), True
+        return previous[1], False
+
+    def evaluate(self, device_id: str, lat: float, lon: float, timestamp) -> list[dict]:
+        """Return enter/exit events caused by a new point of ``device_id``."""
+        patient = self._device_patients.get(device_id)
+        if patient is None:
+            return []
+
+        inside = self.zones_at(patient['patient_id'], lat, lon)
+        previous, first_seen = self._swap_state(device_id, (timestamp - _EPOCH).total_seconds(), inside)
+        if previous is None or first_seen:
+            # No trustworthy prior state: record where the device is without alerting
+            return []
+
+        events = []
+        for zone_id in previous - inside:
+            events.append({'type': 'exit', 'zone_id': zone_id})
+        for zone_id in inside - previous:
+            events.append({'type': 'enter', 'zone_id': zone_id})
+
+        for event in events:
+            event.update({
+                'device_id': device_id,
+                'patient_id': patient['patient_id'],
+                'patient_name': patient.get('patient_name'),
+                'notify_arn': patient.get('notify_arn'),
+                'lat': lat,
+                'lon': lon,
+                'timestamp': timestamp,
+                'breach': event['type'] == 'exit' and not inside,
+                'returned': event['type'] == 'enter' and not previous,
+            })
+        return events
+
+
+def _send_breach_notification(event: dict):
+    name = event.get('patient_name') or 'المريض'
+    if event['breach']:
+        title = 'تنبيه: خروج من المنطقة الآمنة 🚨'
+        body = f"{name} غادر المنطقة الآمنة. آخر موقع: {event['lat']:.5f}, {event['lon']:.5f}"
+    else:
+        title = 'عودة إلى المنطقة الآمنة ✅'
+        body = f"{name} عاد إلى المنطقة الآمنة."
+    send_push_notification(event['notify_arn'], title, body)
+
+
+def dispatch_geofence_notifications(events: list[dict]):
+    """Push breach / return alerts without blocking the ingest request."""
+    for event in events:
+        if (event['breach'] or event['returned']) and event.get('notify_arn'):
+            _notification_executor.submit(_send_breach_notification, event)
+
+
+geofence_engine = GeofenceEngine()
@@ -0,0 +1,85 @@
+import struct
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.utils.segment_codec import COORDINATE_SCALE, epoch_ms_to_datetimes
+
+CONTENT_TYPE = 'application/vnd.gps-points'
+FORMAT_VERSION = 1
+
+_MAGIC = b'GPSP'
+# magic, version, reserved, device id length (bytes)
+_HEADER = struct.Struct('<4sBBH')
+# One point: epoch milliseconds, latitude and longitude in int32 microdegrees
+RECORD_DTYPE = np.dtype([('timestamp', '<i8'), ('lat', '<i4'), ('lon', '<i4')])
+_RECORD = struct.Struct('<qii')
+# Up to this many points struct beats numpy, whose fixed per-call cost dominates tiny payloads
+_STRUCT_MAX_POINTS = 16
+
+_EPOCH = datetime(1970, 1, 1)
+_LAT_LIMIT = 90 * COORDINATE_SCALE
+_LON_LIMIT = 180 * COORDINATE_SCALE
+
+
+def encode_points(device_id: str, epoch_ms, lat, lon) -> bytes:
+    """Build a binary payload for one device (used by trackers, tests and benchmarks).
+
+    Layout: header, UTF-8 device id, then 16-byte records of
+    ``(int64 epoch ms, int32 lat, int32 lon)``, little endian.
+    """
+    device_bytes = device_id.encode('utf-8')
+    records = np.empty(len(epoch_ms), dtype=RECORD_DTYPE)
+    records['timestamp'] = np.asarray(epoch_ms, dtype=np.int64)
+    records['lat'] = np.round(np.asarray(lat, dtype=np.float64) * COORDINATE_SCALE)
+    records['lon'] = np.round(np.asarray(lon, dtype=np.float64) * COORDINATE_SCALE)
+    return _HEADER.pack(_MAGIC, FORMAT_VERSION, 0, len(device_bytes)) + device_bytes + records.tobytes()
+
+
+def _check_range(lat_fixed, lon_fixed):
+    if abs(lat_fixed) > _LAT_LIMIT or abs(lon_fixed) > _LON_LIMIT:
+        raise ValueError('Coordinates out of range')
+
+
+def decode_points(payload: bytes):
+    """Return ``(device_id, points)`` for a payload produced by :func:`encode_points`.
+
+    ``points`` is a list of ``(lat, lon, timestamp)`` with naive UTC datetimes.
+    Batches are read with ``numpy.frombuffer`` straight over the request body
+    and converted column by column; a handful of points is cheaper to unpack
+    with ``struct`` than to pay numpy's per-call overhead.
+    """
+    if len(payload) < _HEADER.size:
+        raise ValueError('Binary GPS payload is too short')
+
+    magic, version, _, device_length = _HEADER.unpack_from(payload, 0)
+    if magic != _MAGIC or version != FORMAT_VERSION:
+        raise ValueError('Unsupported binary GPS payload')
+
+    offset = _HEADER.size + device_length
+    device_id = payload[_HEADER.size:offset].decode('utf-8').strip()
+    if not device_id:
+        raise ValueError('Device id is required')
+
+    body_length = len(payload) - offset
+    if body_length <= 0 or body_length % RECORD_DTYPE.itemsize:
+        raise ValueError('Binary GPS payload has a truncated point')
+
+    if body_length // RECORD_DTYPE.itemsize <= _STRUCT_MAX_POINTS:
+        points = []
+        for epoch_ms, lat_fixed, lon_fixed in _RECORD.iter_unpack(memoryview(payload)[offset:]):
+            _check_range(lat_fixed, lon_fixed)
+            points.append((
+                lat_fixed / COORDINATE_SCALE,
+                lon_fixed / COORDINATE_SCALE,
+                _EPOCH + timedelta(milliseconds=epoch_ms),
+            ))
+        return device_id, points
+
+    records = np.frombuffer(payload, dtype=RECORD_DTYPE, offset=offset)
+    _check_range(int(np.abs(records['lat'], dtype=np.int64).max()), int(np.abs(records['lon'], dtype=np.int64).max()))
+    return device_id, list(zip(
+        (records['lat'] / COORDINATE_SCALE).tolist(),
+        (records['lon'] / COORDINATE_SCALE).tolist(),
+        epoch_ms_to_datetimes(records['timestamp']),
+    ))
@@ -0,0 +1,98 @@
+import json
+from xml.sax.saxutils import escape
+
+# Points are flushed to the client in groups so each yielded chunk is a few
+# kilobytes rather than one tiny write per point.
+CHUNK_POINTS = 500
+
+CONTENT_TYPES = {
+    'json': 'application/json',
+    'ndjson': 'application/x-ndjson',
+    'geojson': 'application/geo+json',
+    'gpx': 'application/gpx+xml',
+}
+
+DOWNLOAD_EXTENSIONS = {
+    'geojson': 'geojson',
+    'gpx': 'gpx',
+}
+
+
+def _isoformat(timestamp):
+    return timestamp.isoformat() if timestamp else None
+
+
+def _chunked(parts):
+    buffer = []
+    for part in parts:
+        buffer.append(part)
+        if len(buffer) >= CHUNK_POINTS:
+            yield ''.join(buffer)
+            buffer = []
+    if buffer:
+        yield ''.join(buffer)
+
+
+def iter_json_array(points):
+    """Stream ``[{"lat", "lon", "timestamp"}, ...]``, the classic history payload."""
+    def parts():
+        separator = ''
+        for lat, lon, timestamp in points:
+            yield separator + json.dumps({'lat': lat, 'lon': lon, 'timestamp': _isoformat(timestamp)})
+            separator = ','
+
+    yield '['
+    yield from _chunked(parts())
+    yield ']'
+
+
+def iter_ndjson(points):
+    """Stream one JSON object per line."""
+    yield from _chunked(
+        json.dumps({'lat': lat, 'lon': lon, 'timestamp': _isoformat(timestamp)}) + '\n'
+        for lat, lon, timestamp in points
+    )
+
+
+def iter_geojson(points, device_id: str):
+    """Stream a FeatureCollection of Point features carrying their timestamps."""
+    def parts():
+        separator = ''
+        for lat, lon, timestamp in points:
+            feature = {
+                'type': 'Feature',
+                'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+                'properties': {'device': device_id, 'timestamp': _isoformat(timestamp)},
+            }
+            yield separator + json.dumps(feature)
+            separator = ','
+
+    yield '{"type":"FeatureCollection","features":['
+    yield from _chunked(parts())
+    yield ']}'
+
+
+def iter_gpx(points, device_id: str):
+    """Stream a GPX 1.1 document with a single track segment."""
+    def parts():
+        for lat, lon, timestamp in points:
+            time_tag = f'<time>{timestamp.isoformat()}Z</time>' if timestamp else ''
+            yield f'<trkpt lat="{lat}" lon="{lon}">{time_tag}</trkpt>\n'
+
+    yield (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="AlzWare" xmlns="http://www.topografix.com/GPX/1/1">\n'
+        f'<trk><name>{escape(device_id)}</name><trkseg>\n'
+    )
+    yield from _chunked(parts())
+    yield '</trkseg></trk>\n</gpx>\n'
+
+
+def iter_export(points, export_format: str, device_id: str):
+    if export_format == 'ndjson':
+        return iter_ndjson(points)
+    if export_format == 'geojson':
+        return iter_geojson(points, device_id)
+    if export_format == 'gpx':
+        return iter_gpx(points, device_id)
+    return iter_json_array(points)
@@ -0,0 +1,365 @@
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime
+
+from sqlalchemy.exc import DataError, IntegrityError
+
+try:
+    import fcntl
+except ImportError:  # Windows: no way to tell a live worker's spool from a dead one's, so no spool
+    fcntl = None
+
+ACCEPTED = 'accepted'
+
+# Errors caused by a point itself (bad value, too long, constraint); anything else is
+# treated as the database being unavailable and the batch is retried as a whole
+_REJECTED_ERRORS = (DataError, IntegrityError, ValueError, TypeError)
+
+
+def pipeline_enabled() -> bool:
+    return os.getenv('GPS_WRITE_PIPELINE', 'false').lower() == 'true'
+
+
+def _batch_size() -> int:
+    return max(1, int(os.getenv('GPS_WRITE_BATCH_SIZE', '200')))
+
+
+def _max_delay_seconds() -> float:
+    return float(os.getenv('GPS_WRITE_MAX_DELAY_MS', '20')) / 1000.0
+
+
+def _ack_on_spool() -> bool:
+    return os.getenv('GPS_WRITE_ACK', 'commit').lower() == 'spool'
+
+
+def _queue_limit() -> int:
+    return int(os.getenv('GPS_WRITE_QUEUE_LIMIT', '10000'))
+
+
+def _max_attempts() -> int:
+    return int(os.getenv('GPS_WRITE_MAX_ATTEMPTS', '5'))
+
+
+class PendingPoint:
+    """A queued point and the handle its request waits on."""
+
+    __slots__ = ('point', 'result', 'error', 'rejected', 'spooled', 'attempts', '_done')
+
+    def __init__(self, point: tuple):
+        self.point = point
+        self.result = None
+        self.error = None
+        self.rejected = False
+        self.spooled = False
+        self.attempts = 0
+        self._done = threading.Event()
+
+    def resolve(self, result: str | None = None, error: str | None = None, rejected: bool = False):
+        if self._done.is_set():
+            return
+        self.result = result
+        self.error = error
+        self.rejected = rejected
+        self._done.set()
+
+    def wait(self, timeout: float) -> bool:
+        return self._done.wait(timeout)
+
+
+class _Spool:
+    """Append-only file of points not yet committed, fsynced once per batch.
+
+    Each worker process writes its own file, named after its pid plus a
+    random suffix so a restarted worker that gets a crashed one's pid does
+    not reopen (and later truncate) its leftovers. The file is locked before
+    it appears under its final name; on startup every file whose lock can
+    be taken belongs to a worker that is gone and is replayed and removed.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, f'gps-{os.getpid()}-{uuid.uuid4().hex[:12]}.spool')
+        # Lock under a name the orphan scan does not match, so no other worker can claim the new file
+        self._file = open(f'{self.path}.new', 'w', encoding='utf-8')
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        os.replace(f'{self.path}.new', self.path)
+
+    def append(self, points):
+        for device_id, lat, lon, timestamp in points:
+            self._file.write(json.dumps([device_id, lat, lon, timestamp.isoformat()]) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def truncate(self):
+        self._file.truncate(0)
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def set_aside(self, points):
+        """Write points that could not be committed to a file of their own, replayed on the next start."""
+        path = os.path.join(self.directory, f'gps-aside-{uuid.uuid4().hex[:12]}.spool')
+        with open(f'{path}.new', 'w', encoding='utf-8') as handle:
+            for device_id, lat, lon, timestamp in points:
+                handle.write(json.dumps([device_id, lat, lon, timestamp.isoformat()]) + '\n')
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(f'{path}.new', path)
+        return path
+
+    def orphaned_files(self):
+        """Spool files left behind by workers that are no longer running."""
+        for path in sorted(glob.glob(os.path.join(self.directory, 'gps-*.spool'))):
+            if path == self.path:
+                continue
+            handle = open(path, 'r+', encoding='utf-8')
+            try:
+                fcntl.flock(handle.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                handle.close()  # Still owned by a live worker
+                continue
+            yield path, handle
+
+    @staticmethod
+    def read_points(handle):
+        points = []
+        for line in handle:
+            try:
+                device_id, lat, lon, timestamp = json.loads(line)
+                points.append((device_id, lat, lon, datetime.fromisoformat(timestamp)))
+            except ValueError:
+                continue  # A torn last line from a crash mid-write
+        return points
+
+
+class _WriteInterrupted(Exception):
+    """The database failed for a reason other than the points; ``outcomes`` holds what was written before."""
+
+    def __init__(self, outcomes: list, error: Exception):
+        super().__init__(str(error))
+        self.outcomes = outcomes
+        self.error = error
+
+
+class GpsWritePipeline:
+    """Queues accepted GPS points and writes them in group commits from one thread.
+
+    A batch is flushed once it holds ``GPS_WRITE_BATCH_SIZE`` points or its
+    oldest point has waited ``GPS_WRITE_MAX_DELAY_MS``. Before touching the
+    database the batch is appended to a spool file and fsynced, so points
+    survive a crash and are replayed on the next start. With
+    ``GPS_WRITE_ACK=commit`` (default) a request returns once its batch is
+    committed; with ``GPS_WRITE_ACK=spool`` it returns once the batch is in
+    the spool, which is faster but acknowledges before the database has it.
+
+    A batch the database rejects because of its data is split in halves until
+    the offending points stand alone, so a bad point fails only its own
+    request and the rest of the batch is committed.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._queue: list[PendingPoint] = []
+        self._retry: list[PendingPoint] = []
+        self._thread = None
+        self._pid = None
+        self._app = None
+        self._write_batch = None
+        self._after_commit = None
+        self._spool = None
+
+    def configure(self, app, write_batch, after_commit):
+        """``write_batch(points)`` stores and commits points, returning one action each; ``after_commit(point, action)`` runs once they are durable."""
+        self._app = app
+        self._write_batch = write_batch
+        self._after_commit = after_commit
+
+    def _ensure_started(self):
+        # Started lazily so a pre-forking server gets one writer per worker process
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._spool = None
+            if os.getenv('GPS_WRITE_SPOOL', 'true').lower() == 'true':
+                if fcntl is None:
+                    print("[GPS WRITER] Spool disabled: files cannot be locked on this platform, "
+                          "so a starting worker would replay and delete live workers' spools")
+                else:
+                    spool_dir = os.getenv('GPS_WRITE_SPOOL_DIR') or os.path.join(self._app.instance_path, 'gps_spool')
+                    self._spool = _Spool(spool_dir)
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='gps-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, point: tuple) -> PendingPoint:
+        """Queue ``(device_id, lat, lon, timestamp)``; wait on the returned handle for the outcome."""
+        self._ensure_started()
+        pending = PendingPoint(point)
+        with self._lock:
+            if len(self._queue) >= _queue_limit():
+                raise OverflowError('GPS write queue is full')
+            self._queue.append(pending)
+            self._ready.notify()
+        return pending
+
+    def _take_batch(self) -> list[PendingPoint]:
+        size = _batch_size()
+        with self._lock:
+            while not self._queue and not self._retry:
+                self._ready.wait()
+            if not self._retry:
+                # Hold the first point at most the max delay while the batch fills up
+                deadline = time.monotonic() + _max_delay_seconds()
+                while len(self._queue) < size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._ready.wait(remaining)
+            batch = self._retry + self._queue[:size]
+            self._retry = []
+            del self._queue[:size]
+        return batch
+
+    def _run(self):
+        self._replay_orphans()
+        while True:
+            batch = self._take_batch()
+            try:
+                self._process(batch)
+            except Exception as exc:
+                print(f"[GPS WRITER] Batch of {len(batch)} points failed: {exc}")
+                for pending in batch:
+                    pending.resolve(error=str(exc))
+
+    def _write_isolated(self, points: list) -> list:
+        """Commit ``points`` and return one outcome each: the action, or the error that rejected the point.
+
+        Raises :class:`_WriteInterrupted` on any other failure, with ``None``
+        as the outcome of every point not yet committed.
+        """
+        outcomes = [None] * len(points)
+        parts = [(0, len(points))]
+        while parts:
+            start, end = parts.pop()
+            try:
+                outcomes[start:end] = self._write_batch(points[start:end])
+            except _REJECTED_ERRORS as exc:
+                if end - start == 1:
+                    outcomes[start] = exc
+                    continue
+                middle = (start + end) // 2
+                parts += [(middle, end), (start, middle)]
+            except Exception as exc:
+                raise _WriteInterrupted(outcomes, exc) from exc
+        return outcomes
+
+    def _process(self, batch: list[PendingPoint]):
+        fresh = [pending for pending in batch if not pending.spooled]
+        if self._spool is not None and fresh:
+            self._spool.append([pending.point for pending in fresh])
+            for pending in fresh:
+                pending.spooled = True
+                if _ack_on_spool():
+                    pending.resolve(ACCEPTED)
+
+        with self._app.app_context():
+            try:
+                outcomes = self._write_isolated([pending.point for pending in batch])
+            except _WriteInterrupted as interrupted:
+                print(f"[GPS WRITER] Group commit of {len(batch)} points failed: {interrupted.error}")
+                written = [(pending, outcome) for pending, outcome in zip(batch, interrupted.outcomes) if outcome is not None]
+                self._finish(written)
+                self._requeue([pending for pending, outcome in zip(batch, interrupted.outcomes) if outcome is None], interrupted.error)
+                return
+
+            if self._spool is not None:
+                self._spool.truncate()
+            self._finish(list(zip(batch, outcomes)))
+
+    def _finish(self, written: list):
+        """Answer the requests of written or rejected points and run the post-commit steps of the written ones."""
+        for pending, outcome in written:
+            if isinstance(outcome, Exception):
+                print(f"[GPS WRITER] Rejected point of {pending.point[0]}: {outcome}")
+                pending.resolve(error=str(outcome), rejected=True)
+            else:
+                pending.resolve(outcome)
+        for pending, outcome in written:
+            if isinstance(outcome, Exception):
+                continue
+            try:
+                self._after_commit(pending.point, outcome)
+            except Exception as exc:
+                print(f"[GPS WRITER] Post-commit step failed for {pending.point[0]}: {exc}")
+
+    def _requeue(self, batch: list[PendingPoint], exc: Exception):
+        """Fail points whose requests are still waiting; keep already-acknowledged ones for another try.
+
+        Acknowledged points that run out of attempts are set aside in a spool
+        file of their own for the next start instead of being dropped.
+        """
+        retry = []
+        exhausted = []
+        for pending in batch:
+            pending.attempts += 1
+            if not _ack_on_spool():
+                pending.resolve(error=str(exc))
+            elif pending.attempts >= _max_attempts():
+                pending.resolve(error=str(exc))
+                exhausted.append(pending)
+            else:
+                retry.append(pending)
+
+        if exhausted:
+            if self._spool is not None:
+                try:
+                    path = self._spool.set_aside([pending.point for pending in exhausted])
+                    print(f"[GPS WRITER] Set aside {len(exhausted)} points in {os.path.basename(path)} after {_max_attempts()} attempts")
+                except OSError as aside_exc:
+                    print(f"[GPS WRITER] Dropping {len(exhausted)} points, could not set them aside: {aside_exc}")
+            else:
+                print(f"[GPS WRITER] Dropping {len(exhausted)} points after {_max_attempts()} attempts")
+
+        if self._spool is not None and not retry:
+            self._spool.truncate()
+        with self._lock:
+            self._retry = retry + self._retry
+        if retry:
+            time.sleep(min(2 ** retry[0].attempts * 0.1, 5.0))
+
+    def _replay_orphans(self):
+        if self._spool is None:
+            return
+        for path, handle in self._spool.orphaned_files():
+            try:
+                points = self._spool.read_points(handle)
+                size = _batch_size()
+                rejected = 0
+                with self._app.app_context():
+                    for start in range(0, len(points), size):
+                        chunk = points[start:start + size]
+                        for point, outcome in zip(chunk, self._write_isolated(chunk)):
+                            if isinstance(outcome, Exception):
+                                rejected += 1
+                                print(f"[GPS WRITER] Rejected replayed point of {point[0]}: {outcome}")
+                            else:
+                                self._after_commit(point, outcome)
+                handle.close()
+                os.remove(path)
+                print(f"[GPS WRITER] Replayed {len(points) - rejected} points from {os.path.basename(path)}")
+            except Exception as exc:
+                if isinstance(exc, _WriteInterrupted):
+                    exc = exc.error
+                print(f"[GPS WRITER] Replay of {path} failed, will retry on next start: {exc}")
+            finally:
+                handle.close()
+
+
+gps_write_pipeline = GpsWritePipeline()
@@ -0,0 +1,89 @@
+import os
+import queue
+import threading
+from multiprocessing.connection import Client
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# Defaults and README placeholders; multiprocessing unpickles what it receives, so they must never be the key
+_PLACEHOLDER_KEYS = frozenset({'dev-secret-key', 'CHANGE_ME_TO_A_SECURE_VALUE'})
+
+
+def inference_authkey() -> bytes:
+    key = os.getenv('INFERENCE_AUTHKEY') or os.getenv('SECRET_KEY')
+    if not key or key in _PLACEHOLDER_KEYS:
+        raise InferenceError('Inference authkey not configured (set INFERENCE_AUTHKEY or SECRET_KEY).')
+    return key.encode('utf-8')
+
+
+def _timeout_seconds() -> float:
+    return float(os.getenv('INFERENCE_TIMEOUT_SECONDS', '120'))
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+class InferenceClient:
+    """Calls the local inference server (``python -m app.inference_server``) over its Unix socket.
+
+    Connections are pooled; each one carries a single request at a time, so
+    concurrent requests from one worker use separate connections and are
+    queued by the server's scheduler, not here.
+    """
+
+    def __init__(self, address: str):
+        self.address = address
+        self._pool: queue.LifoQueue = queue.LifoQueue()
+
+    def _connect(self):
+        return Client(self.address, family='AF_UNIX', authkey=inference_authkey())
+
+    def call(self, method: str, *args):
+        for attempt in range(2):
+            try:
+                conn = self._pool.get_nowait()
+                pooled = True
+            except queue.Empty:
+                try:
+                    conn = self._connect()
+                except OSError as exc:
+                    raise InferenceError(f'Inference server unavailable: {exc}') from exc
+                pooled = False
+
+            try:
+                conn.send((method, args))
+                answered = conn.poll(_timeout_seconds())
+                if answered:
+                    status, value = conn.recv()
+            except (EOFError, OSError) as exc:
+                conn.close()
+                # A pooled connection may have been closed by a server restart; retry once on a fresh one
+                if pooled and attempt == 0:
+                    continue
+                raise InferenceError(f'Inference server unavailable: {exc}') from exc
+
+            if not answered:
+                # The late answer would be read by the next request on this connection
+                conn.close()
+                raise InferenceError(f'Inference server did not answer {method} in time')
+
+            self._pool.put(conn)
+            if status == 'error':
+                raise InferenceError(value)
+            return value
+
+
+def get_inference_client() -> InferenceClient | None:
+    """The shared client when ``INFERENCE_SOCKET`` is set, otherwise None (models run in-process)."""
+    global _client
+    address = os.getenv('INFERENCE_SOCKET')
+    if not address:
+        return None
+    if _client is None or _client.address != address:
+        with _client_lock:
+            if _client is None or _client.address != address:
+                _client = InferenceClient(address)
+    return _client
@@ -0,0 +1,117 @@
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+from app.utils.geofence import haversine_m
+
+STORE = 'stored'
+MERGE = 'merged'
+DUPLICATE = 'duplicate'
+
+# Recent timestamps remembered per device to catch retried points that are not the latest
+_RECENT_TIMESTAMPS = 32
+
+
+def _radius_m() -> float:
+    return float(os.getenv('GPS_STATIONARY_RADIUS_M', '15'))
+
+
+def _max_dwell_seconds() -> float:
+    return float(os.getenv('GPS_STATIONARY_MAX_SECONDS', '300'))
+
+
+class _DeviceState:
+    __slots__ = ('lat', 'lon', 'timestamp', 'dwell_until', 'dwell_count', 'recent')
+
+    def __init__(self, lat, lon, timestamp, dwell_until=None, dwell_count=0):
+        self.lat = lat
+        self.lon = lon
+        self.timestamp = timestamp
+        self.dwell_until = dwell_until
+        self.dwell_count = dwell_count or 0
+        self.recent = deque([timestamp], maxlen=_RECENT_TIMESTAMPS)
+
+
+class StationaryFilter:
+    """Decides whether an incoming point is stored, merged into the previous one, or dropped.
+
+    A point within ``GPS_STATIONARY_RADIUS_M`` meters and ``GPS_STATIONARY_MAX_SECONDS``
+    seconds of the device's previously stored point is merged: the stored row's
+    ``dwell_until`` is extended and its ``dwell_count`` incremented instead of
+    inserting a new row. Once the window runs out the next point is stored again,
+    so a stationary device still leaves one row every few minutes. Points with a
+    timestamp already seen for the device (tracker retries) are dropped.
+    Set ``GPS_STATIONARY_RADIUS_M=0`` to disable merging.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states: dict[str, _DeviceState] = {}
+
+    def classify(self, device_id: str, lat: float, lon: float, timestamp: datetime, loader=None, is_stored=None):
+        """Return ``(action, anchor)``; on MERGE ``anchor`` is ``(timestamp, dwell_until, dwell_count)`` to write to the stored row.
+
+        ``dwell_until`` is the latest merged report, so an out-of-order point
+        inside the dwell never moves it back.
+
+        ``loader(device_id)`` is called for devices this worker has not seen yet and
+        should return ``(lat, lon, timestamp, dwell_until, dwell_count)`` of the
+        device's latest stored row, or None. ``is_stored(device_id, timestamp)``
+        is asked about late points older than the recent-timestamp window, so a
+        replayed offline buffer is not stored twice.
+        """
+        state = self._states.get(device_id)
+        if state is None and loader is not None:
+            seed = loader(device_id)
+            if seed is not None:
+                state = _DeviceState(*seed)
+                with self._lock:
+                    state = self._states.setdefault(device_id, state)
+
+        with self._lock:
+            if state is None:
+                self._states[device_id] = _DeviceState(lat, lon, timestamp)
+                return STORE, None
+
+            if timestamp in state.recent or timestamp in (state.timestamp, state.dwell_until):
+                return DUPLICATE, None
+
+            state.recent.append(timestamp)
+            late = timestamp < state.timestamp
+            if not late:
+                radius = _radius_m()
+                elapsed = (timestamp - state.timestamp).total_seconds()
+                if (
+                    radius > 0
+                    and elapsed <= _max_dwell_seconds()
+                    and haversine_m(lat, lon, state.lat, state.lon) <= radius
+                ):
+                    if state.dwell_until is None or timestamp > state.dwell_until:
+                        state.dwell_until = timestamp
+                    state.dwell_count += 1
+                    return MERGE, (state.timestamp, state.dwell_until, state.dwell_count)
+
+                recent = state.recent
+                state = _DeviceState(lat, lon, timestamp)
+                state.recent = recent
+                self._states[device_id] = state
+                return STORE, None
+
+        # Late point from an offline buffer: keep it, but do not move the anchor back
+        if late and is_stored is not None and is_stored(device_id, timestamp):
+            return DUPLICATE, None
+        return STORE, None
+
+    def anchor_position(self, device_id: str):
+        """``(lat, lon)`` of the stored point a device is currently dwelling at."""
+        state = self._states.get(device_id)
+        return (state.lat, state.lon) if state is not None else None
+
+    def forget(self, device_id: str):
+        """Drop cached state, e.g. after a failed write, so it is reloaded from the database."""
+        with self._lock:
+            self._states.pop(device_id, None)
+
+
+stationary_filter = StationaryFilter()
@@ -0,0 +1,281 @@
+import os
+import random
+import threading
+import time
+
+# Reply used whenever the model cannot be reached in time (same text the voice endpoint already used)
+FALLBACK_REPLY = "عذراً، لا يمكنني الرد حالياً."
+
+# google.api_core / transport errors worth another attempt, matched by class name so the
+# google packages are only imported by the Gemini loader
+RETRYABLE_ERRORS = frozenset({
+    'DeadlineExceeded',
+    'InternalServerError',
+    'ResourceExhausted',
+    'ServiceUnavailable',
+    'TooManyRequests',
+    'GatewayTimeout',
+    'ConnectionError',
+    'ConnectionResetError',
+    'TimeoutError',
+    'RemoteDisconnected',
+})
+
+
+def _max_concurrency() -> int:
+    return int(os.getenv('LLM_MAX_CONCURRENCY', '4'))
+
+
+def _queue_timeout_seconds() -> float:
+    return float(os.getenv('LLM_QUEUE_TIMEOUT_SECONDS', '5'))
+
+
+def _timeout_seconds() -> float:
+    return float(os.getenv('LLM_TIMEOUT_SECONDS', '30'))
+
+
+def _max_retries() -> int:
+    return int(os.getenv('LLM_MAX_RETRIES', '2'))
+
+
+def _retry_base_seconds() -> float:
+    return float(os.getenv('LLM_RETRY_BASE_MS', '250')) / 1000
+
+
+def _breaker_threshold() -> int:
+    return int(os.getenv('LLM_BREAKER_THRESHOLD', '5'))
+
+
+def _breaker_cooldown_seconds() -> float:
+    return float(os.getenv('LLM_BREAKER_COOLDOWN_SECONDS', '30'))
+
+
+def llm_backend() -> str:
+    return os.getenv('LLM_BACKEND', 'gemini').lower()
+
+
+class LLMUnavailableError(RuntimeError):
+    """The model could not answer: busy, timed out, failing, or the circuit is open."""
+
+
+def is_retryable(exc: Exception) -> bool:
+    return any(cls.__name__ in RETRYABLE_ERRORS for cls in type(exc).__mro__)
+
+
+class CircuitBreaker:
+    """Opens after ``LLM_BREAKER_THRESHOLD`` consecutive failures.
+
+    While open, calls fail immediately. After ``LLM_BREAKER_COOLDOWN_SECONDS``
+    one trial call is let through (half-open); its outcome closes the circuit
+    or opens it for another cooldown.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self._opened_at is None:
+            return 'closed'
+        if time.monotonic() - self._opened_at < _breaker_cooldown_seconds():
+            return 'open'
+        return 'half_open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self._trial_running:
+                self._trial_running = True
+                return True
+            return False
+
+    def release_trial(self):
+        with self._lock:
+            self._trial_running = False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._trial_running or self._failures >= _breaker_threshold():
+                if self._opened_at is None or self._trial_running:
+                    print(f"[WARN] LLM circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+            self._trial_running = False
+
+
+class LLMClient:
+    """Bounded, deadline-aware calls to a ``GenerativeModel``-like object.
+
+    At most ``LLM_MAX_CONCURRENCY`` calls run at once per worker; a caller
+    waits up to ``LLM_QUEUE_TIMEOUT_SECONDS`` for a slot. Each call has an
+    overall deadline of ``LLM_TIMEOUT_SECONDS`` shared by its attempts, and
+    retryable errors are retried up to ``LLM_MAX_RETRIES`` times with
+    jittered exponential backoff. Every way of not getting an answer raises
+    :class:`LLMUnavailableError`, so request threads never hang on the API.
+    """
+
+    def __init__(self, model):
+        # model() -> GenerativeModel-like object or None
+        self._model = model
+        self._slots = threading.BoundedSemaphore(_max_concurrency())
+        self.breaker = CircuitBreaker()
+        self.calls = 0
+        self.failures = 0
+        self.rejected = 0
+
+    def _acquire(self):
+        if not self.breaker.allow():
+            self.rejected += 1
+            raise LLMUnavailableError('LLM circuit open')
+        if not self._slots.acquire(timeout=_queue_timeout_seconds()):
+            self.rejected += 1
+            # Load shedding is not a model failure; only hand a half-open trial to the next caller
+            self.breaker.release_trial()
+            raise LLMUnavailableError('LLM busy')
+        if self.breaker.state == 'open':
+            # The circuit opened while this caller was queued
+            self._slots.release()
+            self.rejected += 1
+            raise LLMUnavailableError('LLM circuit open')
+
+    def _attempts(self, call):
+        """Run ``call(model, timeout)`` with retries inside the deadline; the caller holds a slot."""
+        model = self._model()
+        if model is None:
+            raise LLMUnavailableError('LLM not loaded')
+
+        deadline = time.monotonic() + _timeout_seconds()
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise LLMUnavailableError('LLM deadline exceeded')
+            try:
+                return call(model, remaining)
+            except Exception as exc:
+                if not is_retryable(exc) or attempt >= _max_retries():
+                    raise LLMUnavailableError(f'LLM call failed: {type(exc).__name__}: {exc}') from exc
+                backoff = _retry_base_seconds() * (2 ** attempt) * random.uniform(0.5, 1.5)
+                if time.monotonic() + backoff >= deadline:
+                    raise LLMUnavailableError('LLM deadline exceeded') from exc
+                time.sleep(backoff)
+                attempt += 1
+
+    def generate(self, prompt: str, safety_settings=None):
+        """The full response object (``.text`` may still raise ValueError on a safety block)."""
+        self._acquire()
+        self.calls += 1
+        try:
+            response = self._attempts(lambda model, timeout: model.generate_content(
+                prompt,
+                safety_settings=safety_settings,
+                request_options={'timeout': timeout},
+            ))
+        except LLMUnavailableError:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        finally:
+            self._slots.release()
+        self.breaker.record_success()
+        return response
+
+    def stream(self, prompt: str, safety_settings=None):
+        """Yield response chunks; the slot is held until the stream ends or is closed.
+
+        Only opening the stream is retried: once chunks have been forwarded a
+        failure raises :class:`LLMUnavailableError` mid-stream.
+        """
+        self._acquire()
+        self.calls += 1
+        try:
+            chunks = iter(self._attempts(lambda model, timeout: model.generate_content(
+                prompt,
+                safety_settings=safety_settings,
+                stream=True,
+                request_options={'timeout': timeout},
+            )))
+            for chunk in chunks:
+                yield chunk
+        except GeneratorExit:
+            # The client went away; the call neither failed nor proved the model healthy
+            self.breaker.release_trial()
+            raise
+        except LLMUnavailableError:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise
+        except Exception as exc:
+            self.failures += 1
+            self.breaker.record_failure()
+            raise LLMUnavailableError(f'LLM stream failed: {type(exc).__name__}: {exc}') from exc
+        else:
+            self.breaker.record_success()
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            'backend': llm_backend(),
+            'circuit': self.breaker.state,
+            'calls': self.calls,
+            'failures': self.failures,
+            'rejected': self.rejected,
+        }
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+class StubResponse:
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubModel:
+    """Local stand-in for ``GenerativeModel`` (``LLM_BACKEND=stub``), for tests and load benchmarks.
+
+    Answers after ``LLM_STUB_LATENCY_MS`` and honours ``request_options['timeout']``
+    like the real client, raising ``DeadlineExceeded`` when the latency exceeds it.
+    """
+
+    def __init__(self, latency_seconds: float | None = None, reply: str = 'Stub reply.'):
+        if latency_seconds is None:
+            latency_seconds = float(os.getenv('LLM_STUB_LATENCY_MS', '200')) / 1000
+        self.latency_seconds = latency_seconds
+        self.reply = reply
+
+    def _wait(self, seconds: float, request_options):
+        timeout = (request_options or {}).get('timeout')
+        if timeout is not None and seconds > timeout:
+            time.sleep(timeout)
+            raise DeadlineExceeded(f'Stub model did not answer within {timeout:.2f}s')
+        time.sleep(seconds)
+
+    def generate_content(self, prompt, safety_settings=None, stream=False, request_options=None):
+        if not stream:
+            self._wait(self.latency_seconds, request_options)
+            return StubResponse(self.reply)
+
+        words = self.reply.split(' ')
+        # Time to first chunk is a third of the latency; the rest is spread over the chunks
+        self._wait(self.latency_seconds / 3, request_options)
+
+        def chunks():
+            for index, word in enumerate(words):
+                if index:
+                    time.sleep(self.latency_seconds * 2 / 3 / len(words))
+                yield StubResponse(word if index == 0 else ' ' + word)
+        return chunks()
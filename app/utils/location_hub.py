@@ -0,0 +1,128 @@
+import json
+import os
+import threading
+import time
+
+from app.utils.redis_client import get_redis_client, new_redis_client
+
+_CHANNEL_PREFIX = 'gps:stream:'
+
+
+class Subscription:
+    """One stream consumer. Holds only the newest undelivered message.
+
+    A slow client never builds a backlog: a new point simply replaces the one
+    it has not read yet (drop-to-latest), which is what a live map needs.
+    """
+
+    __slots__ = ('device_id', '_latest', '_lock', '_event')
+
+    def __init__(self, device_id: str):
+        self.device_id = device_id
+        self._latest = None
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+
+    def offer(self, message: str):
+        with self._lock:
+            self._latest = message
+        self._event.set()
+
+    def next(self, timeout: float):
+        """Wait up to ``timeout`` seconds for a message; returns None on timeout."""
+        if not self._event.wait(timeout):
+            return None
+        with self._lock:
+            self._event.clear()
+            message, self._latest = self._latest, None
+        return message
+
+
+class LocationHub:
+    """In-process pub/sub of accepted GPS points, fanned out per device.
+
+    With ``REDIS_URL`` set, points are published to Redis and a relay thread in
+    every worker delivers them to its local subscribers, so a client connected
+    to any worker sees points ingested by all of them. The relay reconnects
+    with backoff whenever Redis goes away, so it never has to be restarted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers: dict[str, set[Subscription]] = {}
+        self._count = 0
+        self._relay_thread = None
+
+    def subscribe(self, device_id: str) -> Subscription:
+        max_subscribers = int(os.getenv('GPS_STREAM_MAX_SUBSCRIBERS', '1000'))
+        subscription = Subscription(device_id)
+        with self._lock:
+            if self._count >= max_subscribers:
+                raise RuntimeError('Too many open location streams')
+            self._subscribers.setdefault(device_id, set()).add(subscription)
+            self._count += 1
+        self._ensure_relay()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.device_id)
+            if subscribers and subscription in subscribers:
+                subscribers.discard(subscription)
+                self._count -= 1
+                if not subscribers:
+                    del self._subscribers[subscription.device_id]
+
+    def _deliver_local(self, device_id: str, message: str):
+        with self._lock:
+            subscribers = list(self._subscribers.get(device_id, ()))
+        for subscription in subscribers:
+            subscription.offer(message)
+
+    def publish(self, device_id: str, payload: dict):
+        message = json.dumps(payload)
+        client = get_redis_client()
+        if client is not None:
+            try:
+                client.publish(_CHANNEL_PREFIX + device_id, message)
+                return
+            except Exception as exc:
+                print(f"[GPS STREAM] Redis publish failed, delivering locally: {exc}")
+        self._deliver_local(device_id, message)
+
+    def _ensure_relay(self):
+        if self._relay_thread is not None or get_redis_client() is None:
+            return
+        with self._lock:
+            if self._relay_thread is not None:
+                return
+            self._relay_thread = threading.Thread(target=self._relay_loop, name='gps-stream-relay', daemon=True)
+            self._relay_thread.start()
+
+    def _relay_loop(self):
+        # Own connection without a read timeout; keepalives and health checks notice a dead link
+        client = new_redis_client(socket_timeout=None, socket_keepalive=True, health_check_interval=30)
+        pubsub = None
+        backoff = 0.5
+        while True:
+            try:
+                if pubsub is None:
+                    pubsub = client.pubsub(ignore_subscribe_messages=True)
+                    pubsub.psubscribe(_CHANNEL_PREFIX + '*')
+                item = pubsub.get_message(timeout=1.0)
+                backoff = 0.5
+                if item is not None:
+                    channel = item.get('channel') or ''
+                    self._deliver_local(channel[len(_CHANNEL_PREFIX):], item.get('data'))
+            except Exception as exc:
+                print(f"[GPS STREAM] Redis relay error, resubscribing in {backoff:.1f}s: {exc}")
+                if pubsub is not None:
+                    try:
+                        pubsub.close()
+                    except Exception:
+                        pass
+                    pubsub = None
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+
+location_hub = LocationHub()
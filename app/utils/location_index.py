@@ -0,0 +1,169 @@
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+from app.utils.redis_client import get_redis_client
+
+REDIS_HASH_KEY = 'gps:last'
+_EPOCH = datetime(1970, 1, 1)
+
+# Replace the stored point only when the incoming one is not older, so points
+# arriving out of order (tracker retries, offline buffers) never regress it.
+_COMPARE_AND_SET_SCRIPT = """
+local current = redis.call('HGET', KEYS[1], ARGV[1])
+if current then
+  local decoded = cjson.decode(current)
+  if tonumber(decoded['ts']) > tonumber(ARGV[2]) then
+    return 0
+  end
+end
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+return 1
+"""
+
+
+def _local_ttl_seconds() -> float:
+    return float(os.getenv('GPS_INDEX_LOCAL_TTL_SECONDS', '0'))
+
+
+def _to_epoch(value: datetime) -> float:
+    return (value - _EPOCH).total_seconds()
+
+
+def _encode(lat: float, lon: float, timestamp: datetime) -> str:
+    return json.dumps({'lat': lat, 'lon': lon, 'ts': _to_epoch(timestamp)})
+
+
+def _decode(raw: str):
+    data = json.loads(raw)
+    return data['lat'], data['lon'], datetime.utcfromtimestamp(data['ts'])
+
+
+class LastLocationIndex:
+    """Latest known point per device, held in memory.
+
+    Entries are ``(lat, lon, timestamp)`` tuples with naive UTC timestamps, the
+    same convention used by the ``Location`` model. When ``REDIS_URL`` is set the
+    index is mirrored into a Redis hash and reads go through it, so all workers
+    agree on the latest point. Without Redis an entry is kept until a newer
+    point replaces it, so a poll is one dictionary lookup. Multi-worker
+    deployments without Redis can set ``GPS_INDEX_LOCAL_TTL_SECONDS`` so an
+    entry not rewritten for that long (stored or merged) is looked up in the
+    database again, since another worker may have taken newer points.
+    """
+
+    def __init__(self):
+        self._points: dict[str, tuple[float, float, datetime]] = {}
+        self._fresh_until: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._script = None
+        self._script_client = None
+
+    def _compare_and_set(self, client):
+        if self._script is None or self._script_client is not client:
+            self._script = client.register_script(_COMPARE_AND_SET_SCRIPT)
+            self._script_client = client
+        return self._script
+
+    def _store_local(self, device_id: str, point) -> bool:
+        with self._lock:
+            current = self._points.get(device_id)
+            if current is not None and current[2] > point[2]:
+                return False
+            self._points[device_id] = point
+            ttl = _local_ttl_seconds()
+            self._fresh_until[device_id] = time.monotonic() + ttl if ttl > 0 else float('inf')
+            return True
+
+    def _get_local(self, device_id: str):
+        if self._fresh_until.get(device_id, 0.0) <= time.monotonic():
+            return None
+        return self._points.get(device_id)
+
+    def update(self, device_id: str, lat: float, lon: float, timestamp: datetime) -> bool:
+        """Record a point; returns False when a newer point is already indexed."""
+        if not self._store_local(device_id, (lat, lon, timestamp)):
+            return False
+
+        client = get_redis_client()
+        if client is not None:
+            try:
+                script = self._compare_and_set(client)
+                script(keys=[REDIS_HASH_KEY], args=[device_id, _to_epoch(timestamp), _encode(lat, lon, timestamp)])
+            except Exception as exc:
+                print(f"[GPS INDEX] Redis update failed: {exc}")
+        return True
+
+    def warm(self, points) -> int:
+        """Bulk load ``(device_id, lat, lon, timestamp)`` rows, e.g. from the database at startup."""
+        loaded = []
+        for device_id, lat, lon, timestamp in points:
+            if self._store_local(device_id, (lat, lon, timestamp)):
+                loaded.append((device_id, lat, lon, timestamp))
+
+        client = get_redis_client()
+        if client is not None and loaded:
+            try:
+                script = self._compare_and_set(client)
+                pipe = client.pipeline(transaction=False)
+                for device_id, lat, lon, timestamp in loaded:
+                    script(
+                        keys=[REDIS_HASH_KEY],
+                        args=[device_id, _to_epoch(timestamp), _encode(lat, lon, timestamp)],
+                        client=pipe,
+                    )
+                pipe.execute()
+            except Exception as exc:
+                print(f"[GPS INDEX] Redis warmup failed: {exc}")
+        return len(loaded)
+
+    def get(self, device_id: str):
+        """Return ``(lat, lon, timestamp)`` for a device or None when it is not indexed."""
+        client = get_redis_client()
+        if client is not None:
+            try:
+                raw = client.hget(REDIS_HASH_KEY, device_id)
+            except Exception as exc:
+                print(f"[GPS INDEX] Redis read failed: {exc}")
+            else:
+                if raw:
+                    point = _decode(raw)
+                    self._store_local(device_id, point)
+                    return point
+
+        return self._get_local(device_id)
+
+    def get_many(self, device_ids) -> dict:
+        """Return ``{device_id: point}`` for the indexed devices among ``device_ids``."""
+        device_ids = list(device_ids)
+        found = {}
+
+        client = get_redis_client()
+        if client is not None and device_ids:
+            try:
+                raw_values = client.hmget(REDIS_HASH_KEY, device_ids)
+            except Exception as exc:
+                print(f"[GPS INDEX] Redis read failed: {exc}")
+            else:
+                for device_id, raw in zip(device_ids, raw_values):
+                    if raw:
+                        point = _decode(raw)
+                        self._store_local(device_id, point)
+                        found[device_id] = point
+
+        for device_id in device_ids:
+            if device_id not in found:
+                point = self._get_local(device_id)
+                if point is not None:
+                    found[device_id] = point
+        return found
+
+    def clear(self):
+        with self._lock:
+            self._points.clear()
+            self._fresh_until.clear()
+
+
+last_location_index = LastLocationIndex()
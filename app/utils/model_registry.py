@@ -0,0 +1,114 @@
+import os
+import threading
+import time
+
+NOT_LOADED = 'not_loaded'
+LOADING = 'loading'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def _retry_seconds() -> float:
+    return float(os.getenv('MODEL_RETRY_SECONDS', '60'))
+
+
+class LazyModel:
+    """A model that is loaded on first use.
+
+    Loading is single-flight: concurrent callers of :meth:`get` wait for the
+    one thread running ``loader`` instead of loading their own copy. A failed
+    load returns None to callers (the chat endpoints already degrade on a
+    missing model) and is retried after ``MODEL_RETRY_SECONDS``.
+    """
+
+    def __init__(self, name: str, loader):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._value = None
+        self._state = NOT_LOADED
+        self._error = None
+        self._failed_at = None
+        self._load_seconds = None
+
+    def get(self):
+        if self._state == READY:
+            return self._value
+        with self._lock:
+            if self._state == READY:
+                return self._value
+            if self._state == FAILED and time.monotonic() - self._failed_at < _retry_seconds():
+                return None
+            self._load()
+            return self._value
+
+    def _load(self):
+        self._state = LOADING
+        started = time.monotonic()
+        print(f"[INFO] Loading model '{self.name}'...")
+        try:
+            self._value = self._loader()
+        except Exception as exc:
+            self._value = None
+            self._state = FAILED
+            self._error = str(exc)
+            self._failed_at = time.monotonic()
+            print(f"[ERROR] Model '{self.name}' could not load: {exc}")
+            return
+        self._state = READY
+        self._error = None
+        self._load_seconds = round(time.monotonic() - started, 2)
+        print(f"[OK] Model '{self.name}' loaded in {self._load_seconds}s")
+
+    def warmup(self):
+        """Load now, retrying immediately if an earlier attempt failed."""
+        if self._state == READY:
+            return True
+        with self._lock:
+            if self._state != READY:
+                self._load()
+        return self._state == READY
+
+    def status(self) -> dict:
+        status = {'state': self._state}
+        if self._load_seconds is not None:
+            status['load_seconds'] = self._load_seconds
+        if self._error:
+            status['error'] = self._error
+        return status
+
+
+class ModelRegistry:
+    def __init__(self):
+        self._models: dict[str, LazyModel] = {}
+
+    def register(self, name: str, loader) -> LazyModel:
+        model = LazyModel(name, loader)
+        self._models[name] = model
+        return model
+
+    def names(self) -> list[str]:
+        return list(self._models)
+
+    def warmup(self, names=None, wait: bool = True):
+        """Load the given models (all by default), in parallel; returns their status."""
+        selected = [self._models[name] for name in (names or self._models)]
+        threads = [
+            threading.Thread(target=model.warmup, name=f'model-warmup-{model.name}', daemon=True)
+            for model in selected
+        ]
+        for thread in threads:
+            thread.start()
+        if wait:
+            for thread in threads:
+                thread.join()
+        return self.status()
+
+    def status(self) -> dict:
+        return {name: model.status() for name, model in self._models.items()}
+
+    def is_ready(self, names=None) -> bool:
+        return all(self._models[name].status()['state'] == READY for name in (names or self._models))
+
+
+model_registry = ModelRegistry()
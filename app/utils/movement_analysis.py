@@ -0,0 +1,332 @@
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+
+# Walking tops out around 2 m/s; sustained speeds above this mean running or a vehicle
+HIGH_SPEED_MPS = 4.0
+# Steps slower than this count as standing still when looking for dwell clusters
+STATIONARY_SPEED_MPS = 0.3
+
+
+def _window_seconds() -> float:
+    return float(os.getenv('GPS_INSIGHTS_WINDOW_HOURS', '24')) * 3600
+
+
+def _max_devices() -> int:
+    return int(os.getenv('GPS_INSIGHTS_MAX_DEVICES', '1000'))
+
+
+def _night_hours():
+    start, end = os.getenv('GPS_NIGHT_HOURS', '22-6').split('-')
+    return int(start), int(end)
+
+
+def _local_timezone():
+    return ZoneInfo(os.getenv('GPS_LOCAL_TIMEZONE', 'Africa/Cairo'))
+
+
+def to_epoch_seconds(timestamps) -> np.ndarray:
+    return np.array(timestamps, dtype='datetime64[ms]').astype(np.int64) / 1000.0
+
+
+def haversine_vec(lat1, lon1, lat2, lon2) -> np.ndarray:
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = np.radians(np.asarray(lon2) - np.asarray(lon1))
+    a = np.sin(d_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def _dwell_clusters(epoch_s, lat, lon, stationary_steps, min_dwell_s: float):
+    """Runs of consecutive slow steps lasting at least ``min_dwell_s`` seconds."""
+    if not stationary_steps.any():
+        return []
+
+    padded = np.concatenate(([False], stationary_steps, [False]))
+    edges = np.flatnonzero(np.diff(padded.astype(np.int8)))
+    run_starts, run_ends = edges[::2], edges[1::2]  # step indices, end exclusive
+
+    clusters = []
+    for start, end in zip(run_starts, run_ends):
+        # Step i joins point i and i + 1, so the run covers points start..end
+        duration = epoch_s[end] - epoch_s[start]
+        if duration < min_dwell_s:
+            continue
+        clusters.append({
+            'lat': float(lat[start:end + 1].mean()),
+            'lon': float(lon[start:end + 1].mean()),
+            'start': datetime.utcfromtimestamp(float(epoch_s[start])).isoformat(),
+            'end': datetime.utcfromtimestamp(float(epoch_s[end])).isoformat(),
+            'minutes': round(duration / 60.0, 1),
+        })
+    return clusters
+
+
+def analyze_track(epoch_s, lat, lon, home: tuple[float, float] | None = None, min_dwell_s: float = 300.0) -> dict:
+    """Movement features of one device's time-ordered track, computed in a handful of array passes."""
+    epoch_s = np.asarray(epoch_s, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    count = epoch_s.shape[0]
+
+    features = {
+        'points': int(count),
+        'distance_m': 0.0,
+        'max_speed_mps': 0.0,
+        'p95_speed_mps': 0.0,
+        'moving_seconds': 0.0,
+        'night_moving_seconds': 0.0,
+        'high_speed_seconds': 0.0,
+        'max_distance_from_home_m': None,
+        'current_distance_from_home_m': None,
+        'heading_deg': None,
+        'dwell_clusters': [],
+    }
+    if count == 0:
+        return features
+
+    if home is not None:
+        from_home = haversine_vec(lat, lon, home[0], home[1])
+        features['max_distance_from_home_m'] = round(float(from_home.max()), 1)
+        features['current_distance_from_home_m'] = round(float(from_home[-1]), 1)
+
+    if count < 2:
+        return features
+
+    step_m = haversine_vec(lat[:-1], lon[:-1], lat[1:], lon[1:])
+    step_s = np.diff(epoch_s)
+    valid = step_s > 0
+    speeds = np.zeros_like(step_m)
+    speeds[valid] = step_m[valid] / step_s[valid]
+
+    phi1, phi2 = np.radians(lat[:-1]), np.radians(lat[1:])
+    d_lambda = np.radians(lon[1:] - lon[:-1])
+    headings = (np.degrees(np.arctan2(
+        np.sin(d_lambda) * np.cos(phi2),
+        np.cos(phi1) * np.sin(phi2) - np.sin(phi1) * np.cos(phi2) * np.cos(d_lambda),
+    )) + 360.0) % 360.0
+
+    moving = valid & (speeds >= STATIONARY_SPEED_MPS)
+    high_speed = valid & (speeds >= HIGH_SPEED_MPS)
+
+    # Local hour of each step start, using the zone's offset at the middle of the window
+    midpoint = datetime.utcfromtimestamp(float(epoch_s[count // 2]))
+    offset_s = _local_timezone().utcoffset(midpoint).total_seconds()
+    local_hours = ((epoch_s[:-1] + offset_s) // 3600) % 24
+    night_start, night_end = _night_hours()
+    if night_start > night_end:
+        night = (local_hours >= night_start) | (local_hours < night_end)
+    else:
+        night = (local_hours >= night_start) & (local_hours < night_end)
+
+    features.update({
+        'distance_m': round(float(step_m[valid].sum()), 1),
+        'max_speed_mps': round(float(speeds.max()), 2),
+        'p95_speed_mps': round(float(np.percentile(speeds[valid], 95)) if valid.any() else 0.0, 2),
+        'moving_seconds': float(step_s[moving].sum()),
+        'night_moving_seconds': float(step_s[moving & night].sum()),
+        'high_speed_seconds': float(step_s[high_speed].sum()),
+        'heading_deg': round(float(headings[-1]), 1) if moving[-1] else None,
+        'dwell_clusters': _dwell_clusters(epoch_s, lat, lon, valid & ~moving, min_dwell_s),
+    })
+    return features
+
+
+class _RollingStat:
+    """Exponentially weighted mean and variance of one feature."""
+
+    __slots__ = ('mean', 'var', 'samples')
+
+    def __init__(self):
+        self.mean = 0.0
+        self.var = 0.0
+        self.samples = 0
+
+    def update(self, value: float, alpha: float):
+        if self.samples == 0:
+            self.mean = value
+        else:
+            delta = value - self.mean
+            self.mean += alpha * delta
+            self.var = (1 - alpha) * (self.var + alpha * delta * delta)
+        self.samples += 1
+
+    def is_unusual(self, value: float, sigmas: float = 3.0, min_samples: int = 24) -> bool:
+        if self.samples < min_samples:
+            return False
+        return value > self.mean + sigmas * max(math.sqrt(self.var), 1e-6)
+
+
+_BASELINE_FEATURES = ('max_speed_mps', 'moving_seconds', 'max_distance_from_home_m')
+
+
+class MovementTracker:
+    """Per-device rolling window of recent points plus hourly baselines.
+
+    Points are appended as they are ingested, starting with a device's first
+    point; each completed hour of data is summarized and folded into
+    exponentially weighted baselines, and :meth:`insights` compares the last
+    hour against them. At most ``GPS_INSIGHTS_MAX_DEVICES`` devices are
+    tracked; the least recently updated one is dropped to make room.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._windows: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+        self._baselines: dict[str, dict[str, _RollingStat]] = {}
+        self._baseline_hour: dict[str, int] = {}
+        self._insights: dict[str, tuple[float, dict]] = {}
+        self._pending: dict[str, list[tuple[float, float, float]]] = {}
+        self._flagged: dict[str, frozenset] = {}
+        # Devices in least recently updated order; True once the window was loaded from history
+        self._devices: OrderedDict[str, bool] = OrderedDict()
+
+    def _touch(self, device_id: str):
+        """Mark a device as just updated and drop the least recently updated ones over the limit; holds the lock."""
+        self._devices[device_id] = self._devices.get(device_id, False)
+        self._devices.move_to_end(device_id)
+        while len(self._devices) > _max_devices():
+            evicted, _ = self._devices.popitem(last=False)
+            for state in (self._windows, self._baselines, self._baseline_hour, self._insights, self._pending, self._flagged):
+                state.pop(evicted, None)
+
+    def has_history(self, device_id: str) -> bool:
+        """Whether the device's window was loaded from stored history (see :meth:`load_history`)."""
+        return self._devices.get(device_id, False)
+
+    def load_history(self, device_id: str, epoch_s, lat, lon, home=None):
+        """Replace the device's window with its stored history, which already holds every ingested point."""
+        with self._lock:
+            self._windows.pop(device_id, None)
+            self._pending.pop(device_id, None)
+            self._insights.pop(device_id, None)
+            self._touch(device_id)
+            self._devices[device_id] = True
+        self.append(device_id, epoch_s, lat, lon, home)
+
+    def add_point(self, device_id: str, epoch_s: float, lat: float, lon: float, home=None):
+        """Queue a single ingested point; the window is rebuilt once enough points pile up."""
+        with self._lock:
+            self._touch(device_id)
+            pending = self._pending.setdefault(device_id, [])
+            pending.append((epoch_s, lat, lon))
+            if len(pending) < 256:
+                return
+        self.append(device_id, (), (), (), home)
+
+    def append(self, device_id: str, epoch_s, lat, lon, home=None):
+        """Add a batch of points (plus any queued single points) to the device's window."""
+        epoch_s = np.atleast_1d(np.asarray(epoch_s, dtype=np.float64))
+        lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+        lon = np.atleast_1d(np.asarray(lon, dtype=np.float64))
+
+        with self._lock:
+            pending = self._pending.pop(device_id, None)
+            if pending:
+                queued = np.array(pending, dtype=np.float64)
+                epoch_s = np.concatenate((queued[:, 0], epoch_s))
+                lat = np.concatenate((queued[:, 1], lat))
+                lon = np.concatenate((queued[:, 2], lon))
+            if epoch_s.shape[0] == 0:
+                return
+
+            self._touch(device_id)
+            current = self._windows.get(device_id)
+            if current is not None:
+                epoch_s = np.concatenate((current[0], epoch_s))
+                lat = np.concatenate((current[1], lat))
+                lon = np.concatenate((current[2], lon))
+                if np.any(np.diff(epoch_s) < 0):
+                    order = np.argsort(epoch_s, kind='stable')
+                    epoch_s, lat, lon = epoch_s[order], lat[order], lon[order]
+
+            keep_from = np.searchsorted(epoch_s, epoch_s[-1] - _window_seconds())
+            window = (epoch_s[keep_from:], lat[keep_from:], lon[keep_from:])
+            self._windows[device_id] = window
+            self._fold_completed_hours(device_id, window, home)
+
+    def _fold_completed_hours(self, device_id: str, window, home):
+        epoch_s, lat, lon = window
+        current_hour = int(epoch_s[-1] // 3600)
+        last_folded = self._baseline_hour.get(device_id)
+        if last_folded is None:
+            last_folded = int(epoch_s[0] // 3600) - 1
+
+        hours = epoch_s // 3600
+        stats = self._baselines.setdefault(device_id, {name: _RollingStat() for name in _BASELINE_FEATURES})
+        alpha = float(os.getenv('GPS_BASELINE_ALPHA', '0.05'))
+        for hour in range(last_folded + 1, current_hour):
+            in_hour = hours == hour
+            if not in_hour.any():
+                continue
+            features = analyze_track(epoch_s[in_hour], lat[in_hour], lon[in_hour], home)
+            for name in _BASELINE_FEATURES:
+                if features[name] is not None:
+                    stats[name].update(float(features[name]), alpha)
+        self._baseline_hour[device_id] = current_hour - 1
+
+    def insights(self, device_id: str, home=None, max_age_s: float = 0.0) -> dict | None:
+        """Features over the whole window and anomaly flags for the most recent hour."""
+        cached = self._insights.get(device_id)
+        if cached is not None and time.monotonic() - cached[0] <= max_age_s:
+            return cached[1]
+
+        self.append(device_id, (), (), (), home)
+        window = self._windows.get(device_id)
+        if window is None:
+            return None
+        epoch_s, lat, lon = window
+
+        features = analyze_track(epoch_s, lat, lon, home)
+        recent_from = np.searchsorted(epoch_s, epoch_s[-1] - 3600)
+        recent = analyze_track(epoch_s[recent_from:], lat[recent_from:], lon[recent_from:], home)
+        baselines = self._baselines.get(device_id, {})
+
+        anomalies = []
+        if recent['high_speed_seconds'] >= 60:
+            anomalies.append('high_speed')
+        if recent['night_moving_seconds'] >= 300:
+            anomalies.append('night_walk')
+        for name, flag in (
+            ('max_speed_mps', 'unusual_speed'),
+            ('moving_seconds', 'unusual_activity'),
+            ('max_distance_from_home_m', 'far_from_home'),
+        ):
+            stat = baselines.get(name)
+            if stat is not None and recent[name] is not None and stat.is_unusual(float(recent[name])):
+                anomalies.append(flag)
+
+        result = {
+            'window': features,
+            'last_hour': recent,
+            'baseline': {
+                name: {'mean': round(stat.mean, 2), 'std': round(math.sqrt(stat.var), 2), 'hours': stat.samples}
+                for name, stat in baselines.items()
+            },
+            'anomalies': anomalies,
+        }
+        self._insights[device_id] = (time.monotonic(), result)
+        return result
+
+    def new_anomalies(self, device_id: str, home=None) -> list[str]:
+        """Anomaly flags of the last hour that were not raised at the previous check of the device."""
+        insights = self.insights(device_id, home)
+        if insights is None:
+            return []
+        flags = frozenset(insights['anomalies'])
+        with self._lock:
+            previous = self._flagged.get(device_id, frozenset())
+            if device_id in self._devices:
+                self._flagged[device_id] = flags
+        return sorted(flags - previous)
+
+
+movement_tracker = MovementTracker()
@@ -0,0 +1,82 @@
+from flask import request
+
+from app.models.caregiver import CareGiver
+from app.models.doctor import Doctor
+from app.models.patient import Patient
+from app.utils.error_handler import AuthError, NotFoundError
+from app.utils.jwt import JWTError, decode_token
+
+
+def _get_token_from_header():
+    auth_header = request.headers.get('Authorization', '')
+    if auth_header.startswith('Bearer '):
+        return auth_header.split(' ', 1)[1]
+    data = request.get_json(silent=True) or {}
+    body_token = data.get('token') or data.get('access_token') or data.get('bearer_token')
+    if body_token:
+        token_str = str(body_token).strip()
+        if token_str.startswith('Bearer '):
+            return token_str.split(' ', 1)[1]
+        return token_str
+    return None
+
+
+def resolve_token_identity():
+    """``(role, subject)`` of the Bearer token of a patient, doctor or caregiver."""
+    token = _get_token_from_header()
+    if not token:
+        raise AuthError('Missing Bearer token')
+    try:
+        payload = decode_token(token)
+    except JWTError as e:
+        raise AuthError(str(e)) from e
+
+    role = payload.get('role')
+    subject = payload.get('sub')
+    if role not in ['patient', 'doctor', 'caregiver'] or not subject:
+        raise AuthError('Invalid token payload')
+    return role, subject
+
+
+def doctor_patient_guard(doctor_id: str, patient_id: str):
+    doctor = Doctor.query.filter_by(doctor_id=doctor_id).first()
+    if not doctor or not doctor.active:
+        raise AuthError('Doctor account issues')
+
+    patient = Patient.query.filter_by(patient_id=patient_id).first()
+    if not patient or not patient.active:
+        raise NotFoundError('Patient not found/active')
+
+    if patient.doctor_id != doctor_id:
+        raise AuthError('Unauthorized for this patient')
+
+    return patient
+
+
+def caregiver_patient_guard(caregiver_id: str, patient_id: str):
+    caregiver = CareGiver.query.filter_by(care_giver_id=caregiver_id).first()
+    if not caregiver or not caregiver.active:
+        raise AuthError('Caregiver account issues')
+
+    patient = Patient.query.filter_by(patient_id=patient_id).first()
+    if not patient or not patient.active:
+        raise NotFoundError('Patient not found/active')
+
+    if patient.care_giver_id != caregiver_id:
+        raise AuthError('Unauthorized for this patient')
+
+    return patient
+
+
+def patient_access_guard(role: str, subject: str, patient_id: str):
+    """The active patient ``patient_id`` if the token holder may act for them: their caregiver, doctor or themselves."""
+    if role == 'caregiver':
+        return caregiver_patient_guard(subject, patient_id)
+    if role == 'doctor':
+        return doctor_patient_guard(subject, patient_id)
+    if role == 'patient' and subject == patient_id:
+        patient = Patient.query.filter_by(patient_id=patient_id).first()
+        if not patient or not patient.active:
+            raise NotFoundError('Patient not found/active')
+        return patient
+    raise AuthError('Unauthorized for this patient')
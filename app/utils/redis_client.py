@@ -0,0 +1,39 @@
+import os
+
+try:
+    import redis
+except ImportError:  # Optional dependency, only needed for multi-worker deployments
+    redis = None
+
+_client = None
+_client_url = None
+
+
+def get_redis_client():
+    """Return a shared Redis client when REDIS_URL is configured, otherwise None.
+
+    Features that keep state in memory (GPS last-location index, pub/sub relays)
+    use this as an optional backing store so every worker sees the same data.
+    """
+    global _client, _client_url
+
+    url = os.getenv('REDIS_URL')
+    if not url or redis is None:
+        return None
+
+    if _client is None or _client_url != url:
+        _client = redis.Redis.from_url(url, decode_responses=True, socket_timeout=2)
+        _client_url = url
+    return _client
+
+
+def new_redis_client(**options):
+    """A dedicated client for long-lived blocking work such as pub/sub, or None without REDIS_URL.
+
+    The shared client's short ``socket_timeout`` suits request-path commands
+    but would cut an idle subscription every few seconds.
+    """
+    url = os.getenv('REDIS_URL')
+    if not url or redis is None:
+        return None
+    return redis.Redis.from_url(url, decode_responses=True, **options)
@@ -0,0 +1,71 @@
+import struct
+import zlib
+
+import numpy as np
+
+ENCODING_VERSION = 1
+# Fixed-point coordinates: int32 microdegrees (about 11 cm), plenty for GPS
+COORDINATE_SCALE = 1_000_000
+
+_MAGIC = b'LSEG'
+# magic, version, point count, first timestamp (epoch ms)
+_HEADER = struct.Struct('<4sBIq')
+
+
+def datetimes_to_epoch_ms(timestamps) -> np.ndarray:
+    """Naive UTC datetimes to int64 milliseconds since the epoch."""
+    return np.array(timestamps, dtype='datetime64[ms]').astype(np.int64)
+
+
+def epoch_ms_to_datetimes(epoch_ms: np.ndarray) -> list:
+    """int64 epoch milliseconds back to naive UTC datetimes."""
+    return epoch_ms.astype('datetime64[ms]').astype(object).tolist()
+
+
+def encode_segment(epoch_ms, lat, lon) -> bytes:
+    """Pack time-ordered points into a compressed columnar blob.
+
+    Layout before compression: header, then int32 timestamp deltas (ms),
+    int32 latitudes and int32 longitudes, each as one contiguous column.
+    """
+    epoch_ms = np.asarray(epoch_ms, dtype=np.int64)
+    count = epoch_ms.shape[0]
+    if count == 0:
+        raise ValueError('Cannot encode an empty segment')
+
+    deltas = np.diff(epoch_ms, prepend=epoch_ms[0])
+    if deltas.min() < 0 or deltas.max() > np.iinfo(np.int32).max:
+        raise ValueError('Segment timestamps must be sorted and span less than 24 days')
+
+    lat_fixed = np.round(np.asarray(lat, dtype=np.float64) * COORDINATE_SCALE).astype('<i4')
+    lon_fixed = np.round(np.asarray(lon, dtype=np.float64) * COORDINATE_SCALE).astype('<i4')
+
+    raw = b''.join((
+        _HEADER.pack(_MAGIC, ENCODING_VERSION, count, int(epoch_ms[0])),
+        deltas.astype('<i4').tobytes(),
+        lat_fixed.tobytes(),
+        lon_fixed.tobytes(),
+    ))
+    return zlib.compress(raw, 6)
+
+
+def decode_segment(payload: bytes):
+    """Return ``(epoch_ms, lat, lon)`` arrays for a blob produced by :func:`encode_segment`.
+
+    The int32 columns are read with ``numpy.frombuffer`` straight over the
+    decompressed buffer; only the final scaling allocates.
+    """
+    raw = zlib.decompress(payload)
+    magic, version, count, first_ms = _HEADER.unpack_from(raw, 0)
+    if magic != _MAGIC or version != ENCODING_VERSION:
+        raise ValueError('Unsupported location segment encoding')
+
+    offset = _HEADER.size
+    deltas = np.frombuffer(raw, dtype='<i4', count=count, offset=offset)
+    offset += 4 * count
+    lat_fixed = np.frombuffer(raw, dtype='<i4', count=count, offset=offset)
+    offset += 4 * count
+    lon_fixed = np.frombuffer(raw, dtype='<i4', count=count, offset=offset)
+
+    epoch_ms = first_ms + np.cumsum(deltas, dtype=np.int64)
+    return epoch_ms, lat_fixed / COORDINATE_SCALE, lon_fixed / COORDINATE_SCALE
@@ -0,0 +1,236 @@
+import heapq
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+from sqlalchemy import func, select
+
+from app import db
+from app.models.location import Location
+from app.models.location_segment import LocationSegment
+from app.utils.segment_codec import (
+    ENCODING_VERSION,
+    datetimes_to_epoch_ms,
+    decode_segment,
+    encode_segment,
+    epoch_ms_to_datetimes,
+)
+
+# Ids per DELETE ... IN (...); SQL Server allows at most 2100 parameters per statement
+_DELETE_CHUNK = 1000
+
+_WINDOWS = {
+    'hour': timedelta(hours=1),
+    'day': timedelta(days=1),
+}
+
+
+def _segment_window() -> timedelta:
+    return _WINDOWS.get(os.getenv('GPS_SEGMENT_WINDOW', 'hour').strip().lower(), _WINDOWS['hour'])
+
+
+def _grace_period() -> timedelta:
+    return timedelta(minutes=int(os.getenv('GPS_SEGMENT_GRACE_MINUTES', '15')))
+
+
+def _floor_to_window(value: datetime, window: timedelta) -> datetime:
+    midnight = value.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight + ((value - midnight) // window) * window
+
+
+def closed_window_boundary(now: datetime | None = None) -> datetime:
+    """Start of the oldest window that may still receive points; everything before it is closed."""
+    now = now or datetime.utcnow()
+    return _floor_to_window(now - _grace_period(), _segment_window())
+
+
+def expand_dwell(rows):
+    """``(lat, lon, timestamp)`` points of ``(lat, lon, timestamp, dwell_until)`` rows in time order.
+
+    A row the stationary filter merged reports into also yields its last
+    report, at ``dwell_until``, so the time spent at the place stays visible.
+    Rows must come in timestamp order.
+    """
+    pending = []
+    for lat, lon, timestamp, dwell_until in rows:
+        while pending and pending[0][0] <= timestamp:
+            yield heapq.heappop(pending)[1:]
+        yield lat, lon, timestamp
+        if dwell_until is not None and dwell_until > timestamp:
+            heapq.heappush(pending, (dwell_until, lat, lon, dwell_until))
+    while pending:
+        yield heapq.heappop(pending)[1:]
+
+
+def _store_device_segments(device_id: str, rows, window: timedelta) -> int:
+    points = list(expand_dwell((lat, lon, timestamp, dwell_until) for _, lat, lon, timestamp, dwell_until in rows))
+    lats, lons, timestamps = zip(*points)
+    epoch_ms = datetimes_to_epoch_ms(timestamps)
+    lats = np.asarray(lats, dtype=np.float64)
+    lons = np.asarray(lons, dtype=np.float64)
+
+    window_ms = int(window.total_seconds() * 1000)
+    window_ids = epoch_ms // window_ms
+    boundaries = np.flatnonzero(np.diff(window_ids)) + 1
+
+    created = 0
+    for start, end in zip(np.r_[0, boundaries], np.r_[boundaries, len(points)]):
+        db.session.add(LocationSegment(
+            device_id=device_id,
+            start_time=timestamps[start],
+            end_time=timestamps[end - 1],
+            point_count=int(end - start),
+            last_lat=float(lats[end - 1]),
+            last_lon=float(lons[end - 1]),
+            encoding_version=ENCODING_VERSION,
+            payload=encode_segment(epoch_ms[start:end], lats[start:end], lons[start:end]),
+        ))
+        created += 1
+    return created
+
+
+def compact_closed_windows(now: datetime | None = None) -> dict:
+    """Move row-stored points of closed windows into compressed segments, one commit per device.
+
+    Exactly the rows that were read are deleted, by id and in the same
+    transaction, so a late point committed for a closed window while the
+    device is being compacted stays in the table for the next run.
+    """
+    boundary = closed_window_boundary(now)
+    window = _segment_window()
+
+    device_ids = [
+        device_id
+        for (device_id,) in (
+            db.session.query(Location.device_id)
+            .filter(Location.timestamp < boundary)
+            .distinct()
+            .all()
+        )
+    ]
+
+    stats = {'devices': 0, 'segments': 0, 'points': 0}
+    for device_id in device_ids:
+        rows = (
+            db.session.query(Location.id, Location.lat, Location.lon, Location.timestamp, Location.dwell_until)
+            .filter(Location.device_id == device_id, Location.timestamp < boundary)
+            .order_by(Location.timestamp.asc(), Location.id.asc())
+            .all()
+        )
+        if not rows:
+            continue
+
+        stats['segments'] += _store_device_segments(device_id, rows, window)
+        ids = [row[0] for row in rows]
+        for offset in range(0, len(ids), _DELETE_CHUNK):
+            Location.query.filter(
+                Location.id.in_(ids[offset:offset + _DELETE_CHUNK]),
+            ).delete(synchronize_session=False)
+        db.session.commit()
+
+        stats['devices'] += 1
+        stats['points'] += len(rows)
+
+    return stats
+
+
+def purge_segments(cutoff: datetime) -> int:
+    deleted = LocationSegment.query.filter(LocationSegment.end_time < cutoff).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+def _decode_group(payloads, from_dt: datetime | None, to_dt: datetime | None):
+    epoch_parts, lat_parts, lon_parts = [], [], []
+    for payload in payloads:
+        epoch_ms, lat, lon = decode_segment(payload)
+        epoch_parts.append(epoch_ms)
+        lat_parts.append(lat)
+        lon_parts.append(lon)
+
+    epoch_ms = np.concatenate(epoch_parts)
+    lat = np.concatenate(lat_parts)
+    lon = np.concatenate(lon_parts)
+    if len(payloads) > 1:
+        order = np.argsort(epoch_ms, kind='stable')
+        epoch_ms, lat, lon = epoch_ms[order], lat[order], lon[order]
+
+    mask = np.ones(epoch_ms.shape[0], dtype=bool)
+    if from_dt is not None:
+        mask &= epoch_ms >= datetimes_to_epoch_ms([from_dt])[0]
+    if to_dt is not None:
+        mask &= epoch_ms <= datetimes_to_epoch_ms([to_dt])[0]
+
+    return zip(lat[mask].tolist(), lon[mask].tolist(), epoch_ms_to_datetimes(epoch_ms[mask]))
+
+
+def iter_segment_points(device_id: str, from_dt: datetime | None = None, to_dt: datetime | None = None):
+    """Yield ``(lat, lon, timestamp)`` from stored segments in time order.
+
+    Segment metadata is listed first and payloads are then loaded one window
+    at a time; only segments whose time ranges overlap (late points compacted
+    separately) are decoded together. Reads go through their own connection so
+    they can interleave with a row cursor that is still streaming on the session.
+    """
+    table = LocationSegment.__table__
+    listing = select(table.c.id, table.c.start_time, table.c.end_time).where(table.c.device_id == device_id)
+    if from_dt is not None:
+        listing = listing.where(table.c.end_time >= from_dt)
+    if to_dt is not None:
+        listing = listing.where(table.c.start_time <= to_dt)
+    listing = listing.order_by(table.c.start_time.asc())
+
+    with db.engine.connect() as connection:
+        groups, group_end = [], None
+        for segment_id, start_time, end_time in connection.execute(listing).all():
+            if groups and start_time <= group_end:
+                groups[-1].append(segment_id)
+                group_end = max(group_end, end_time)
+            else:
+                groups.append([segment_id])
+                group_end = end_time
+
+        for segment_ids in groups:
+            payloads = connection.execute(
+                select(table.c.payload).where(table.c.id.in_(segment_ids))
+            ).scalars().all()
+            yield from _decode_group(payloads, from_dt, to_dt)
+
+
+def segment_has_timestamp(device_id: str, timestamp: datetime) -> bool:
+    """Whether a compacted segment of the device holds a point at ``timestamp`` (millisecond precision)."""
+    table = LocationSegment.__table__
+    payloads = db.session.execute(
+        select(table.c.payload).where(
+            table.c.device_id == device_id,
+            table.c.start_time <= timestamp,
+            table.c.end_time >= timestamp,
+        )
+    ).scalars().all()
+    target = datetimes_to_epoch_ms([timestamp])[0]
+    return any(bool(np.any(decode_segment(payload)[0] == target)) for payload in payloads)
+
+
+def latest_segment_points(device_ids=None, since: datetime | None = None):
+    """Last ``(device_id, lat, lon, timestamp)`` per device taken from segment metadata, no decoding needed."""
+    ranked = db.session.query(
+        LocationSegment.device_id,
+        LocationSegment.last_lat,
+        LocationSegment.last_lon,
+        LocationSegment.end_time,
+        func.row_number().over(
+            partition_by=LocationSegment.device_id,
+            order_by=LocationSegment.end_time.desc(),
+        ).label('row_number'),
+    )
+    if device_ids is not None:
+        ranked = ranked.filter(LocationSegment.device_id.in_(device_ids))
+    if since is not None:
+        ranked = ranked.filter(LocationSegment.end_time >= since)
+    ranked = ranked.subquery()
+
+    return (
+        db.session.query(ranked.c.device_id, ranked.c.last_lat, ranked.c.last_lon, ranked.c.end_time)
+        .filter(ranked.c.row_number == 1)
+        .all()
+    )
@@ -0,0 +1,276 @@
+import io
+import os
+import re
+import struct
+import wave
+
+import numpy as np
+
+from app.utils.model_registry import model_registry
+from app.utils.stt_batcher import SttBatcher, stt_batching_enabled
+
+# torch, transformers, TTS and sentence-transformers are imported inside the loaders,
+# so processes that never run these models start without them
+
+WHISPER_MODEL_DIR = "openai/whisper-small"
+
+TTS_BASE_MODEL_DIR = "/home/ubuntu/mobile/authentication/app/controllers/chat_model"
+CONFIG_PATH = os.path.join(TTS_BASE_MODEL_DIR, "config.json")
+VOCAB_PATH = os.path.join(TTS_BASE_MODEL_DIR, "vocab.json")
+SPEAKER_AUDIO_PATH = os.path.join(TTS_BASE_MODEL_DIR, "speaker_reference.wav")
+
+# Whisper expects 16 kHz mono float32
+STT_SAMPLE_RATE = 16000
+
+# XTTS v2 produces 24 kHz mono audio
+TTS_SAMPLE_RATE = 24000
+TTS_LANGUAGE = "ar"
+TTS_TEMPERATURE = 0.3
+# Identifies the speaker for the TTS cache; change it when the checkpoint or reference audio changes
+TTS_VOICE = os.getenv('TTS_VOICE', 'egtts-xtts-v2/speaker_reference')
+
+_SENTENCE_END = re.compile(r'(?<=[.!?؟…])\s+|\n+')
+# Fragments shorter than this are spoken together with the next sentence
+_MIN_SENTENCE_CHARS = 12
+
+# Models served by the inference server when INFERENCE_SOCKET is set
+SPEECH_MODELS = ('whisper', 'xtts', 'embedder')
+
+
+def _torch_device():
+    import torch
+    return "cuda:0" if torch.cuda.is_available() else "cpu"
+
+
+def _load_whisper():
+    # Whisper Fine-Tuned (STT) - Local Model
+    from transformers import pipeline
+    return pipeline("automatic-speech-recognition", model=WHISPER_MODEL_DIR, device=_torch_device())
+
+
+def _load_xtts():
+    # Egyptian TTS (Local XTTS v2) with the reference speaker's latents
+    from TTS.tts.configs.xtts_config import XttsConfig
+    from TTS.tts.models.xtts import Xtts
+
+    config = XttsConfig()
+    config.load_json(CONFIG_PATH)
+    tts_model = Xtts.init_from_config(config)
+    tts_model.load_checkpoint(config, checkpoint_dir=TTS_BASE_MODEL_DIR, use_deepspeed=False, vocab_path=VOCAB_PATH)
+    tts_model.to(_torch_device())
+
+    gpt_cond_latent, speaker_embedding = tts_model.get_conditioning_latents(audio_path=[SPEAKER_AUDIO_PATH])
+    return tts_model, gpt_cond_latent, speaker_embedding
+
+
+def _load_embedder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer("all-MiniLM-L6-v2")
+
+
+stt_model = model_registry.register('whisper', _load_whisper)
+tts_model = model_registry.register('xtts', _load_xtts)
+embedder = model_registry.register('embedder', _load_embedder)
+
+
+def _decode_wave(data: bytes):
+    with wave.open(io.BytesIO(data), 'rb') as wav_file:
+        channels, width, rate = wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate()
+        frames = wav_file.readframes(wav_file.getnframes())
+    if width == 1:
+        samples = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 2:
+        samples = np.frombuffer(frames, dtype='<i2').astype(np.float32) / 32768
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) | (raw[:, 1].astype(np.int32) << 8) | (raw[:, 2].astype(np.int32) << 16))
+        samples = np.where(samples >= 1 << 23, samples - (1 << 24), samples).astype(np.float32) / (1 << 23)
+    elif width == 4:
+        samples = np.frombuffer(frames, dtype='<i4').astype(np.float32) / (1 << 31)
+    else:
+        raise ValueError(f'Unsupported WAV sample width {width}')
+    return samples.reshape(-1, channels).mean(axis=1), rate
+
+
+def _decode_torchaudio(data: bytes):
+    import torchaudio
+
+    waveform, rate = torchaudio.load(io.BytesIO(data))
+    return waveform.mean(dim=0).numpy().astype(np.float32), rate
+
+
+def _decode_pydub(data: bytes):
+    # Last resort for containers torchaudio cannot read; pydub runs ffmpeg
+    from pydub import AudioSegment
+
+    sound = AudioSegment.from_file(io.BytesIO(data)).set_channels(1)
+    samples = np.array(sound.get_array_of_samples(), dtype=np.float32) / (1 << (8 * sound.sample_width - 1))
+    return samples, sound.frame_rate
+
+
+def resample(samples: np.ndarray, rate: int, target_rate: int) -> np.ndarray:
+    if rate == target_rate:
+        return samples
+    try:
+        import torch
+        import torchaudio.functional
+    except ImportError:
+        # Linear interpolation; good enough for speech recognition input
+        duration = len(samples) / rate
+        positions = np.arange(int(round(duration * target_rate))) * (rate / target_rate)
+        return np.interp(positions, np.arange(len(samples)), samples).astype(np.float32)
+    return torchaudio.functional.resample(torch.from_numpy(samples), rate, target_rate).numpy()
+
+
+def decode_audio(data: bytes, target_rate: int = STT_SAMPLE_RATE) -> np.ndarray:
+    """Decode an uploaded audio file in memory to mono float32 samples at ``target_rate``.
+
+    WAV is read with the standard library; other formats go through
+    torchaudio, then pydub. Raises ValueError when no decoder can read it.
+    """
+    errors = []
+    for decoder in (_decode_wave, _decode_torchaudio, _decode_pydub):
+        try:
+            samples, rate = decoder(data)
+            break
+        except Exception as exc:
+            errors.append(f'{decoder.__name__.lstrip("_")}: {exc!r}')
+    else:
+        raise ValueError('Could not decode audio (' + '; '.join(errors) + ')')
+    return np.ascontiguousarray(resample(np.asarray(samples, dtype=np.float32), rate, target_rate))
+
+
+def transcribe(audio) -> str:
+    """Run Whisper on 16 kHz float32 samples (or anything the pipeline accepts: a path, encoded bytes)."""
+    stt_pipe = stt_model.get()
+    if not stt_pipe:
+        raise RuntimeError('STT Pipeline is not initialized.')
+    if isinstance(audio, np.ndarray):
+        audio = {"raw": audio, "sampling_rate": STT_SAMPLE_RATE}
+    result = stt_pipe(audio)
+    return result.get("text", "").strip()
+
+
+def transcribe_batch(batch: list[np.ndarray]) -> list[str]:
+    """Run Whisper once over several 16 kHz float32 clips; the feature extractor pads them to a common length."""
+    stt_pipe = stt_model.get()
+    if not stt_pipe:
+        raise RuntimeError('STT Pipeline is not initialized.')
+    inputs = [{"raw": samples, "sampling_rate": STT_SAMPLE_RATE} for samples in batch]
+    results = stt_pipe(inputs, batch_size=len(inputs))
+    return [result.get("text", "").strip() for result in results]
+
+
+stt_batcher = SttBatcher(transcribe_batch)
+
+
+def transcribe_batched(samples: np.ndarray) -> str:
+    """Transcribe through the micro-batcher, so concurrent requests share a forward pass."""
+    if not stt_batching_enabled():
+        return transcribe(samples)
+    return stt_batcher.transcribe(samples)
+
+
+def synthesize(text: str) -> np.ndarray:
+    """Speak ``text`` with XTTS; returns float32 samples at ``TTS_SAMPLE_RATE``."""
+    loaded = tts_model.get()
+    if not loaded:
+        raise RuntimeError('EGTTS Model is not initialized.')
+    model, gpt_cond_latent, speaker_embedding = loaded
+    out = model.inference(
+        text=text,
+        language=TTS_LANGUAGE,
+        gpt_cond_latent=gpt_cond_latent,
+        speaker_embedding=speaker_embedding,
+        temperature=TTS_TEMPERATURE
+    )
+    return np.asarray(out["wav"], dtype=np.float32)
+
+
+def _to_samples(chunk) -> np.ndarray:
+    if hasattr(chunk, 'detach'):
+        chunk = chunk.detach().cpu().numpy()
+    return np.asarray(chunk, dtype=np.float32).reshape(-1)
+
+
+def split_sentences(text: str) -> list[str]:
+    """Split a reply into sentences for incremental synthesis, merging very short fragments forward."""
+    sentences = []
+    pending = ''
+    for part in _SENTENCE_END.split(text.strip()):
+        part = part.strip()
+        if not part:
+            continue
+        pending = f'{pending} {part}' if pending else part
+        if len(pending) >= _MIN_SENTENCE_CHARS:
+            sentences.append(pending)
+            pending = ''
+    if pending:
+        if sentences:
+            sentences[-1] = f'{sentences[-1]} {pending}'
+        else:
+            sentences.append(pending)
+    return sentences
+
+
+def synthesize_stream(text: str):
+    """Yield float32 sample chunks for ``text``, sentence by sentence.
+
+    Uses XTTS ``inference_stream`` when the model has it, so the first chunk
+    arrives part-way through the first sentence; otherwise each sentence is
+    synthesized whole.
+    """
+    loaded = tts_model.get()
+    if not loaded:
+        raise RuntimeError('EGTTS Model is not initialized.')
+    model, gpt_cond_latent, speaker_embedding = loaded
+    for sentence in split_sentences(text):
+        if hasattr(model, 'inference_stream'):
+            for chunk in model.inference_stream(
+                sentence,
+                TTS_LANGUAGE,
+                gpt_cond_latent,
+                speaker_embedding,
+                temperature=TTS_TEMPERATURE,
+                enable_text_splitting=False,
+            ):
+                yield _to_samples(chunk)
+        else:
+            yield synthesize(sentence)
+
+
+def encode(texts: list[str]) -> list[list[float]]:
+    embedding_model = embedder.get()
+    if not embedding_model:
+        raise RuntimeError('Embedding model is not initialized.')
+    return embedding_model.encode(texts).tolist()
+
+
+def pcm16(samples: np.ndarray) -> bytes:
+    """Float samples in [-1, 1] as little-endian 16-bit PCM."""
+    return (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2').tobytes()
+
+
+def wav_bytes(samples: np.ndarray, sample_rate: int = TTS_SAMPLE_RATE) -> bytes:
+    """Encode float samples in [-1, 1] as a 16-bit mono PCM WAV file."""
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        wav_file.writeframes(pcm16(samples))
+    return buffer.getvalue()
+
+
+def wav_stream_header(sample_rate: int = TTS_SAMPLE_RATE) -> bytes:
+    """WAV header for a 16-bit mono stream of unknown length.
+
+    The RIFF and data sizes are 0xFFFFFFFF, which players and browsers treat
+    as "read until the connection closes".
+    """
+    byte_rate = sample_rate * 2
+    return (
+        b'RIFF' + struct.pack('<I', 0xFFFFFFFF) + b'WAVE'
+        + b'fmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sample_rate, byte_rate, 2, 16)
+        + b'data' + struct.pack('<I', 0xFFFFFFFF)
+    )
@@ -0,0 +1,115 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+def stt_batching_enabled() -> bool:
+    return os.getenv('STT_BATCHING', 'true').lower() == 'true'
+
+
+def _max_batch_size() -> int:
+    return max(1, int(os.getenv('STT_BATCH_SIZE', '8')))
+
+
+def _max_wait_seconds() -> float:
+    return float(os.getenv('STT_BATCH_MAX_WAIT_MS', '30')) / 1000
+
+
+def _timeout_seconds() -> float:
+    return float(os.getenv('STT_TIMEOUT_SECONDS', '60'))
+
+
+class SttBatcher:
+    """Collects concurrent transcription requests into one batched Whisper call.
+
+    The first queued request opens a batch; it closes after ``max_wait_ms``
+    or once ``max_batch_size`` requests have joined, whichever comes first,
+    and ``run_batch`` transcribes all of them in one forward pass. A lone
+    request therefore waits at most ``max_wait_ms`` extra. Batches run one
+    after another on a single thread, so there is still one copy of the
+    model in use at a time. A caller waits at most ``STT_TIMEOUT_SECONDS``
+    for its transcript.
+    """
+
+    def __init__(self, run_batch, max_batch_size: int | None = None, max_wait_ms: float | None = None):
+        # run_batch(list of 16 kHz float32 arrays) -> list of transcripts, same order
+        self._run_batch = run_batch
+        self._max_batch_size = max_batch_size
+        self._max_wait_seconds = max_wait_ms / 1000 if max_wait_ms is not None else None
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.requests = 0
+
+    @property
+    def max_batch_size(self) -> int:
+        return self._max_batch_size or _max_batch_size()
+
+    @property
+    def max_wait_seconds(self) -> float:
+        return self._max_wait_seconds if self._max_wait_seconds is not None else _max_wait_seconds()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='stt-batcher', daemon=True)
+                self._thread.start()
+
+    def submit(self, samples) -> Future:
+        self._ensure_started()
+        future = Future()
+        self._queue.put((future, samples))
+        return future
+
+    def transcribe(self, samples, timeout: float | None = None) -> str:
+        timeout = _timeout_seconds() if timeout is None else timeout
+        future = self.submit(samples)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Still queued: skip it; already running: the result is discarded
+            raise TimeoutError(f'Transcription did not finish within {timeout:g}s') from None
+
+    def _take_batch(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait_seconds
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            batch = [(future, samples) for future, samples in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                texts = list(self._run_batch([samples for _, samples in batch]))
+                if len(texts) != len(batch):
+                    raise RuntimeError(f'STT batch returned {len(texts)} transcripts for {len(batch)} requests')
+            except Exception as exc:
+                for future, _ in batch:
+                    future.set_exception(exc)
+                continue
+            for (future, _), text in zip(batch, texts):
+                future.set_result(text)
+
+    def stats(self) -> dict:
+        return {
+            'batches': self.batches,
+            'requests': self.requests,
+            'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else 0.0,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': round(self.max_wait_seconds * 1000, 1),
+        }
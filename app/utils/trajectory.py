@@ -0,0 +1,101 @@
+import numpy as np
+
+EARTH_RADIUS_M = 6_371_000.0
+
+
+def _project_to_meters(lat: np.ndarray, lon: np.ndarray):
+    """Equirectangular projection around the track's first point.
+
+    Accurate to well under a percent over the few kilometres a patient track
+    covers, and cheap enough to run over the whole array at once.
+    """
+    lat_rad = np.radians(lat)
+    lon_rad = np.radians(lon)
+    x = (lon_rad - lon_rad[0]) * np.cos(lat_rad[0]) * EARTH_RADIUS_M
+    y = (lat_rad - lat_rad[0]) * EARTH_RADIUS_M
+    return x, y
+
+
+def douglas_peucker(lat, lon, tolerance_m: float) -> np.ndarray:
+    """Return sorted indices of the points kept by Douglas-Peucker simplification.
+
+    ``tolerance_m`` is the maximum distance in meters a dropped point may lie
+    from the simplified path. Each segment's distances are computed in one
+    vectorized pass; recursion is replaced by an explicit stack.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    count = lat.shape[0]
+    if count <= 2 or tolerance_m <= 0:
+        return np.arange(count)
+
+    x, y = _project_to_meters(lat, lon)
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    stack = [(0, count - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+
+        seg_x = x[end] - x[start]
+        seg_y = y[end] - y[start]
+        px = x[start + 1:end] - x[start]
+        py = y[start + 1:end] - y[start]
+        seg_len = np.hypot(seg_x, seg_y)
+
+        if seg_len == 0.0:
+            # Closed loop (start == end position): fall back to distance from the start point
+            distances = np.hypot(px, py)
+        else:
+            distances = np.abs(seg_x * py - seg_y * px) / seg_len
+
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance_m:
+            split = start + 1 + farthest
+            keep[split] = True
+            stack.append((start, split))
+            stack.append((split, end))
+
+    return np.flatnonzero(keep)
+
+
+def downsample_by_time(epoch_seconds, max_points: int) -> np.ndarray:
+    """Return sorted indices keeping at most ``max_points`` points spread evenly over time.
+
+    The time range is split into equal buckets and the first point of every
+    non-empty bucket is kept, plus the final point so the track ends where the
+    device actually is.
+    """
+    epoch_seconds = np.asarray(epoch_seconds, dtype=np.float64)
+    count = epoch_seconds.shape[0]
+    if count <= max_points:
+        return np.arange(count)
+    if max_points < 2:
+        return np.array([count - 1])
+
+    start = epoch_seconds[0]
+    span = epoch_seconds[-1] - start
+    if span <= 0:
+        return np.linspace(0, count - 1, max_points).astype(np.int64)
+
+    buckets = np.minimum(((epoch_seconds - start) / span * (max_points - 1)).astype(np.int64), max_points - 2)
+    _, first_in_bucket = np.unique(buckets, return_index=True)
+    return np.union1d(first_in_bucket, [count - 1])
+
+
+def simplify_track(lat, lon, timestamps, tolerance_m: float | None = None, max_points: int | None = None) -> np.ndarray:
+    """Indices of the points to return for a track, applying simplification then downsampling.
+
+    ``timestamps`` is a sequence of naive UTC datetimes aligned with ``lat``/``lon``.
+    """
+    indices = np.arange(len(lat))
+    if tolerance_m:
+        indices = douglas_peucker(lat, lon, tolerance_m)
+
+    if max_points and indices.shape[0] > max_points:
+        epoch = np.array([timestamps[i] for i in indices], dtype='datetime64[ms]').astype(np.int64) / 1000.0
+        indices = indices[downsample_by_time(epoch, max_points)]
+
+    return indices
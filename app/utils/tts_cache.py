@@ -0,0 +1,137 @@
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+from app.utils.embedding_cache import normalize_text
+
+# <repository>/instance, the Flask instance folder of the app package
+_INSTANCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), 'instance')
+
+
+def tts_cache_enabled() -> bool:
+    return os.getenv('TTS_CACHE', 'true').lower() == 'true'
+
+
+def _max_bytes() -> int:
+    return int(float(os.getenv('TTS_CACHE_MAX_MB', '512')) * 1024 * 1024)
+
+
+def tts_cache_key(text: str, voice: str, language: str, temperature: float) -> str:
+    material = '\x1f'.join((normalize_text(text), voice, language, f'{temperature:g}'))
+    return hashlib.blake2b(material.encode('utf-8'), digest_size=20).hexdigest()
+
+
+class TtsCache:
+    """Synthesized WAV files on disk, addressed by a hash of what was spoken and how.
+
+    The key covers the normalized text, voice, language and temperature, so
+    a change to any of them is a miss rather than stale audio. Files live in
+    ``<dir>/<key[:2]>/<key>.wav`` and are evicted least recently used first
+    once their total size passes ``TTS_CACHE_MAX_MB``. Reads refresh the
+    file's mtime, which restores the LRU order after a restart. Several
+    workers can share the directory; each keeps its own index and tolerates
+    files another worker evicted.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+        self._scanned = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f'{key}.wav')
+
+    def _scan(self):
+        if self._scanned:
+            return
+        self._scanned = True
+        found = []
+        if os.path.isdir(self.directory):
+            for root, _, files in os.walk(self.directory):
+                for name in files:
+                    if not name.endswith('.wav'):
+                        continue
+                    try:
+                        stat = os.stat(os.path.join(root, name))
+                    except OSError:
+                        continue
+                    found.append((stat.st_mtime, name[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._sizes[key] = size
+            self._total += size
+        if found:
+            print(f"[INFO] TTS cache indexed {len(found)} files ({self._total // 1024} KB)")
+
+    def get(self, key: str) -> bytes | None:
+        path = self._path(key)
+        with self._lock:
+            self._scan()
+        try:
+            with open(path, 'rb') as audio_file:
+                audio = audio_file.read()
+            os.utime(path)
+        except OSError:
+            with self._lock:
+                size = self._sizes.pop(key, None)
+                if size is not None:
+                    self._total -= size
+                self.misses += 1
+            return None
+        with self._lock:
+            if key not in self._sizes:
+                self._total += len(audio)
+            self._sizes[key] = len(audio)
+            self._sizes.move_to_end(key)
+            self.hits += 1
+        return audio
+
+    def put(self, key: str, audio: bytes):
+        path = self._path(key)
+        with self._lock:
+            self._scan()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            with open(temp_path, 'wb') as audio_file:
+                audio_file.write(audio)
+            os.replace(temp_path, path)
+        except OSError as exc:
+            print(f"[WARN] TTS cache write failed: {exc}")
+            return
+
+        evicted = []
+        with self._lock:
+            self._total += len(audio) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(audio)
+            while self._total > _max_bytes() and len(self._sizes) > 1:
+                old_key, size = self._sizes.popitem(last=False)
+                self._total -= size
+                self.evictions += 1
+                evicted.append(old_key)
+        for old_key in evicted:
+            try:
+                os.remove(self._path(old_key))
+            except OSError:
+                pass
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'files': len(self._sizes),
+            'bytes': self._total,
+            'max_bytes': _max_bytes(),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+        }
+
+
+tts_cache = TtsCache(os.getenv('TTS_CACHE_DIR') or os.path.join(_INSTANCE_DIR, 'tts_cache'))
@@ -103,6 +103,7 @@ class UpdateMePayload(BaseModel):
     specialization: str | None = None
     clinic_address: str | None = None
     relation: str | None = None
+    gps_device_id: str | None = None
 
 class ChatAskPayload(BaseModel):
     model_config = ConfigDict(extra='forbid')
@@ -143,3 +144,45 @@ class UpdateTodoPayload(BaseModel):
     description: str | None = None
     due_date: str | None = None
     is_done: bool | None = None
+
+
+# A safe zone is a place (home, hospital), not a region; these also bound the geofence grid
+MAX_ZONE_RADIUS_M = 50_000
+MAX_ZONE_SPAN_DEGREES = 0.5
+MAX_ZONE_VERTICES = 500
+
+
+class AddSafeZonePayload(BaseModel):
+    model_config = ConfigDict(extra='forbid')
+    patient_id: str
+    name: str = 'home'
+    kind: str = 'circle'
+    lat: float | None = None
+    lon: float | None = None
+    radius_m: float | None = None
+    polygon: list[list[float]] | None = None
+    device_id: str | None = None
+
+    @model_validator(mode='after')
+    def check_shape(self):
+        if self.kind == 'circle':
+            if self.lat is None or self.lon is None or not self.radius_m or self.radius_m <= 0:
+                raise ValueError('circle zones require lat, lon and a positive radius_m')
+            if not -90 <= self.lat <= 90 or not -180 <= self.lon <= 180:
+                raise ValueError('lat must be within [-90, 90] and lon within [-180, 180]')
+            if self.radius_m > MAX_ZONE_RADIUS_M:
+                raise ValueError(f'radius_m must be at most {MAX_ZONE_RADIUS_M}')
+        elif self.kind == 'polygon':
+            if not self.polygon or len(self.polygon) < 3 or any(len(vertex) != 2 for vertex in self.polygon):
+                raise ValueError('polygon zones require at least 3 [lon, lat] vertices')
+            if len(self.polygon) > MAX_ZONE_VERTICES:
+                raise ValueError(f'polygon zones may have at most {MAX_ZONE_VERTICES} vertices')
+            lons = [vertex[0] for vertex in self.polygon]
+            lats = [vertex[1] for vertex in self.polygon]
+            if min(lats) < -90 or max(lats) > 90 or min(lons) < -180 or max(lons) > 180:
+                raise ValueError('polygon vertices must be [lon, lat] within [-180, 180] and [-90, 90]')
+            if max(lats) - min(lats) > MAX_ZONE_SPAN_DEGREES or max(lons) - min(lons) > MAX_ZONE_SPAN_DEGREES:
+                raise ValueError(f'polygon zones may span at most {MAX_ZONE_SPAN_DEGREES} degrees of lat and lon')
+        else:
+            raise ValueError('kind must be circle or polygon')
+        return self
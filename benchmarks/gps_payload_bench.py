@@ -0,0 +1,89 @@
+"""Compare the GeoJSON and binary GPS payloads: bytes on the wire and decode CPU per point.
+
+Usage (from the repository root):
+    python -m benchmarks.gps_payload_bench --points 1000 --repeat 20
+"""
+import argparse
+import json
+import time
+import zlib
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from app.controllers.gps_controller import _decode_binary_points, _parse_feature
+from app.utils.gps_codec import encode_points
+
+
+def _make_track(points: int):
+    start = datetime(2024, 5, 1, 10, 0, 0)
+    timestamps = [start + timedelta(seconds=5 * i) for i in range(points)]
+    rng = np.random.default_rng(7)
+    lat = 30.0444 + np.cumsum(rng.normal(0, 2e-5, points))
+    lon = 31.2357 + np.cumsum(rng.normal(0, 2e-5, points))
+    return timestamps, lat, lon
+
+
+def _geojson_features(device_id, timestamps, lat, lon):
+    return [
+        {
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [round(float(x), 6), round(float(y), 6)]},
+            'properties': {'device': device_id, 'timestamp': ts.isoformat() + 'Z'},
+        }
+        for ts, y, x in zip(timestamps, lat, lon)
+    ]
+
+
+def _best_of(repeat: int, func):
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--points', type=int, default=1000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    device_id = 'tracker-01'
+    timestamps, lat, lon = _make_track(args.points)
+    features = _geojson_features(device_id, timestamps, lat, lon)
+
+    single_geojson = [json.dumps(feature).encode() for feature in features]
+    batch_geojson = json.dumps({'type': 'FeatureCollection', 'features': features}).encode()
+    epoch_ms = np.array(timestamps, dtype='datetime64[ms]').astype(np.int64)
+    single_binary = [encode_points(device_id, epoch_ms[i:i + 1], lat[i:i + 1], lon[i:i + 1]) for i in range(args.points)]
+    batch_binary = encode_points(device_id, epoch_ms, lat, lon)
+
+    cases = [
+        ('geojson single', sum(map(len, single_geojson)),
+         lambda: [_parse_feature(json.loads(body)) for body in single_geojson]),
+        ('binary single', sum(map(len, single_binary)),
+         lambda: [_decode_binary_points(body) for body in single_binary]),
+        ('geojson batch', len(batch_geojson),
+         lambda: [_parse_feature(feature) for feature in json.loads(batch_geojson)['features']]),
+        ('binary batch', len(batch_binary),
+         lambda: _decode_binary_points(batch_binary)),
+    ]
+
+    print(f'{args.points} points, best of {args.repeat} runs')
+    print(f"{'payload':<16}{'bytes/point':>12}{'gzip bytes/point':>18}{'us/point':>10}")
+    payloads = {
+        'geojson single': b''.join(single_geojson),
+        'binary single': b''.join(single_binary),
+        'geojson batch': batch_geojson,
+        'binary batch': batch_binary,
+    }
+    for name, size, func in cases:
+        seconds = _best_of(args.repeat, func)
+        compressed = len(zlib.compress(payloads[name], 6))
+        print(f'{name:<16}{size / args.points:>12.1f}{compressed / args.points:>18.1f}{seconds / args.points * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,85 @@
+"""Load-test the bounded LLM client against the local stub model.
+
+Runs the same burst of concurrent chat calls twice for each scenario: once
+straight against the model (what the endpoints used to do) and once
+through LLMClient. It reports latency percentiles, how many callers got
+the fallback, and how long the burst kept request threads busy.
+
+Scenarios:
+  healthy  the model answers in --latency-ms
+  outage   the model takes --outage-ms, far past LLM_TIMEOUT_SECONDS
+
+Usage (from the repository root):
+    python -m benchmarks.llm_client_bench --requests 64 --concurrency 32
+"""
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.utils.llm_client import LLMClient, LLMUnavailableError, StubModel
+
+
+def _run(call, requests: int, concurrency: int):
+    def one(_):
+        started = time.perf_counter()
+        try:
+            call()
+            ok = True
+        except LLMUnavailableError:
+            ok = False
+        return time.perf_counter() - started, ok
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+
+    timings = sorted(seconds * 1000 for seconds, _ in results)
+    return {
+        'p50': statistics.median(timings),
+        'p95': timings[max(int(len(timings) * 0.95) - 1, 0)],
+        'max': timings[-1],
+        'fallbacks': sum(1 for _, ok in results if not ok),
+        'wall': wall,
+    }
+
+
+def _report(label: str, result: dict):
+    print(
+        f"  {label:<12} p50 {result['p50']:8.0f} ms   p95 {result['p95']:8.0f} ms   max {result['max']:8.0f} ms"
+        f"   fallbacks {result['fallbacks']:4d}   burst {result['wall']:6.1f} s"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=64)
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--latency-ms', type=float, default=300)
+    parser.add_argument('--outage-ms', type=float, default=20000)
+    args = parser.parse_args()
+
+    os.environ.setdefault('LLM_MAX_CONCURRENCY', '8')
+    os.environ.setdefault('LLM_TIMEOUT_SECONDS', '2')
+    os.environ.setdefault('LLM_QUEUE_TIMEOUT_SECONDS', '5')
+    os.environ.setdefault('LLM_BREAKER_THRESHOLD', '5')
+    print(
+        f"LLM_MAX_CONCURRENCY={os.environ['LLM_MAX_CONCURRENCY']} "
+        f"LLM_TIMEOUT_SECONDS={os.environ['LLM_TIMEOUT_SECONDS']} "
+        f"LLM_QUEUE_TIMEOUT_SECONDS={os.environ['LLM_QUEUE_TIMEOUT_SECONDS']} "
+        f"LLM_BREAKER_THRESHOLD={os.environ['LLM_BREAKER_THRESHOLD']}"
+    )
+
+    for scenario, latency_ms in (('healthy', args.latency_ms), ('outage', args.outage_ms)):
+        model = StubModel(latency_seconds=latency_ms / 1000)
+        client = LLMClient(lambda: model)
+        print(f"{scenario} (model latency {latency_ms:.0f} ms, {args.requests} requests, {args.concurrency} threads)")
+        _report('direct', _run(lambda: model.generate_content('prompt'), args.requests, args.concurrency))
+        _report('LLMClient', _run(lambda: client.generate('prompt'), args.requests, args.concurrency))
+        print(f"  circuit after burst: {client.breaker.state}")
+
+
+if __name__ == '__main__':
+    main()
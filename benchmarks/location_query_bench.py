@@ -0,0 +1,170 @@
+"""Latency of the per-device location queries with the old and the new index layout.
+
+"before": separate indexes on ``device_id`` and ``timestamp``.
+"after":  composite ``(device_id, timestamp)`` index covering ``lat``, ``lon``,
+          ``dwell_until`` and ``dwell_count`` (as declared on ``Location``),
+          plus the ``timestamp`` index kept for the retention purge.
+
+The benchmark uses its own ``bench_locations`` table and never touches
+``locations``. Loading 10M rows takes a while; the table is reused when it
+already holds the requested number of rows.
+
+Usage (from the repository root):
+    python -m benchmarks.location_query_bench --url "mssql+pyodbc://..." --rows 10000000
+    python -m benchmarks.location_query_bench --rows 1000000   # local SQLite file
+"""
+import argparse
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+import numpy as np
+import sqlalchemy as sa
+
+INSERT_CHUNK = 50_000
+
+
+def _table(metadata: sa.MetaData) -> sa.Table:
+    return sa.Table(
+        'bench_locations',
+        metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('device_id', sa.String(255), nullable=False),
+        sa.Column('lat', sa.Float, nullable=False),
+        sa.Column('lon', sa.Float, nullable=False),
+        sa.Column('timestamp', sa.DateTime, nullable=False),
+        sa.Column('dwell_until', sa.DateTime, nullable=True),
+        sa.Column('dwell_count', sa.Integer, nullable=False, server_default='0'),
+    )
+
+
+def _layout_indexes(table: sa.Table, layout: str) -> list[sa.Index]:
+    timestamp_index = sa.Index('ix_bench_locations_timestamp', table.c.timestamp)
+    if layout == 'before':
+        return [sa.Index('ix_bench_locations_device_id', table.c.device_id), timestamp_index]
+    return [
+        sa.Index(
+            'ix_bench_locations_device_id_timestamp',
+            table.c.device_id,
+            table.c.timestamp,
+            mssql_include=['lat', 'lon', 'dwell_until', 'dwell_count'],
+            postgresql_include=['lat', 'lon', 'dwell_until', 'dwell_count'],
+        ),
+        timestamp_index,
+    ]
+
+
+def _load(engine, table: sa.Table, rows: int, devices: int, end: datetime):
+    with engine.connect() as conn:
+        if sa.inspect(conn).has_table(table.name):
+            existing = conn.execute(sa.select(sa.func.count()).select_from(table)).scalar()
+            if existing == rows:
+                print(f'Reusing {existing} rows')
+                return
+    table.drop(engine, checkfirst=True)
+    table.metadata.create_all(engine, tables=[table])
+
+    rng = np.random.default_rng(7)
+    span_ms = 7 * 24 * 3600 * 1000
+    start = end - timedelta(days=7)
+    started = time.perf_counter()
+    for offset in range(0, rows, INSERT_CHUNK):
+        count = min(INSERT_CHUNK, rows - offset)
+        device_numbers = rng.integers(0, devices, count)
+        epoch_ms = rng.integers(0, span_ms, count)
+        lat = 30.0 + rng.random(count) * 0.2
+        lon = 31.0 + rng.random(count) * 0.2
+        batch = [
+            {
+                'device_id': f'tracker-{device:05d}',
+                'lat': float(y),
+                'lon': float(x),
+                'timestamp': start + timedelta(milliseconds=int(ms)),
+                'dwell_count': 0,
+            }
+            for device, ms, y, x in zip(device_numbers, epoch_ms, lat, lon)
+        ]
+        with engine.begin() as conn:
+            conn.execute(table.insert(), batch)
+        print(f'\rLoaded {offset + count}/{rows} rows ({time.perf_counter() - started:.0f}s)', end='', flush=True)
+    print()
+
+
+def _apply_layout(engine, table: sa.Table, layout: str):
+    with engine.begin() as conn:
+        existing = {index['name'] for index in sa.inspect(conn).get_indexes(table.name)}
+        for name in ('ix_bench_locations_device_id', 'ix_bench_locations_timestamp', 'ix_bench_locations_device_id_timestamp'):
+            if name in existing:
+                sa.Index(name, table.c.device_id).drop(conn)
+        for index in _layout_indexes(table, layout):
+            index.create(conn)
+        if engine.dialect.name == 'sqlite':
+            conn.exec_driver_sql('ANALYZE')
+        elif engine.dialect.name == 'mssql':
+            conn.exec_driver_sql(f'UPDATE STATISTICS {table.name}')
+
+
+def _measure(engine, statement, params_list) -> tuple[float, float]:
+    timings = []
+    with engine.connect() as conn:
+        for params in params_list:
+            started = time.perf_counter()
+            conn.execute(statement, params).fetchall()
+            timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', default='sqlite:///location_bench.db')
+    parser.add_argument('--rows', type=int, default=10_000_000)
+    parser.add_argument('--devices', type=int, default=2_000)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    engine = sa.create_engine(args.url)
+    table = _table(sa.MetaData())
+    end = datetime(2024, 5, 8)
+    _load(engine, table, args.rows, args.devices, end)
+
+    last_point = (
+        sa.select(table.c.lat, table.c.lon, table.c.timestamp, table.c.dwell_until, table.c.dwell_count)
+        .where(table.c.device_id == sa.bindparam('device_id'))
+        .order_by(table.c.timestamp.desc())
+        .limit(1)
+    )
+    one_day = (
+        sa.select(table.c.lat, table.c.lon, table.c.timestamp)
+        .where(
+            table.c.device_id == sa.bindparam('device_id'),
+            table.c.timestamp >= sa.bindparam('from_dt'),
+            table.c.timestamp <= sa.bindparam('to_dt'),
+        )
+        .order_by(table.c.timestamp.asc())
+    )
+
+    rng = random.Random(11)
+    params = []
+    for _ in range(args.repeat):
+        day_start = end - timedelta(days=rng.randint(1, 6))
+        params.append({
+            'device_id': f'tracker-{rng.randrange(args.devices):05d}',
+            'from_dt': day_start,
+            'to_dt': day_start + timedelta(days=1),
+        })
+
+    print(f'{args.rows} rows, {args.devices} devices, {args.repeat} queries each ({engine.dialect.name})')
+    print(f"{'layout':<8}{'query':<14}{'median ms':>11}{'p95 ms':>10}")
+    for layout in ('before', 'after'):
+        _apply_layout(engine, table, layout)
+        # One untimed pass so both layouts start from a warm cache
+        _measure(engine, one_day, params)
+        for name, statement in (('last point', last_point), ('one-day', one_day)):
+            median, p95 = _measure(engine, statement, params)
+            print(f'{layout:<8}{name:<14}{median:>11.3f}{p95:>10.3f}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Whisper throughput with and without STT micro-batching, at 1, 4 and 16 concurrent voice requests.
+
+Loads the Whisper pipeline on CPU and transcribes the same clip from N
+threads, first with batching off (one forward pass per request, as before)
+and then through SttBatcher. It reports requests per second and median
+latency for each level.
+
+Usage (from the repository root):
+    python -m benchmarks.stt_batching_bench --audio sample.wav
+    python -m benchmarks.stt_batching_bench --seconds 5 --batch-size 8 --max-wait-ms 30
+
+Without --audio a synthetic clip of --seconds is used. Transcripts of it are
+meaningless, but the compute is the same as for real speech of that length.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from app.utils.speech_models import STT_SAMPLE_RATE, WHISPER_MODEL_DIR, decode_audio
+from app.utils.stt_batcher import SttBatcher
+
+
+def _synthetic_clip(seconds: float) -> np.ndarray:
+    rng = np.random.default_rng(7)
+    t = np.arange(int(seconds * STT_SAMPLE_RATE)) / STT_SAMPLE_RATE
+    # A few voiced-like harmonics with a syllable-rate envelope, plus a little noise
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    tone = sum(np.sin(2 * np.pi * f * t) / (i + 1) for i, f in enumerate((140, 280, 420, 560)))
+    return (0.2 * envelope * tone + 0.01 * rng.standard_normal(t.size)).astype(np.float32)
+
+
+def _run(transcribe, clip, concurrency: int, requests: int):
+    def one(_):
+        started = time.perf_counter()
+        transcribe(clip)
+        return time.perf_counter() - started
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(requests)))
+    wall = time.perf_counter() - started
+    return requests / wall, statistics.median(latencies) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--model', default=WHISPER_MODEL_DIR)
+    parser.add_argument('--audio', help='audio file to transcribe (any format decode_audio reads)')
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--levels', default='1,4,16', help='comma-separated concurrency levels')
+    parser.add_argument('--rounds', type=int, default=2, help='requests per thread at each level')
+    parser.add_argument('--batch-size', type=int, default=8)
+    parser.add_argument('--max-wait-ms', type=float, default=30)
+    args = parser.parse_args()
+
+    from transformers import pipeline
+
+    print(f'Loading {args.model} on CPU...')
+    stt_pipe = pipeline('automatic-speech-recognition', model=args.model, device='cpu')
+
+    if args.audio:
+        with open(args.audio, 'rb') as audio_file:
+            clip = decode_audio(audio_file.read())
+    else:
+        clip = _synthetic_clip(args.seconds)
+    print(f'Clip: {clip.size / STT_SAMPLE_RATE:.1f}s')
+
+    def transcribe_one(samples):
+        return stt_pipe({'raw': samples, 'sampling_rate': STT_SAMPLE_RATE})['text']
+
+    def transcribe_batch(batch):
+        inputs = [{'raw': samples, 'sampling_rate': STT_SAMPLE_RATE} for samples in batch]
+        return [result['text'] for result in stt_pipe(inputs, batch_size=len(inputs))]
+
+    transcribe_one(clip)  # Warm up kernels and caches before timing
+
+    print(f"{'concurrency':>11}  {'unbatched req/s':>15}  {'p50 ms':>8}  {'batched req/s':>13}  {'p50 ms':>8}  {'mean batch':>10}")
+    for level in (int(value) for value in args.levels.split(',')):
+        requests = level * args.rounds
+        # Unbatched: calls serialized on one model, as a single worker thread would run them
+        serial = SttBatcher(transcribe_batch, max_batch_size=1, max_wait_ms=0)
+        unbatched_rps, unbatched_p50 = _run(serial.transcribe, clip, level, requests)
+        batcher = SttBatcher(transcribe_batch, max_batch_size=args.batch_size, max_wait_ms=args.max_wait_ms)
+        batched_rps, batched_p50 = _run(batcher.transcribe, clip, level, requests)
+        print(
+            f'{level:>11}  {unbatched_rps:>15.2f}  {unbatched_p50:>8.0f}  {batched_rps:>13.2f}  {batched_p50:>8.0f}'
+            f"  {batcher.stats()['mean_batch_size']:>10.2f}"
+        )
+
+
+if __name__ == '__main__':
+    main()